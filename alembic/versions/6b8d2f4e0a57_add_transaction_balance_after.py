@@ -0,0 +1,49 @@
+"""add transaction balance_after
+
+Revision ID: 6b8d2f4e0a57
+Revises: 9e3a5c7b1d24
+Create Date: 2026-10-17 20:05:37.642981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b8d2f4e0a57'
+down_revision: Union[str, Sequence[str], None] = '9e3a5c7b1d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SIGNED_AMOUNT = """
+    CASE WHEN t.type = 'income' THEN t.amount
+         WHEN t.type = 'expense' THEN -t.amount
+         ELSE 0 END
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('transaction', sa.Column('balance_after', sa.Float(), nullable=True))
+
+    # Saldo tras cada fila = saldo inicial + suma acumulada por cuenta en orden (date, id)
+    op.execute(f"""
+        UPDATE "transaction" AS target
+        SET balance_after = r.balance_after
+        FROM (
+            SELECT t.id,
+                   a.opening_balance + SUM({SIGNED_AMOUNT})
+                       OVER (PARTITION BY t.saving_account_id ORDER BY t.date, t.id) AS balance_after
+            FROM "transaction" AS t
+            JOIN saving_account AS a ON a.id = t.saving_account_id
+        ) AS r
+        WHERE r.id = target.id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('transaction', 'balance_after')
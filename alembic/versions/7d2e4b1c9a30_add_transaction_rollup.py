@@ -0,0 +1,61 @@
+"""add transaction_rollup
+
+Revision ID: 7d2e4b1c9a30
+Revises: a1489a79a521
+Create Date: 2026-10-17 09:12:40.512337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2e4b1c9a30'
+down_revision: Union[str, Sequence[str], None] = 'a1489a79a521'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('transaction_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('currency', postgresql.ENUM('COP', 'USD', 'EUR', name='currency', create_type=False), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.Column('type', postgresql.ENUM('income', 'expense', 'transfer', name='transactiontype', create_type=False), nullable=False),
+    sa.Column('source_type', sa.String(), nullable=True),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('tx_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_transaction_rollup_user_bucket', 'transaction_rollup', ['user_id', 'bucket'], unique=False)
+
+    # Backfill desde el libro mayor (mismo criterio que ledger_helpers.rebuild_rollup)
+    op.execute('''
+        INSERT INTO transaction_rollup (user_id, currency, bucket, category_id, type, source_type, total, tx_count)
+        SELECT t.user_id, COALESCE(sa.currency, d.currency), date_trunc('hour', t.date),
+               t.category_id, t.type, t.source_type, SUM(t.amount), COUNT(*)
+        FROM "transaction" t
+        LEFT JOIN saving_account sa ON sa.id = t.saving_account_id
+        LEFT JOIN debt d ON d.id = t.debt_id
+             AND t.saving_account_id IS NULL
+             AND t.source_type = 'credit_card_purchase'
+        WHERE t.is_cancelled = false
+          AND t.reversed_transaction_id IS NULL
+          AND t.type IN ('income', 'expense')
+          AND (sa.id IS NOT NULL OR d.id IS NOT NULL)
+        GROUP BY 1, 2, 3, 4, 5, 6
+    ''')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transaction_rollup_user_bucket', table_name='transaction_rollup')
+    op.drop_table('transaction_rollup')
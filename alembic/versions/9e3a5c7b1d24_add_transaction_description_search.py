@@ -0,0 +1,50 @@
+"""add transaction description search
+
+Revision ID: 9e3a5c7b1d24
+Revises: f2b6c8d4a913
+Create Date: 2026-10-17 19:40:12.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e3a5c7b1d24'
+down_revision: Union[str, Sequence[str], None] = 'f2b6c8d4a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        # Debe coincidir con description_tsvector() para que el planner use el índice
+        op.create_index(
+            'ix_transaction_description_fts', 'transaction',
+            [sa.text("to_tsvector('spanish'::regconfig, coalesce(description, ''))")],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_transaction_description_trgm', 'transaction',
+            ['description'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'description': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_transaction_description_trgm', table_name='transaction', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_transaction_description_fts', table_name='transaction', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,28 @@
+"""add user data_version
+
+Revision ID: b3f81c6e2d47
+Revises: 7d2e4b1c9a30
+Create Date: 2026-10-17 11:03:52.184920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f81c6e2d47'
+down_revision: Union[str, Sequence[str], None] = '7d2e4b1c9a30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user', sa.Column('data_version', sa.Integer(), nullable=False, server_default=sa.text('0')))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user', 'data_version')
@@ -0,0 +1,75 @@
+"""add saving_account_balance_snapshot
+
+Revision ID: c4d7e92a1f85
+Revises: e5a09d3f7b12
+Create Date: 2026-10-17 15:10:42.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d7e92a1f85'
+down_revision: Union[str, Sequence[str], None] = 'e5a09d3f7b12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SIGNED_AMOUNT = """
+    CASE WHEN t.type = 'income' THEN t.amount
+         WHEN t.type = 'expense' THEN -t.amount
+         ELSE 0 END
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('saving_account', sa.Column('opening_balance', sa.Float(), nullable=False, server_default='0'))
+
+    # Saldo inicial = saldo actual - efecto de todo el libro de la cuenta
+    op.execute(f"""
+        UPDATE saving_account AS a
+        SET opening_balance = a.balance - COALESCE((
+            SELECT SUM({SIGNED_AMOUNT})
+            FROM "transaction" AS t
+            WHERE t.saving_account_id = a.id
+        ), 0)
+    """)
+
+    op.create_table('saving_account_balance_snapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('saving_account_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('balance', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['saving_account_id'], ['saving_account.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('saving_account_id', 'day', name='uq_balance_snapshot_account_day')
+    )
+    op.create_index(op.f('ix_saving_account_balance_snapshot_user_id'), 'saving_account_balance_snapshot', ['user_id'], unique=False)
+
+    op.execute(f"""
+        INSERT INTO saving_account_balance_snapshot (user_id, saving_account_id, day, balance)
+        SELECT a.user_id, d.account_id, d.day,
+               a.opening_balance + SUM(d.delta) OVER (PARTITION BY d.account_id ORDER BY d.day)
+        FROM (
+            SELECT t.saving_account_id AS account_id,
+                   CAST(t.date AS DATE) AS day,
+                   SUM({SIGNED_AMOUNT}) AS delta
+            FROM "transaction" AS t
+            WHERE t.saving_account_id IS NOT NULL
+            GROUP BY t.saving_account_id, CAST(t.date AS DATE)
+        ) AS d
+        JOIN saving_account AS a ON a.id = d.account_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_saving_account_balance_snapshot_user_id'), table_name='saving_account_balance_snapshot')
+    op.drop_table('saving_account_balance_snapshot')
+    op.drop_column('saving_account', 'opening_balance')
@@ -0,0 +1,56 @@
+"""add created_at to saving_account and debt
+
+Revision ID: c4e6a8b0d213
+Revises: e1f3a5c7b902
+Create Date: 2026-10-17 23:12:41.508217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e6a8b0d213'
+down_revision: Union[str, Sequence[str], None] = 'e1f3a5c7b902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('saving_account', sa.Column('created_at', sa.DateTime(), nullable=True))
+    op.add_column('debt', sa.Column('created_at', sa.DateTime(), nullable=True))
+
+    # Sin fecha de creación registrada: primer movimiento del libro mayor o, si no
+    # hay ninguno, la fecha de registro del usuario
+    op.execute("""
+        UPDATE saving_account AS a
+        SET created_at = COALESCE((
+            SELECT MIN(t.date)
+            FROM "transaction" AS t
+            WHERE a.id IN (t.saving_account_id, t.from_account_id, t.to_account_id)
+        ), u.created_at, timezone('utc', now()))
+        FROM "user" AS u
+        WHERE u.id = a.user_id
+    """)
+    op.execute("""
+        UPDATE debt AS d
+        SET created_at = COALESCE((
+            SELECT MIN(dt.date)
+            FROM debt_transaction AS dt
+            WHERE dt.debt_id = d.id
+        ), u.created_at, timezone('utc', now()))
+        FROM "user" AS u
+        WHERE u.id = d.user_id
+    """)
+
+    op.alter_column('saving_account', 'created_at', nullable=False, server_default=sa.text("timezone('utc', now())"))
+    op.alter_column('debt', 'created_at', nullable=False, server_default=sa.text("timezone('utc', now())"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('debt', 'created_at')
+    op.drop_column('saving_account', 'created_at')
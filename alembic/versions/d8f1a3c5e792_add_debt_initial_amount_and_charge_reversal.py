@@ -0,0 +1,57 @@
+"""add debt initial_amount and charge_reversal
+
+Revision ID: d8f1a3c5e792
+Revises: 6b8d2f4e0a57
+Create Date: 2026-10-17 20:48:09.175324
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f1a3c5e792'
+down_revision: Union[str, Sequence[str], None] = '6b8d2f4e0a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DEBT_EFFECT = """
+    CASE WHEN dt.type IN ('payment', 'charge_reversal') THEN -dt.amount
+         ELSE dt.amount END
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ADD VALUE no puede usarse en la misma transacción en que se agrega
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE debttransactiontype ADD VALUE IF NOT EXISTS 'charge_reversal'")
+
+    # Las reversas de compras con tarjeta se registraban como extra_charge
+    op.execute("""
+        UPDATE debt_transaction
+        SET type = 'charge_reversal'
+        WHERE type = 'extra_charge' AND description LIKE 'Reversión de transacción #%'
+    """)
+
+    op.add_column('debt', sa.Column('initial_amount', sa.Float(), nullable=False, server_default='0'))
+
+    # Saldo inicial = saldo actual - efecto de todo el subledger de la deuda
+    op.execute(f"""
+        UPDATE debt AS d
+        SET initial_amount = d.total_amount - COALESCE((
+            SELECT SUM({DEBT_EFFECT})
+            FROM debt_transaction AS dt
+            WHERE dt.debt_id = d.id
+        ), 0)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('debt', 'initial_amount')
+    # Postgres no permite quitar valores de un enum: se devuelven las filas al tipo anterior
+    op.execute("UPDATE debt_transaction SET type = 'extra_charge' WHERE type = 'charge_reversal'")
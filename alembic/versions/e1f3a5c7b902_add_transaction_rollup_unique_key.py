@@ -0,0 +1,65 @@
+"""add transaction_rollup unique key
+
+Revision ID: e1f3a5c7b902
+Revises: a7c9e1b3d508
+Create Date: 2026-10-18 10:14:27.530861
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f3a5c7b902'
+down_revision: Union[str, Sequence[str], None] = 'a7c9e1b3d508'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SAME_KEY = """
+    r.user_id = k.user_id
+    AND r.currency = k.currency
+    AND r.bucket = k.bucket
+    AND COALESCE(r.category_id, 0) = COALESCE(k.category_id, 0)
+    AND r.type = k.type
+    AND COALESCE(r.source_type, '') = COALESCE(k.source_type, '')
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fusiona filas duplicadas de la misma clave (inserciones concurrentes) en la de menor id
+    op.execute("""
+        UPDATE transaction_rollup AS r
+        SET total = m.total, tx_count = m.tx_count
+        FROM (
+            SELECT MIN(k.id) AS id, SUM(k.total) AS total, SUM(k.tx_count) AS tx_count
+            FROM transaction_rollup AS k
+            GROUP BY k.user_id, k.currency, k.bucket, COALESCE(k.category_id, 0),
+                     k.type, COALESCE(k.source_type, '')
+            HAVING COUNT(*) > 1
+        ) AS m
+        WHERE r.id = m.id
+    """)
+    op.execute(f"""
+        DELETE FROM transaction_rollup AS r
+        USING transaction_rollup AS k
+        WHERE {SAME_KEY} AND r.id > k.id
+    """)
+    op.execute("DELETE FROM transaction_rollup WHERE tx_count <= 0")
+
+    op.create_index(
+        'uq_transaction_rollup_key', 'transaction_rollup',
+        [
+            'user_id', 'currency', 'bucket', sa.text('coalesce(category_id, 0)'),
+            'type', sa.text("coalesce(source_type, '')"),
+        ],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_transaction_rollup_key', table_name='transaction_rollup')
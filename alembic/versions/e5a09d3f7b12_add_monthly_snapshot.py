@@ -0,0 +1,43 @@
+"""add monthly_snapshot
+
+Revision ID: e5a09d3f7b12
+Revises: b3f81c6e2d47
+Create Date: 2026-10-17 12:40:07.336581
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a09d3f7b12'
+down_revision: Union[str, Sequence[str], None] = 'b3f81c6e2d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('monthly_snapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('tz', sa.String(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('currency', postgresql.ENUM('COP', 'USD', 'EUR', name='currency', create_type=False), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'kind', 'tz', 'month', 'currency', name='uq_monthly_snapshot_key')
+    )
+    op.create_index(op.f('ix_monthly_snapshot_user_id'), 'monthly_snapshot', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_monthly_snapshot_user_id'), table_name='monthly_snapshot')
+    op.drop_table('monthly_snapshot')
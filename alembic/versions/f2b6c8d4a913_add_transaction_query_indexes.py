@@ -0,0 +1,55 @@
+"""add transaction query indexes
+
+Revision ID: f2b6c8d4a913
+Revises: c4d7e92a1f85
+Create Date: 2026-10-17 18:25:51.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6c8d4a913'
+down_revision: Union[str, Sequence[str], None] = 'c4d7e92a1f85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ACTIVE_ROWS = "NOT is_cancelled AND reversed_transaction_id IS NULL"
+
+# (nombre, tabla, columnas, condición del índice parcial)
+INDEXES = [
+    ('ix_transaction_user_date_id', 'transaction', ['user_id', 'date', 'id'], None),
+    ('ix_transaction_user_date_active', 'transaction', ['user_id', 'date'], ACTIVE_ROWS),
+    ('ix_transaction_saving_account_date', 'transaction', ['saving_account_id', 'date'], None),
+    ('ix_transaction_from_account_id', 'transaction', ['from_account_id'], 'from_account_id IS NOT NULL'),
+    ('ix_transaction_to_account_id', 'transaction', ['to_account_id'], 'to_account_id IS NOT NULL'),
+    ('ix_transaction_debt_id', 'transaction', ['debt_id'], 'debt_id IS NOT NULL'),
+    ('ix_transaction_category_id', 'transaction', ['category_id'], 'category_id IS NOT NULL'),
+    ('ix_debt_transaction_debt_date', 'debt_transaction', ['debt_id', 'date'], None),
+    ('ix_debt_transaction_user_date', 'debt_transaction', ['user_id', 'date'], None),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción:
+    # no bloquea escrituras sobre transaction mientras se construye
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,39 @@
+"""add closed_at to debt
+
+Revision ID: f5a7c9e1b346
+Revises: c4e6a8b0d213
+Create Date: 2026-10-17 23:58:12.640193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5a7c9e1b346'
+down_revision: Union[str, Sequence[str], None] = 'c4e6a8b0d213'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('debt', sa.Column('closed_at', sa.DateTime(), nullable=True))
+
+    # Deudas ya cerradas: su último movimiento o, si no tienen, su creación
+    op.execute("""
+        UPDATE debt AS d
+        SET closed_at = COALESCE((
+            SELECT MAX(dt.date)
+            FROM debt_transaction AS dt
+            WHERE dt.debt_id = d.id
+        ), d.created_at)
+        WHERE d.status = 'closed'
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('debt', 'closed_at')
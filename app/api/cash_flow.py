@@ -1,24 +1,182 @@
 from fastapi import APIRouter, Depends, Query
 from sqlmodel import Session, select
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from uuid import UUID
-from typing import Optional, Dict
-from sqlalchemy.orm import joinedload
-from sqlalchemy import not_
+from typing import Literal, Optional, Dict, Tuple
+from sqlalchemy import case, func, not_
 from app.database import engine
-from app.models.transaction import Transaction
-from app.models.saving_account import Currency, SavingAccount
+from app.models.transaction_rollup import TransactionRollup
+from app.models.saving_account import Currency
 from app.models.enums import TransactionType
 from app.core.security import get_current_user_with_subscription_check
+from app.utils.cache_helpers import cached_response
+from app.utils.snapshot_helpers import SNAPSHOT_CASH_FLOW, get_or_freeze, month_segments
 
 router = APIRouter(prefix="/cash-flow", tags=["cash-flow"])
 
-@router.get("", response_model=Dict[Currency, Dict[str, float]])
-@router.get("/", response_model=Dict[Currency, Dict[str, float]])
+_CASH_FLOW_EXCLUDED_SOURCES = ["transfer", "investment_yield", "credit_card_purchase"]
+
+
+def _in_range(start_date: date, end_date: date):
+    return (
+        (TransactionRollup.bucket >= datetime.combine(start_date, datetime.min.time())) &
+        (TransactionRollup.bucket <= datetime.combine(end_date, datetime.max.time()))
+    )
+
+
+def _cash_flow_query(user_id: UUID, *amounts):
+    # Solo movimientos de cuentas: las compras con tarjeta no mueven caja
+    return (
+        select(
+            TransactionRollup.currency,
+            TransactionRollup.type,
+            TransactionRollup.source_type,
+            *amounts,
+        )
+        .where(TransactionRollup.user_id == user_id)
+        .where(
+            (TransactionRollup.source_type.is_(None)) |
+            not_(TransactionRollup.source_type.in_(_CASH_FLOW_EXCLUDED_SOURCES))
+        )
+        .group_by(
+            TransactionRollup.currency,
+            TransactionRollup.type,
+            TransactionRollup.source_type,
+        )
+    )
+
+
+def _shape_cash_flow(rows) -> Dict[Currency, Dict[str, float]]:
+    """Filas (moneda, tipo, origen, monto) -> totales de caja por moneda."""
+    totals = {
+        currency: {"income": 0.0, "expense": 0.0, "debt_payments": 0.0}
+        for currency in [Currency.COP, Currency.USD, Currency.EUR]
+    }
+
+    for currency, tx_type, source_type, amount in rows:
+        bucket = totals[Currency(currency)]
+        amount = amount or 0.0
+        if tx_type == TransactionType.income:
+            bucket["income"] += amount
+        elif tx_type == TransactionType.expense:
+            if source_type == "debt_payment":
+                bucket["debt_payments"] += amount
+            else:
+                bucket["expense"] += amount
+
+    result: Dict[Currency, Dict[str, float]] = {}
+
+    for currency, bucket in totals.items():
+        total_income = bucket["income"]
+        total_expense = bucket["expense"]
+        total_debt_payments = bucket["debt_payments"]
+
+        net_cash_flow = total_income - total_expense - total_debt_payments
+
+        result[currency] = {
+            "total_income": total_income,
+            "total_expense": total_expense,
+            "total_debt_payments": total_debt_payments,
+            "net_cash_flow": net_cash_flow
+        }
+
+    return result
+
+
+def _compute_cash_flow(session: Session, user_id: UUID, start_date: date, end_date: date) -> Dict[Currency, Dict[str, float]]:
+    query = _cash_flow_query(user_id, func.sum(TransactionRollup.total)).where(_in_range(start_date, end_date))
+    return _shape_cash_flow(session.exec(query).all())
+
+
+def _comparison_range(start_date: date, end_date: date, compare: str) -> Tuple[date, date]:
+    if compare == "previous":
+        compare_end = start_date - timedelta(days=1)
+        return compare_end - (end_date - start_date), compare_end
+
+    def year_ago(value: date) -> date:
+        try:
+            return value.replace(year=value.year - 1)
+        except ValueError:  # 29 de febrero
+            return value.replace(year=value.year - 1, day=28)
+
+    return year_ago(start_date), year_ago(end_date)
+
+
+def _compute_cash_flow_comparison(
+    session: Session,
+    user_id: UUID,
+    start_date: date,
+    end_date: date,
+    compare: str,
+) -> Dict[Currency, Dict[str, Optional[float]]]:
+    """
+    Periodo actual y de comparación en un solo recorrido del acumulado:
+    cada periodo es una suma condicional sobre el mismo GROUP BY.
+    """
+    compare_start, compare_end = _comparison_range(start_date, end_date, compare)
+    current_range = _in_range(start_date, end_date)
+    compare_range = _in_range(compare_start, compare_end)
+
+    rows = session.exec(
+        _cash_flow_query(
+            user_id,
+            func.sum(case((current_range, TransactionRollup.total), else_=0.0)),
+            func.sum(case((compare_range, TransactionRollup.total), else_=0.0)),
+        )
+        .where(current_range | compare_range)
+    ).all()
+
+    current = _shape_cash_flow((c, t, src, amount) for c, t, src, amount, _ in rows)
+    previous = _shape_cash_flow((c, t, src, amount) for c, t, src, _, amount in rows)
+
+    result: Dict[Currency, Dict[str, Optional[float]]] = {}
+    for currency, values in current.items():
+        entry: Dict[str, Optional[float]] = dict(values)
+        for key, value in values.items():
+            base = previous[currency][key]
+            entry[f"compare_{key}"] = base
+            entry[f"delta_{key}"] = value - base
+            entry[f"pct_change_{key}"] = ((value - base) / abs(base) * 100) if base else None
+        result[currency] = entry
+
+    return result
+
+
+def _assemble_cash_flow(session: Session, user_id: UUID, start_date: date, end_date: date, current_month: date) -> Dict[Currency, Dict[str, float]]:
+    """Meses cerrados completos desde snapshots; el resto del rango se calcula en vivo."""
+    segments = month_segments(start_date, end_date, current_month)
+    if len(segments) == 1 and not segments[0][2]:
+        return _compute_cash_flow(session, user_id, start_date, end_date)
+
+    result = {
+        currency: {"total_income": 0.0, "total_expense": 0.0, "total_debt_payments": 0.0, "net_cash_flow": 0.0}
+        for currency in [Currency.COP, Currency.USD, Currency.EUR]
+    }
+    for seg_start, seg_end, closed in segments:
+        if closed:
+            part = get_or_freeze(
+                session, user_id, SNAPSHOT_CASH_FLOW, "UTC", seg_start,
+                lambda: _compute_cash_flow(session, user_id, seg_start, seg_end),
+            )
+        else:
+            part = _compute_cash_flow(session, user_id, seg_start, seg_end)
+
+        for currency, values in part.items():
+            for key, value in values.items():
+                result[Currency(currency)][key] += value
+
+    return result
+
+
+@router.get("", response_model=Dict[Currency, Dict[str, Optional[float]]])
+@router.get("/", response_model=Dict[Currency, Dict[str, Optional[float]]])
 def get_cash_flow_summary(
     user_id: UUID = Depends(get_current_user_with_subscription_check),
     start_date: Optional[date] = Query(None),
-    end_date: Optional[date] = Query(None)
+    end_date: Optional[date] = Query(None),
+    compare: Optional[Literal["previous", "year_ago"]] = Query(
+        None, description="Agrega el periodo anterior o el de hace un año, con deltas y % de cambio"
+    ),
 ):
     with Session(engine) as session:
         today = date.today()
@@ -27,52 +185,15 @@ def get_cash_flow_summary(
         if not end_date:
             end_date = today
 
-        result: Dict[Currency, Dict[str, float]] = {}
-
-        for currency in [Currency.COP, Currency.USD, Currency.EUR]:
-            query = (
-                select(Transaction)
-                .join(SavingAccount, Transaction.saving_account_id == SavingAccount.id)
-                .where(Transaction.user_id == user_id)
-                .where(Transaction.date >= datetime.combine(start_date, datetime.min.time()))
-                .where(Transaction.date <= datetime.combine(end_date, datetime.max.time()))
-                .where(Transaction.is_cancelled == False)
-                .where(Transaction.reversed_transaction_id.is_(None))
-                .where(SavingAccount.currency == currency)
-               .where(
-                    (Transaction.source_type.is_(None)) |
-                    not_(Transaction.source_type.in_([
-                        "transfer",
-                        "investment_yield"
-                    ]))
-)
-                .options(
-                    joinedload(Transaction.saving_account),
-                )
+        if compare:
+            return cached_response(
+                session, user_id, "cash-flow",
+                {"start_date": start_date, "end_date": end_date, "compare": compare},
+                lambda: _compute_cash_flow_comparison(session, user_id, start_date, end_date, compare),
             )
 
-            transactions = session.exec(query).all()
-
-            total_income = 0.0
-            total_expense = 0.0
-            total_debt_payments = 0.0
-
-            for tx in transactions:
-                if tx.type == TransactionType.income:
-                    total_income += tx.amount
-                elif tx.type == TransactionType.expense:
-                    if tx.source_type == "debt_payment":
-                        total_debt_payments += tx.amount
-                    else:
-                        total_expense += tx.amount
-
-            net_cash_flow = total_income - total_expense - total_debt_payments
-
-            result[currency] = {
-                "total_income": total_income,
-                "total_expense": total_expense,
-                "total_debt_payments": total_debt_payments,
-                "net_cash_flow": net_cash_flow
-            }
-
-        return result
\ No newline at end of file
+        return cached_response(
+            session, user_id, "cash-flow",
+            {"start_date": start_date, "end_date": end_date},
+            lambda: _assemble_cash_flow(session, user_id, start_date, end_date, today.replace(day=1)),
+        )
@@ -3,7 +3,7 @@
 from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlmodel import Session, select, func
 
 from app.database import engine
@@ -11,6 +11,8 @@ from app.models.category import Category, CategoryType
 from app.models.transaction import Transaction
 from app.schemas.category import CategoryCreate, CategoryRead
 from app.core.security import get_current_user_with_subscription_check
+from app.utils.cache_helpers import bump_data_version, check_etag
+from app.utils.snapshot_helpers import SNAPSHOT_SUMMARY, invalidate_snapshots
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
@@ -42,6 +44,7 @@ def create_category(
             system_key=None,   # 👈 sin clave de sistema
         )
         session.add(category)
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(category)
         return category
@@ -49,6 +52,8 @@ def create_category(
 @router.get("", response_model=list[CategoryRead])
 @router.get("/", response_model=list[CategoryRead])
 def list_categories(
+    request: Request,
+    response: Response,
     user_id: UUID = Depends(get_current_user_with_subscription_check),
     type: Optional[CategoryType] = Query(None),
     status: Optional[str] = Query("active"),  # "active", "inactive", "all"
@@ -57,6 +62,7 @@ def list_categories(
     Lista categorías del usuario, con filtros por tipo y estado.
     """
     with Session(engine) as session:
+        check_etag(request, response, session, user_id)
         query = select(Category).where(Category.user_id == user_id)
 
         if type:
@@ -91,6 +97,8 @@ def update_category(
         if not category:
             raise HTTPException(status_code=404, detail="Categoría no encontrada")
 
+        renamed = category.name != category_data.name
+
         if category.is_system:
             # 🚫 No permitir cambiar el tipo de categorías del sistema
             if category_data.type != category.type:
@@ -117,7 +125,12 @@ def update_category(
             category.name = category_data.name
             category.type = category_data.type
 
+        if renamed:
+            # Los snapshots guardan el nombre de la categoría
+            invalidate_snapshots(session, user_id, kind=SNAPSHOT_SUMMARY)
+
         session.add(category)
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(category)
         return category
@@ -165,6 +178,7 @@ def delete_category(
         # Soft delete
         category.is_active = False
         session.add(category)
+        bump_data_version(session, user_id)
         session.commit()
         return {"message": "Categoría desactivada correctamente"}
 
@@ -191,6 +205,7 @@ def reactivate_category(
 
         category.is_active = True
         session.add(category)
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(category)
         return category
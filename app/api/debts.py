@@ -1,9 +1,9 @@
 import datetime as dt
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from sqlalchemy import func
 from sqlmodel import Session, select
 from uuid import UUID
-from typing import List, Union
+from typing import List, Optional, Union
 
 from app.database import engine
 from app.models.category import Category, CategoryType
@@ -16,10 +16,15 @@ from app.schemas.debt import AddChargeRequest, CreditCardPurchaseCreate, DebtCre
 from app.core.security import get_current_user, get_current_user_with_subscription_check
 from app.schemas.debt_transaction import DebtTransactionRead
 from app.schemas.transaction import TransactionRead
-from app.utils.account_helpers import update_account_balance
+from app.utils.account_helpers import lock_accounts, update_account_balance
+from app.utils.ledger_helpers import register_ledger_change
+from app.utils.cache_helpers import bump_data_version, check_etag
+from app.utils.idempotency_helpers import claim_idempotency_key, save_idempotent_response
 
 router = APIRouter(prefix="/debts", tags=["debts"])
 
+PAID_OFF_TOLERANCE = 0.01  # un centavo: un saldo menor se considera pagado
+
 def debt_has_transactions(session: Session, debt_id: int) -> bool:
     tx_exists = session.exec(
         select(Transaction.id).where(Transaction.debt_id == debt_id).limit(1)
@@ -38,16 +43,22 @@ def create_debt(
     user_id: UUID = Depends(get_current_user_with_subscription_check),
 ):
     with Session(engine) as session:
-        new_debt = Debt(**debt_data.dict(), user_id=user_id)
+        new_debt = Debt(**debt_data.dict(), user_id=user_id, initial_amount=debt_data.total_amount)
         session.add(new_debt)
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(new_debt)
         return new_debt
 
 @router.get("", response_model=List[DebtRead])
 @router.get("/", response_model=List[DebtRead])
-def get_debts(user_id: UUID = Depends(get_current_user_with_subscription_check)):
+def get_debts(
+    request: Request,
+    response: Response,
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+):
     with Session(engine) as session:
+        check_etag(request, response, session, user_id)
         debts = session.exec(select(Debt).where(Debt.user_id == user_id)).all()
         debts_read = []
 
@@ -95,7 +106,8 @@ def update_debt(debt_id: int, debt_data: DebtCreate, user_id: UUID = Depends(get
         if not debt:
             raise HTTPException(status_code=404, detail="Deuda no encontrada")
 
-        if debt_has_transactions(session, debt_id):
+        has_movements = debt_has_transactions(session, debt_id)
+        if has_movements:
             if debt_data.currency != debt.currency:
                 raise HTTPException(400, "No puedes cambiar la moneda: la deuda tiene movimientos.")
             if debt_data.total_amount != debt.total_amount:
@@ -105,8 +117,12 @@ def update_debt(debt_id: int, debt_data: DebtCreate, user_id: UUID = Depends(get
         debt.interest_rate = debt_data.interest_rate
         debt.due_date = debt_data.due_date
         debt.currency = debt_data.currency
-        debt.total_amount = debt_data.total_amount
+        if not has_movements:
+            # Sin movimientos el saldo actual es el inicial; con movimientos ambos quedan como están
+            debt.total_amount = debt_data.total_amount
+            debt.initial_amount = debt_data.total_amount
 
+        bump_data_version(session, user_id)
         session.add(debt); session.commit(); session.refresh(debt)
 
         tx_count = session.exec(select(func.count()).select_from(Transaction).where(Transaction.debt_id == debt_id)).one()
@@ -126,36 +142,45 @@ def delete_debt(debt_id: int, user_id: UUID = Depends(get_current_user_with_subs
         if debt_has_transactions(session, debt_id):
             raise HTTPException(400, "No puedes eliminar esta deuda porque tiene movimientos asociados.")
 
+        bump_data_version(session, user_id)
         session.delete(debt); session.commit()
         return {"message": "Deuda eliminada correctamente"}
 
     
 @router.post("/{debt_id}/pay", response_model=TransactionRead)
-def pay_debt(debt_id: int, payment: DebtPayment, user_id: UUID = Depends(get_current_user_with_subscription_check)):
+def pay_debt(
+    debt_id: int,
+    payment: DebtPayment,
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
     if payment.amount <= 0:
         raise HTTPException(400, "El monto debe ser mayor a cero.")
 
     with Session(engine) as session:
-        debt = session.exec(select(Debt).where(Debt.id == debt_id, Debt.user_id == user_id)).first()
+        replay = claim_idempotency_key(session, user_id, idempotency_key, f"POST /debts/{debt_id}/pay", payment)
+        if replay is not None:
+            return replay
+
+        # Deuda y luego cuenta, bloqueadas: el saldo pendiente y los fondos se validan sobre valores vigentes
+        debt = session.exec(select(Debt).where(Debt.id == debt_id, Debt.user_id == user_id).with_for_update()).first()
         if not debt:
             raise HTTPException(404, "Deuda no encontrada")
         
-        EPS = 0.01
-        if payment.amount - debt.total_amount > EPS:
+        if payment.amount - debt.total_amount > PAID_OFF_TOLERANCE:
             raise HTTPException(
                 status_code=400,
                 detail=f"El monto a pagar ({payment.amount}) excede el saldo pendiente ({debt.total_amount}).",
             )
 
-        account = session.exec(select(SavingAccount).where(SavingAccount.id == payment.saving_account_id, SavingAccount.user_id == user_id)).first()
+        account = lock_accounts(session, user_id, [payment.saving_account_id]).get(payment.saving_account_id)
         if not account:
             raise HTTPException(400, "Cuenta inválida")
         if account.status != "active":
             raise HTTPException(400, "No puedes pagar con una cuenta cerrada.")
         if account.currency != debt.currency:
             raise HTTPException(400, "Monedas distintas entre cuenta y deuda.")
-        if account.balance < payment.amount:
-            raise HTTPException(400, "Saldo insuficiente")
+        update_account_balance(session, payment.saving_account_id, -payment.amount, require_funds=True)
 
         tx = Transaction(
             user_id=user_id, amount=payment.amount, type=TransactionType.expense,
@@ -163,22 +188,25 @@ def pay_debt(debt_id: int, payment: DebtPayment, user_id: UUID = Depends(get_cur
             description=payment.description or f"Pago de deuda: {debt.name}", debt_id=debt.id, source_type="debt_payment",
         )
         session.add(tx)
+        register_ledger_change(session, tx)
         session.add(DebtTransaction(
             user_id=user_id, debt_id=debt.id, amount=payment.amount,
             type=DebtTransactionType.payment, description=payment.description or f"Pago de deuda: {debt.name}",
             date=payment.date or dt.datetime.utcnow(),
         ))
 
-        update_account_balance(session, payment.saving_account_id, -payment.amount)
-
+        # Se guarda el remanente real (total_amount = initial_amount + subledger): forzarlo
+        # a 0 lo descuadraría frente a la conciliación
         debt.total_amount -= payment.amount
-        if debt.total_amount <= 0.01:
-            debt.total_amount = 0.0
+        if debt.total_amount <= PAID_OFF_TOLERANCE:
             # ✅ Solo préstamos se auto-cierran; tarjetas quedan activas
             if debt.kind == DebtKind.loan:
                 debt.status = "closed"
+                debt.closed_at = dt.datetime.utcnow()
         session.add(debt)
 
+        save_idempotent_response(session, user_id, idempotency_key, TransactionRead.model_validate(tx, from_attributes=True))
+        bump_data_version(session, user_id)
         session.commit(); session.refresh(tx)
         return tx
 
@@ -191,9 +219,10 @@ def add_charge_to_debt(
 ):
    
     with Session(engine) as session:
-        debt = session.get(Debt, debt_id)
+        # Deuda bloqueada: el saldo pendiente se incrementa sobre el valor vigente
+        debt = session.exec(select(Debt).where(Debt.id == debt_id, Debt.user_id == user_id).with_for_update()).first()
 
-        if not debt or debt.user_id != user_id:
+        if not debt:
             raise HTTPException(status_code=404, detail="Deuda no encontrada")
         
         if debt.status != "active":
@@ -217,6 +246,7 @@ def add_charge_to_debt(
         )
         session.add(charge_tx)
 
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(debt)
 
@@ -225,10 +255,13 @@ def add_charge_to_debt(
 @router.get("/{debt_id}/transactions", response_model=List[DebtTransactionRead])
 def get_debt_transactions(
     debt_id: int,
+    request: Request,
+    response: Response,
     user_id: UUID = Depends(get_current_user_with_subscription_check),
 ):
    
     with Session(engine) as session:
+        check_etag(request, response, session, user_id)
         debt = session.get(Debt, debt_id)
         if not debt or debt.user_id != user_id:
             raise HTTPException(status_code=404, detail="Deuda no encontrada")
@@ -246,13 +279,19 @@ def register_credit_card_purchase(
     debt_id: int,
     purchase: CreditCardPurchaseCreate,
     user_id: UUID = Depends(get_current_user_with_subscription_check),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     if purchase.amount <= 0:
         raise HTTPException(status_code=400, detail="El monto debe ser positivo.")
 
     with Session(engine) as session:
-        debt = session.get(Debt, debt_id)
-        if not debt or debt.user_id != user_id:
+        replay = claim_idempotency_key(session, user_id, idempotency_key, f"POST /debts/{debt_id}/purchase", purchase)
+        if replay is not None:
+            return replay
+
+        # Deuda bloqueada, como en pay_debt: el saldo pendiente se incrementa sobre el valor vigente
+        debt = session.exec(select(Debt).where(Debt.id == debt_id, Debt.user_id == user_id).with_for_update()).first()
+        if not debt:
             raise HTTPException(status_code=404, detail="Deuda no encontrada")
         if debt.status != "active":
             raise HTTPException(status_code=400, detail="La deuda no está activa")
@@ -296,6 +335,7 @@ def register_credit_card_purchase(
             source_type="credit_card_purchase",
         )
         session.add(tx)
+        register_ledger_change(session, tx)
 
         # 3) Asiento en subledger de la deuda
         debt_tx = DebtTransaction(
@@ -308,6 +348,8 @@ def register_credit_card_purchase(
         )
         session.add(debt_tx)
 
+        save_idempotent_response(session, user_id, idempotency_key, TransactionRead.model_validate(tx, from_attributes=True))
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(tx)
         return tx
@@ -318,12 +360,13 @@ def close_debt(debt_id: int, user_id: UUID = Depends(get_current_user_with_subsc
         debt = session.exec(select(Debt).where(Debt.id == debt_id, Debt.user_id == user_id)).first()
         if not debt:
             raise HTTPException(404, "Deuda no encontrada")
-        if debt.total_amount != 0:
+        if abs(debt.total_amount) > PAID_OFF_TOLERANCE:
             raise HTTPException(400, "Solo puedes cerrar deudas con saldo 0.")
         if debt.status == "closed":
             raise HTTPException(400, "La deuda ya está cerrada.")
 
-        debt.status = "closed"; session.add(debt); session.commit()
+        bump_data_version(session, user_id)
+        debt.status = "closed"; debt.closed_at = dt.datetime.utcnow(); session.add(debt); session.commit()
         return {"message": "Deuda cerrada correctamente."}
 
 @router.post("/{debt_id}/reopen")
@@ -335,5 +378,6 @@ def reopen_debt(debt_id: int, user_id: UUID = Depends(get_current_user_with_subs
         if debt.status != "closed":
             raise HTTPException(400, "La deuda no está cerrada.")
 
-        debt.status = "active"; session.add(debt); session.commit()
+        bump_data_version(session, user_id)
+        debt.status = "active"; debt.closed_at = None; session.add(debt); session.commit()
         return {"message": "Deuda reabierta correctamente."}
\ No newline at end of file
@@ -1,19 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from sqlalchemy import case, func, or_, tuple_
 from sqlmodel import Session, select
 from uuid import UUID
-from typing import List
+from typing import List, Optional, Union
 
 from app.database import engine
 from app.models.saving_account import SavingAccount, SavingAccountStatus
-from app.schemas.saving_account import SavingAccountCreate, SavingAccountDeposit, SavingAccountRead, SavingAccountUpdate, SavingAccountWithdraw
+from app.schemas.saving_account import SavingAccountBalanceRead, SavingAccountCreate, SavingAccountDeposit, SavingAccountRead, SavingAccountUpdate, SavingAccountWithdraw
 from app.core.security import get_current_user, get_current_user_with_subscription_check
-from app.schemas.transaction import TransactionWithCategoryRead
-from sqlalchemy.orm import joinedload
+from app.schemas.transaction import AccountTransactionPage, AccountTransactionRead, TransactionWithCategoryRead
+from sqlalchemy.orm import aliased, selectinload
 
 from app.models.transaction import Transaction
 from app.models.enums import TransactionType
-from datetime import datetime
+from app.utils.ledger_helpers import register_ledger_change
+from app.utils.account_helpers import adjust_balance, balances_at, lock_accounts
+from app.utils.cache_helpers import bump_data_version, check_etag
+from app.utils.idempotency_helpers import claim_idempotency_key, save_idempotent_response
+from app.utils.transaction_helpers import decode_cursor, encode_cursor
+from datetime import date, datetime
 
 router = APIRouter(prefix="/saving-accounts", tags=["saving_accounts"])
 
@@ -44,22 +49,53 @@ def create_saving_account(
         if existing:
             raise HTTPException(status_code=400, detail="Ya tienes una cuenta con este nombre.")
         
-        new_account = SavingAccount(**account_data.dict(), user_id=user_id)
+        new_account = SavingAccount(
+            **account_data.dict(),
+            opening_balance=account_data.balance,
+            user_id=user_id,
+        )
         session.add(new_account)
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(new_account)
         return new_account
 
 @router.get("", response_model=List[SavingAccountRead])
 @router.get("/", response_model=List[SavingAccountRead])
-def list_saving_accounts(user_id: UUID = Depends(get_current_user_with_subscription_check)):
+def list_saving_accounts(
+    request: Request,
+    response: Response,
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+):
     with Session(engine) as session:
+        check_etag(request, response, session, user_id)
         accounts = session.exec(
             select(SavingAccount).where(SavingAccount.user_id == user_id)
         ).all()
         return accounts
 
 
+@router.get("/balances", response_model=List[SavingAccountBalanceRead])
+def get_balances_at(
+    request: Request,
+    response: Response,
+    date: date = Query(..., description="Saldo al cierre de este día (UTC)"),
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+):
+    with Session(engine) as session:
+        check_etag(request, response, session, user_id)
+        return [
+            SavingAccountBalanceRead(
+                account_id=account.id,
+                name=account.name,
+                currency=account.currency,
+                date=date,
+                balance=balance,
+            )
+            for account, balance in balances_at(session, user_id, date)
+        ]
+
+
 @router.put("/{account_id}", response_model=SavingAccountRead)
 def update_saving_account(
     account_id: int,
@@ -89,6 +125,7 @@ def update_saving_account(
             account.type = account_data.type
 
         session.add(account)
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(account)
 
@@ -124,6 +161,7 @@ def delete_saving_account(
             )
 
         session.delete(account)
+        bump_data_version(session, user_id)
         session.commit()
         return {"message": "Cuenta de ahorro eliminada correctamente"}
 
@@ -134,22 +172,26 @@ def delete_saving_account(
 def withdraw_from_saving_account(
     account_id: int,
     withdraw_data: SavingAccountWithdraw,
-    user_id: UUID = Depends(get_current_user_with_subscription_check)
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     
     with Session(engine) as session:
-        account = session.get(SavingAccount, account_id)
+        replay = claim_idempotency_key(
+            session, user_id, idempotency_key, f"POST /saving-accounts/{account_id}/withdraw", withdraw_data
+        )
+        if replay is not None:
+            return replay
+
+        account = lock_accounts(session, user_id, [account_id]).get(account_id)
 
-        if not account or account.user_id != user_id:
+        if not account:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
 
-        if withdraw_data.amount > account.balance:
+        # 1. Validar fondos y descontar en la misma sentencia
+        if adjust_balance(session, account.id, -withdraw_data.amount, require_funds=True) is None:
             raise HTTPException(status_code=400, detail="Fondos insuficientes")
 
-        # 1. Actualizar el balance
-        account.balance -= withdraw_data.amount
-        session.add(account)
-
         # 2. Registrar la transacción
         transaction = Transaction(
             user_id=user_id,
@@ -162,8 +204,11 @@ def withdraw_from_saving_account(
             source_type="account_deposit",
         )
         session.add(transaction)
+        register_ledger_change(session, transaction)
 
         # 3. Guardar todo
+        save_idempotent_response(session, user_id, idempotency_key, SavingAccountRead.model_validate(account, from_attributes=True))
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(account)
 
@@ -174,14 +219,18 @@ def deposit_to_saving_account(
     account_id: int,
     data: SavingAccountDeposit,
     user_id: UUID = Depends(get_current_user_with_subscription_check),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     with Session(engine) as session:
-        account = session.get(SavingAccount, account_id)
-        if not account or account.user_id != user_id:
+        replay = claim_idempotency_key(session, user_id, idempotency_key, f"POST /saving-accounts/{account_id}/deposit", data)
+        if replay is not None:
+            return replay
+
+        account = lock_accounts(session, user_id, [account_id]).get(account_id)
+        if not account:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
 
-        account.balance += data.amount
-        session.add(account)
+        adjust_balance(session, account.id, data.amount)
 
         # 👉 Registrar transacción
         transaction = Transaction(
@@ -195,9 +244,13 @@ def deposit_to_saving_account(
             source_type="account_deposit",  
         )
         session.add(transaction)
+        register_ledger_change(session, transaction)
 
+        result = {"message": "Depósito exitoso", "nuevo_balance": account.balance}
+        save_idempotent_response(session, user_id, idempotency_key, result)
+        bump_data_version(session, user_id)
         session.commit()
-        return {"message": "Depósito exitoso", "nuevo_balance": account.balance}
+        return result
     
 @router.post("/{account_id}/close")
 def close_saving_account(
@@ -224,18 +277,29 @@ def close_saving_account(
         account.status = SavingAccountStatus.closed
         account.closed_at = datetime.utcnow()
         session.add(account)
+        bump_data_version(session, user_id)
         session.commit()
 
         return {"message": "Cuenta cerrada correctamente."}
     
 
 
-@router.get("/{account_id}/transactions", response_model=List[TransactionWithCategoryRead])
+@router.get(
+    "/{account_id}/transactions",
+    response_model=Union[List[AccountTransactionRead], AccountTransactionPage],
+)
 def get_account_transactions(
     account_id: int,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(
+        None, description="Paginación por cursor: vacío para la primera página, luego el next_cursor recibido"
+    ),
+    page_size: int = Query(50, ge=1, le=200),
     user_id: UUID = Depends(get_current_user_with_subscription_check),
 ):
     with Session(engine) as session:
+        check_etag(request, response, session, user_id)
         account = session.exec(
             select(SavingAccount).where(
                 SavingAccount.id == account_id,
@@ -246,8 +310,29 @@ def get_account_transactions(
         if not account:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
 
-        transactions = session.exec(
-            select(Transaction)
+        # Saldo de esta cuenta después de cada movimiento, desde balance_after (lo mantiene
+        # register_ledger_change): cada página cuesta lo mismo sin importar su profundidad.
+        # Las filas de otra cuenta (la otra pata de una transferencia) toman el de la última
+        # fila previa de esta cuenta, con una búsqueda indexada.
+        Previous = aliased(Transaction)
+        previous_balance = (
+            select(Previous.balance_after)
+            .where(
+                Previous.saving_account_id == account_id,
+                tuple_(Previous.date, Previous.id) < tuple_(Transaction.date, Transaction.id),
+            )
+            .order_by(Previous.date.desc(), Previous.id.desc())
+            .limit(1)
+            .correlate(Transaction)
+            .scalar_subquery()
+        )
+        balance_after = case(
+            (Transaction.saving_account_id == account_id, Transaction.balance_after),
+            else_=func.coalesce(previous_balance, account.opening_balance),
+        )
+
+        query = (
+            select(Transaction, balance_after.label("balance_after"))
             .where(
                 or_(
                     Transaction.saving_account_id == account_id,
@@ -256,20 +341,41 @@ def get_account_transactions(
                 )
             )
             .options(
-                joinedload(Transaction.category),
-                joinedload(Transaction.from_account),
-                joinedload(Transaction.to_account),
-                joinedload(Transaction.debt),
-                joinedload(Transaction.saving_account),
+                selectinload(Transaction.category),
+                selectinload(Transaction.from_account),
+                selectinload(Transaction.to_account),
+                selectinload(Transaction.debt),
+                selectinload(Transaction.saving_account),
             )
-            .order_by(Transaction.date.desc())
-        ).all()
+            .order_by(Transaction.date.desc(), Transaction.id.desc())
+        )
+
+        def read(transaction: Transaction, balance_after: float) -> AccountTransactionRead:
+            base = TransactionWithCategoryRead.model_validate(transaction, from_attributes=True)
+            # balance_after de la fila es el de su propia cuenta; aquí va el de la cuenta consultada
+            return AccountTransactionRead(**base.model_dump(exclude={"balance_after"}), balance_after=balance_after)
+
+        if cursor is None:
+            return [read(t, balance) for t, balance in session.exec(query).all()]
+
+        if cursor:
+            try:
+                last_date, last_id = decode_cursor(cursor)
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc))
+            query = query.where(tuple_(Transaction.date, Transaction.id) < tuple_(last_date, last_id))
+
+        rows = session.exec(query.limit(page_size + 1)).all()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        return AccountTransactionPage(
+            items=[read(t, balance) for t, balance in rows],
+            next_cursor=encode_cursor(rows[-1][0].date, rows[-1][0].id) if has_more else None,
+            has_more=has_more,
+            page_size=page_size,
+        )
 
-        return [
-            TransactionWithCategoryRead.model_validate(t, from_attributes=True)
-            for t in transactions
-        ]
-    
 @router.get("/{account_id}/has-transactions")
 def check_if_account_has_transactions(
     account_id: int,
@@ -310,6 +416,7 @@ def reopen_saving_account(
         account.status = SavingAccountStatus.active
         account.closed_at = None
         session.add(account)
+        bump_data_version(session, user_id)
         session.commit()
 
         return {"message": "Cuenta reabierta correctamente."}
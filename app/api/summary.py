@@ -1,21 +1,25 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlmodel import Session, select
 from datetime import datetime, date, time, timezone
 from zoneinfo import ZoneInfo
 from uuid import UUID
-from typing import Optional, Dict
-from sqlalchemy.orm import joinedload
-from sqlalchemy import or_, not_
+from typing import Optional, Dict, List, Union
+from sqlalchemy import and_, func, or_, not_, true, union_all
 from collections import defaultdict
 
 from app.database import engine
 from app.models.transaction import Transaction
 from app.models.category import Category
 from app.models.enums import TransactionType
-from app.schemas.summary import SummaryResponse, CategorySummary, DailySummary
+from app.schemas.summary import ConsolidatedSummaryResponse, MonthlyTrend, SummaryResponse, CategorySummary, DailySummary, TrendValues
 from app.models.saving_account import Currency, SavingAccount
 from app.models.debt import Debt
+from app.models.transaction_rollup import TransactionRollup
 from app.core.security import get_current_user_with_subscription_check
+from app.utils.cache_helpers import cached_response, check_etag
+from app.utils.fx_helpers import rates_to
+from app.utils.snapshot_helpers import SNAPSHOT_SUMMARY, get_or_freeze, month_segments
+from app.utils.sql_helpers import date_series, local_day, month_start
 
 router = APIRouter(prefix="/summary", tags=["summary"])
 
@@ -39,15 +43,291 @@ def _to_local_day(dt: datetime, tz: str) -> date:
         dt = dt.replace(tzinfo=timezone.utc)
     return dt.astimezone(z).date()
 
-@router.get("", response_model=Dict[Currency, SummaryResponse])
-@router.get("/", response_model=Dict[Currency, SummaryResponse])
+_SUMMARY_EXCLUDED_SOURCES = ["transfer", "investment_yield", "debt_payment"]
+
+
+def _has_whole_hour_offsets(tz: str, start: date, end: date) -> bool:
+    """True si la zona usa offsets de horas completas (invierno y verano) en el rango."""
+    z = ZoneInfo(tz)
+    return all(
+        z.utcoffset(datetime(year, month, 1)).total_seconds() % 3600 == 0
+        for year in range(start.year, end.year + 1)
+        for month in (1, 7)
+    )
+
+
+def _movements_from_rollup(user_id: UUID, start_utc: datetime, end_utc: datetime):
+    """
+    Movimientos (moneda, tipo, categoría, monto, fecha) leídos de transaction_rollup.
+    Solo es exacto para zonas con offsets de horas completas (los buckets son horas UTC).
+    """
+    return (
+        select(
+            TransactionRollup.currency.label("currency"),
+            TransactionRollup.type.label("type"),
+            TransactionRollup.category_id.label("category_id"),
+            TransactionRollup.total.label("amount"),
+            TransactionRollup.bucket.label("date"),
+        )
+        .where(TransactionRollup.user_id == user_id)
+        .where(TransactionRollup.bucket >= start_utc)
+        .where(TransactionRollup.bucket <= end_utc)
+        .where(
+            or_(
+                TransactionRollup.source_type.is_(None),
+                not_(TransactionRollup.source_type.in_(_SUMMARY_EXCLUDED_SOURCES))
+            )
+        )
+        .subquery()
+    )
+
+
+def _movements_from_ledger(user_id: UUID, start_utc: datetime, end_utc: datetime):
+    """
+    Movimientos (moneda, tipo, categoría, monto, fecha) del libro mayor.
+    Une los movimientos de cuentas con las compras con tarjeta de crédito.
+    """
+    saving = (
+        select(
+            SavingAccount.currency.label("currency"),
+            Transaction.type.label("type"),
+            Transaction.category_id.label("category_id"),
+            Transaction.amount.label("amount"),
+            Transaction.date.label("date"),
+        )
+        .join(SavingAccount, Transaction.saving_account_id == SavingAccount.id)
+        .where(Transaction.user_id == user_id)
+        .where(Transaction.date >= start_utc)
+        .where(Transaction.date <= end_utc)
+        .where(Transaction.is_cancelled == False)
+        .where(Transaction.reversed_transaction_id.is_(None))
+        .where(Transaction.type.in_([TransactionType.income, TransactionType.expense]))
+        .where(
+            or_(
+                Transaction.source_type.is_(None),
+                not_(Transaction.source_type.in_(_SUMMARY_EXCLUDED_SOURCES))
+            )
+        )
+    )
+
+    # Compras con tarjeta de crédito (moneda de la deuda)
+    credit_card = (
+        select(
+            Debt.currency.label("currency"),
+            Transaction.type.label("type"),
+            Transaction.category_id.label("category_id"),
+            Transaction.amount.label("amount"),
+            Transaction.date.label("date"),
+        )
+        .join(Debt, Transaction.debt_id == Debt.id)
+        .where(Transaction.user_id == user_id)
+        .where(Transaction.date >= start_utc)
+        .where(Transaction.date <= end_utc)
+        .where(Transaction.is_cancelled == False)
+        .where(Transaction.type.in_([TransactionType.income, TransactionType.expense]))
+        .where(Transaction.source_type == "credit_card_purchase")
+    )
+
+    return union_all(saving, credit_card).subquery()
+
+
+def _movements(user_id: UUID, start_date: date, end_date: date, tz: str):
+    """
+    Movimientos del rango de días locales y sus límites UTC. Usa el acumulado
+    por horas cuando la zona lo permite y el libro mayor en otro caso.
+    """
+    start_utc, _ = _utc_bounds_for_local_day(start_date, tz)
+    _, end_utc = _utc_bounds_for_local_day(end_date, tz)
+
+    if _has_whole_hour_offsets(tz, start_date, end_date):
+        movements = _movements_from_rollup(user_id, start_utc, end_utc)
+    else:
+        movements = _movements_from_ledger(user_id, start_utc, end_utc)
+    return movements, start_utc, end_utc
+
+
+def _summary_rows(session: Session, movements, start_utc: datetime, end_utc: datetime, tz: str):
+    """Agregados (moneda, tipo, categoría, día local) -> suma en una sola sentencia."""
+    day = local_day(movements.c.date, tz, start_utc, end_utc).label("day")
+
+    query = (
+        select(
+            movements.c.currency,
+            movements.c.type,
+            movements.c.category_id,
+            Category.name.label("category_name"),
+            day,
+            func.sum(movements.c.amount).label("total"),
+        )
+        .select_from(movements)
+        .outerjoin(Category, Category.id == movements.c.category_id)
+        .group_by(
+            movements.c.currency,
+            movements.c.type,
+            movements.c.category_id,
+            Category.name,
+            day,
+        )
+    )
+    return session.exec(query).all()
+
+
+def _build_category_summary(data_dict, total):
+    summaries = []
+    for (cat_id, cat_name), amount in data_dict.items():
+        percentage = (amount / total * 100) if total > 0 else 0
+        summaries.append(CategorySummary(
+            category_id=cat_id,
+            category_name=cat_name,
+            total=amount,
+            percentage=percentage
+        ))
+    summaries.sort(key=lambda x: x.total, reverse=True)
+    return summaries
+
+
+def _empty_bucket() -> dict:
+    return {
+        "income": 0.0,
+        "expense": 0.0,
+        "income_by_category": defaultdict(float),
+        "expense_by_category": defaultdict(float),
+        "daily": defaultdict(lambda: {"income": 0.0, "expense": 0.0}),
+    }
+
+
+def _response_from_bucket(bucket: dict) -> SummaryResponse:
+    total_income = bucket["income"]
+    total_expense = bucket["expense"]
+
+    expense_summary = _build_category_summary(bucket["expense_by_category"], total_expense)
+    income_summary = _build_category_summary(bucket["income_by_category"], total_income)
+
+    daily_summaries = [
+        DailySummary(
+            date=d,
+            total_income=v["income"],
+            total_expense=v["expense"]
+        )
+        for d, v in sorted(bucket["daily"].items())
+    ]
+
+    return SummaryResponse(
+        total_income=total_income,
+        total_expense=total_expense,
+        balance=total_income - total_expense,
+        expense_by_category=expense_summary,
+        income_by_category=income_summary,
+        daily_evolution=daily_summaries,
+        top_expense_category=expense_summary[0] if expense_summary else None,
+        top_income_category=income_summary[0] if income_summary else None,
+        top_expense_day=max(daily_summaries, key=lambda x: x.total_expense, default=None),
+        top_income_day=max(daily_summaries, key=lambda x: x.total_income, default=None),
+        overspending_alert=total_expense > total_income
+    )
+
+
+def _shape_summary(rows) -> Dict[Currency, SummaryResponse]:
+    """Arma el SummaryResponse por moneda a partir de las filas agregadas."""
+    buckets = {currency: _empty_bucket() for currency in [Currency.COP, Currency.USD, Currency.EUR]}
+
+    for currency, tx_type, category_id, category_name, day, total in rows:
+        bucket = buckets[Currency(currency)]
+        kind = TransactionType(tx_type).value
+        bucket[kind] += total
+        if category_id is not None:
+            bucket[f"{kind}_by_category"][(category_id, category_name)] += total
+        bucket["daily"][day][kind] += total
+
+    return {currency: _response_from_bucket(bucket) for currency, bucket in buckets.items()}
+
+
+def _merge_summaries(parts: List[Dict[Currency, SummaryResponse]]) -> Dict[Currency, SummaryResponse]:
+    """Combina resúmenes de periodos disjuntos (p. ej. snapshots mensuales + mes abierto)."""
+    buckets = {currency: _empty_bucket() for currency in [Currency.COP, Currency.USD, Currency.EUR]}
+
+    for part in parts:
+        for currency, response in part.items():
+            bucket = buckets[Currency(currency)]
+            bucket["income"] += response.total_income
+            bucket["expense"] += response.total_expense
+            for cat in response.income_by_category:
+                bucket["income_by_category"][(cat.category_id, cat.category_name)] += cat.total
+            for cat in response.expense_by_category:
+                bucket["expense_by_category"][(cat.category_id, cat.category_name)] += cat.total
+            for day in response.daily_evolution:
+                bucket["daily"][day.date]["income"] += day.total_income
+                bucket["daily"][day.date]["expense"] += day.total_expense
+
+    return {currency: _response_from_bucket(bucket) for currency, bucket in buckets.items()}
+
+
+def _consolidate_summaries(by_currency: Dict[Currency, SummaryResponse], rates: Dict[Currency, dict]) -> SummaryResponse:
+    """Un solo resumen en la moneda base: convierte los agregados de cada moneda, no las filas."""
+    bucket = _empty_bucket()
+
+    for currency, response in by_currency.items():
+        rate = rates[Currency(currency)]["rate"]
+        bucket["income"] += response.total_income * rate
+        bucket["expense"] += response.total_expense * rate
+        for cat in response.income_by_category:
+            bucket["income_by_category"][(cat.category_id, cat.category_name)] += cat.total * rate
+        for cat in response.expense_by_category:
+            bucket["expense_by_category"][(cat.category_id, cat.category_name)] += cat.total * rate
+        for day in response.daily_evolution:
+            bucket["daily"][day.date]["income"] += day.total_income * rate
+            bucket["daily"][day.date]["expense"] += day.total_expense * rate
+
+    return _response_from_bucket(bucket)
+
+
+def _compute_summary(session: Session, user_id: UUID, start_date: date, end_date: date, tz: str) -> Dict[Currency, SummaryResponse]:
+    movements, start_utc, end_utc = _movements(user_id, start_date, end_date, tz)
+    return _shape_summary(_summary_rows(session, movements, start_utc, end_utc, tz))
+
+
+def _assemble_summary(
+    session: Session,
+    user_id: UUID,
+    start_date: date,
+    end_date: date,
+    tz: str,
+    current_month: date,
+) -> Dict[Currency, SummaryResponse]:
+    """Meses cerrados completos desde snapshots; el resto del rango se calcula en vivo."""
+    segments = month_segments(start_date, end_date, current_month)
+    if len(segments) == 1 and not segments[0][2]:
+        return _compute_summary(session, user_id, start_date, end_date, tz)
+
+    parts = []
+    for seg_start, seg_end, closed in segments:
+        if closed:
+            frozen = get_or_freeze(
+                session, user_id, SNAPSHOT_SUMMARY, tz, seg_start,
+                lambda: _compute_summary(session, user_id, seg_start, seg_end, tz),
+            )
+            parts.append({c: SummaryResponse.model_validate(p) for c, p in frozen.items()})
+        else:
+            parts.append(_compute_summary(session, user_id, seg_start, seg_end, tz))
+
+    if len(parts) == 1:
+        return parts[0]
+    return _merge_summaries(parts)
+
+
+@router.get("", response_model=Union[Dict[Currency, SummaryResponse], ConsolidatedSummaryResponse])
+@router.get("/", response_model=Union[Dict[Currency, SummaryResponse], ConsolidatedSummaryResponse])
 def get_summary(
+    request: Request,
+    response: Response,
     user_id: UUID = Depends(get_current_user_with_subscription_check),
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     tz: Optional[str] = Query(None, description="Zona horaria IANA del navegador, ej. America/Bogota"),
+    base_currency: Optional[Currency] = Query(None, description="Agrega además un total consolidado en esta moneda"),
 ):
     tz = tz or "UTC"
+    rates = rates_to(base_currency) if base_currency else {}
 
     with Session(engine) as session:
         today_local = _to_local_day(datetime.utcnow(), tz)
@@ -56,127 +336,117 @@ def get_summary(
         if not end_date:
             end_date = today_local
 
-        start_utc, _ = _utc_bounds_for_local_day(start_date, tz)
-        _, end_utc = _utc_bounds_for_local_day(end_date, tz)
-
-        result: Dict[Currency, SummaryResponse] = {}
-
-        for currency in [Currency.COP, Currency.USD, Currency.EUR]:
-            # Transacciones de cuentas (no automáticas especiales)
-            query_saving = (
-                select(Transaction)
-                .join(SavingAccount, Transaction.saving_account_id == SavingAccount.id)
-                .where(Transaction.user_id == user_id)
-                .where(Transaction.date >= start_utc)
-                .where(Transaction.date <= end_utc)
-                .where(Transaction.is_cancelled == False)
-                .where(Transaction.reversed_transaction_id.is_(None))
-                .where(SavingAccount.currency == currency)
-                .where(
-                    or_(
-                        Transaction.source_type.is_(None),
-                        not_(Transaction.source_type.in_([
-                            "transfer",
-                            "investment_yield",
-                            "debt_payment"
-                        ]))
-                    )
-                )
-                .options(
-                    joinedload(Transaction.category),
-                    joinedload(Transaction.saving_account),
-                )
-            )
+        # Las fechas por defecto dependen del día local: forman parte del ETag,
+        # igual que las tasas usadas para consolidar
+        check_etag(
+            request, response, session, user_id, start_date, end_date,
+            *(quote["as_of"] for quote in rates.values() if quote["source"] != "identity"),
+        )
 
-            # Compras con tarjeta de crédito en misma moneda
-            query_credit_card = (
-                select(Transaction)
-                .join(Debt, Transaction.debt_id == Debt.id)
-                .where(Transaction.user_id == user_id)
-                .where(Transaction.date >= start_utc)
-                .where(Transaction.date <= end_utc)
-                .where(Transaction.is_cancelled == False)
-                .where(Debt.currency == currency)
-                .where(Transaction.source_type == "credit_card_purchase")
-                .options(
-                    joinedload(Transaction.category),
-                    joinedload(Transaction.debt),
-                )
-            )
+        by_currency = cached_response(
+            session, user_id, "summary",
+            {"start_date": start_date, "end_date": end_date, "tz": tz},
+            lambda: _assemble_summary(session, user_id, start_date, end_date, tz, today_local.replace(day=1)),
+        )
+        if not base_currency:
+            return by_currency
 
-            transactions_saving = session.exec(query_saving).all()
-            transactions_credit_card = session.exec(query_credit_card).all()
-            transactions = transactions_saving + transactions_credit_card
-
-            total_income = 0.0
-            total_expense = 0.0
-
-            expense_by_category = defaultdict(float)
-            income_by_category = defaultdict(float)
-            daily_summary = defaultdict(lambda: {"income": 0.0, "expense": 0.0})
-
-            for tx in transactions:
-                # Día local según tz del navegador
-                tx_local_day = _to_local_day(tx.date, tz)
-
-                if tx.type == TransactionType.income:
-                    total_income += tx.amount
-                    if tx.category:
-                        income_by_category[(tx.category.id, tx.category.name)] += tx.amount
-                    daily_summary[tx_local_day]["income"] += tx.amount
-                elif tx.type == TransactionType.expense:
-                    total_expense += tx.amount
-                    if tx.category:
-                        expense_by_category[(tx.category.id, tx.category.name)] += tx.amount
-                    daily_summary[tx_local_day]["expense"] += tx.amount
-
-            balance = total_income - total_expense
-
-            def build_category_summary(data_dict, total):
-                summaries = []
-                for (cat_id, cat_name), amount in data_dict.items():
-                    percentage = (amount / total * 100) if total > 0 else 0
-                    summaries.append(CategorySummary(
-                        category_id=cat_id,
-                        category_name=cat_name,
-                        total=amount,
-                        percentage=percentage
-                    ))
-                summaries.sort(key=lambda x: x.total, reverse=True)
-                return summaries
-
-            expense_summary = build_category_summary(expense_by_category, total_expense)
-            income_summary = build_category_summary(income_by_category, total_income)
-
-            daily_summaries = [
-                DailySummary(
-                    date=d,
-                    total_income=v["income"],
-                    total_expense=v["expense"]
-                )
-                for d, v in sorted(daily_summary.items())
-            ]
-
-            top_expense_category = expense_summary[0] if expense_summary else None
-            top_income_category = income_summary[0] if income_summary else None
-
-            top_expense_day = max(daily_summaries, key=lambda x: x.total_expense, default=None)
-            top_income_day = max(daily_summaries, key=lambda x: x.total_income, default=None)
-
-            overspending_alert = total_expense > total_income
-
-            result[currency] = SummaryResponse(
-                total_income=total_income,
-                total_expense=total_expense,
-                balance=balance,
-                expense_by_category=expense_summary,
-                income_by_category=income_summary,
-                daily_evolution=daily_summaries,
-                top_expense_category=top_expense_category,
-                top_income_category=top_income_category,
-                top_expense_day=top_expense_day,
-                top_income_day=top_income_day,
-                overspending_alert=overspending_alert
+        return ConsolidatedSummaryResponse(
+            base_currency=base_currency,
+            rates=rates,
+            total=_consolidate_summaries(by_currency, rates),
+            by_currency=by_currency,
+        )
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _compute_trend(session: Session, user_id: UUID, months: int, tz: str, today_local: date) -> Dict[Currency, List[MonthlyTrend]]:
+    """
+    Totales mensuales por moneda y tipo con promedios móviles de 3 y 12 meses.
+    Un calendario de meses cruzado con las series garantiza que los meses sin
+    movimientos cuenten como 0; los promedios son funciones de ventana en la BD.
+    Se leen 11 meses extra para que el promedio de 12 meses del primero sea completo.
+    """
+    current_month = today_local.replace(day=1)
+    first_month = _add_months(current_month, -(months - 1))
+    lookback_month = _add_months(first_month, -11)
+
+    movements, start_utc, end_utc = _movements(user_id, lookback_month, today_local, tz)
+    month = month_start(local_day(movements.c.date, tz, start_utc, end_utc)).label("month")
+    monthly = (
+        select(movements.c.currency, movements.c.type, month, func.sum(movements.c.amount).label("total"))
+        .group_by(movements.c.currency, movements.c.type, month)
+        .subquery()
+    )
+
+    calendar = date_series([_add_months(lookback_month, i) for i in range(months + 11)], name="months")
+    series = select(monthly.c.currency, monthly.c.type).distinct().subquery()
+    total = func.coalesce(monthly.c.total, 0.0)
+    window = {
+        "partition_by": (series.c.currency, series.c.type),
+        "order_by": calendar.c.day,
+    }
+    grid = (
+        select(
+            series.c.currency,
+            series.c.type,
+            calendar.c.day.label("month"),
+            total.label("total"),
+            func.avg(total).over(rows=(-2, 0), **window).label("avg_3m"),
+            func.avg(total).over(rows=(-11, 0), **window).label("avg_12m"),
+        )
+        .select_from(calendar)
+        .join(series, true())
+        .outerjoin(
+            monthly,
+            and_(
+                monthly.c.currency == series.c.currency,
+                monthly.c.type == series.c.type,
+                monthly.c.month == calendar.c.day,
+            ),
+        )
+        .subquery()
+    )
+    rows = session.exec(select(*grid.c).where(grid.c.month >= first_month)).all()
+
+    zero = TrendValues(total=0.0, avg_3m=0.0, avg_12m=0.0)
+    values = {
+        (Currency(currency), TransactionType(tx_type).value, month_value): TrendValues(total=t, avg_3m=a3, avg_12m=a12)
+        for currency, tx_type, month_value, t, a3, a12 in rows
+    }
+    return {
+        currency: [
+            MonthlyTrend(
+                month=_add_months(first_month, i),
+                income=values.get((currency, "income", _add_months(first_month, i)), zero),
+                expense=values.get((currency, "expense", _add_months(first_month, i)), zero),
             )
+            for i in range(months)
+        ]
+        for currency in [Currency.COP, Currency.USD, Currency.EUR]
+    }
+
+
+@router.get("/trend", response_model=Dict[Currency, List[MonthlyTrend]])
+def get_trend(
+    request: Request,
+    response: Response,
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+    months: int = Query(12, ge=1, le=120),
+    tz: Optional[str] = Query(None, description="Zona horaria IANA del navegador, ej. America/Bogota"),
+):
+    tz = tz or "UTC"
+
+    with Session(engine) as session:
+        today_local = _to_local_day(datetime.utcnow(), tz)
+        check_etag(request, response, session, user_id, today_local)
 
-        return result
+        return cached_response(
+            session, user_id, "summary-trend",
+            {"months": months, "tz": tz, "today": today_local},
+            lambda: _compute_trend(session, user_id, months, tz, today_local),
+        )
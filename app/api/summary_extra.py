@@ -1,133 +1,321 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select, func
 from uuid import UUID
+from typing import Dict, List, Literal, Optional, Tuple
+from datetime import date, datetime, timedelta
 
 from app.database import engine
 from app.models.debt import Debt, DebtStatus
+from app.models.debt_transaction import DebtTransaction
 from app.models.saving_account import Currency, SavingAccount, SavingAccountType, SavingAccountStatus
-from app.core.security import get_current_user_with_subscription_check
+from app.core.security import get_current_admin_user, get_current_user_with_subscription_check
+from app.utils.account_helpers import account_totals_on_days
+from app.utils.cache_helpers import cached_response, response_cache
+from app.utils.debt_helpers import debt_effect_expr
+from app.utils.fx_helpers import convert_totals, rates_to
+from app.utils.sql_helpers import utc_day
 
 router = APIRouter(prefix="/summary-extra", tags=["summary-extra"])
 
+def _account_totals_by_currency(session: Session, user_id: UUID) -> Dict[Currency, Dict[str, float]]:
+    """Saldos de cuentas activas por moneda, separados en ahorro (cash/bank) e inversión."""
+    rows = session.exec(
+        select(SavingAccount.currency, SavingAccount.type, func.sum(SavingAccount.balance))
+        .where(
+            SavingAccount.user_id == user_id,
+            SavingAccount.status == SavingAccountStatus.active,
+        )
+        .group_by(SavingAccount.currency, SavingAccount.type)
+    ).all()
+
+    totals: Dict[Currency, Dict[str, float]] = {}
+    for currency, account_type, balance in rows:
+        bucket = totals.setdefault(Currency(currency), {"savings": 0.0, "investments": 0.0})
+        if account_type == SavingAccountType.investment:
+            bucket["investments"] += balance or 0.0
+        else:
+            bucket["savings"] += balance or 0.0
+    return totals
+
+
+def _debt_totals_by_currency(session: Session, user_id: UUID) -> Dict[Currency, float]:
+    """Saldo pendiente de deudas activas por moneda (total_amount ya descuenta los pagos)."""
+    rows = session.exec(
+        select(Debt.currency, func.sum(Debt.total_amount))
+        .where(
+            Debt.user_id == user_id,
+            Debt.status == DebtStatus.active,
+            Debt.total_amount > 0,
+        )
+        .group_by(Debt.currency)
+    ).all()
+    return {Currency(currency): total or 0.0 for currency, total in rows}
+
+
+def _consolidated(base_currency: Currency, by_currency: Dict[Currency, Dict[str, float]]) -> dict:
+    """Totales por moneda más su suma en `base_currency`, con las tasas usadas."""
+    rates = rates_to(base_currency)
+    return {
+        "base_currency": base_currency,
+        "rates": rates,
+        "total": convert_totals(by_currency, rates),
+        "by_currency": by_currency,
+    }
+
+
+def _debt_ratio(total_assets: float, total_liabilities: float) -> float:
+    return (total_liabilities / total_assets * 100) if total_assets > 0 else 0
+
+
+def _compute_assets_summary(session: Session, user_id: UUID):
+    total_savings = {}
+    total_investments = {}
+    total_assets = {}
+
+    for currency, bucket in _account_totals_by_currency(session, user_id).items():
+        total_savings[currency] = bucket["savings"]
+        total_investments[currency] = bucket["investments"]
+        total_assets[currency] = bucket["savings"] + bucket["investments"]
+
+    return {
+        "total_savings": total_savings,
+        "total_investments": total_investments,
+        "total_assets": total_assets
+    }
+
+
 @router.get("/assets-summary")
-def get_assets_summary(user_id: UUID = Depends(get_current_user_with_subscription_check)):
+def get_assets_summary(
+    base_currency: Optional[Currency] = Query(None, description="Consolida los totales en esta moneda"),
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+):
     with Session(engine) as session:
-        currencies = [Currency.COP, Currency.USD]
-        total_savings = {}
-        total_investments = {}
-        total_assets = {}
-
-        for currency in currencies:
-            savings_sum = session.exec(
-                select(func.coalesce(func.sum(SavingAccount.balance), 0))
-                .where(
-                    SavingAccount.user_id == user_id,
-                    SavingAccount.status == SavingAccountStatus.active,
-                    SavingAccount.type.in_([SavingAccountType.cash, SavingAccountType.bank]),
-                    SavingAccount.currency == currency
-                )
-            ).one()
-
-            investments_sum = session.exec(
-                select(func.coalesce(func.sum(SavingAccount.balance), 0))
-                .where(
-                    SavingAccount.user_id == user_id,
-                    SavingAccount.status == SavingAccountStatus.active,
-                    SavingAccount.type == SavingAccountType.investment,
-                    SavingAccount.currency == currency
-                )
-            ).one()
-
-            total_savings[currency] = savings_sum
-            total_investments[currency] = investments_sum
-            total_assets[currency] = savings_sum + investments_sum
-
-        return {
-            "total_savings": total_savings,
-            "total_investments": total_investments,
-            "total_assets": total_assets
+        summary = cached_response(
+            session, user_id, "assets-summary", {},
+            lambda: _compute_assets_summary(session, user_id),
+        )
+    if not base_currency:
+        return summary
+
+    by_currency = {
+        currency: {
+            "total_savings": summary["total_savings"][currency],
+            "total_investments": summary["total_investments"][currency],
+            "total_assets": summary["total_assets"][currency],
         }
+        for currency in summary["total_assets"]
+    }
+    return _consolidated(base_currency, by_currency)
+
+
+def _compute_liabilities_summary(session: Session, user_id: UUID):
+    return {"total_liabilities": _debt_totals_by_currency(session, user_id)}
 
 
 @router.get("/liabilities-summary")
-def get_liabilities_summary(user_id: UUID = Depends(get_current_user_with_subscription_check)):
+def get_liabilities_summary(
+    base_currency: Optional[Currency] = Query(None, description="Consolida los totales en esta moneda"),
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+):
     with Session(engine) as session:
-        currencies = [Currency.COP, Currency.USD]
-        total_liabilities = {}
+        summary = cached_response(
+            session, user_id, "liabilities-summary", {},
+            lambda: _compute_liabilities_summary(session, user_id),
+        )
+    if not base_currency:
+        return summary
 
-        for currency in currencies:
-            debts = session.exec(
-                select(Debt).where(
-                    Debt.user_id == user_id,
-                    Debt.status == DebtStatus.active,
-                    Debt.currency == currency
-                )
-            ).all()
+    by_currency = {
+        currency: {"total_liabilities": total}
+        for currency, total in summary["total_liabilities"].items()
+    }
+    return _consolidated(base_currency, by_currency)
 
-            total = 0.0
-            for debt in debts:
-                total_paid = sum(t.amount for t in debt.transactions if t.type == "payment")
-                pending = debt.total_amount - total_paid
-                if pending > 0:
-                    total += pending
 
-            total_liabilities[currency] = total
+def _compute_net_worth_summary(session: Session, user_id: UUID):
+    accounts = _account_totals_by_currency(session, user_id)
+    debts = _debt_totals_by_currency(session, user_id)
+    summary = {}
 
-        return {"total_liabilities": total_liabilities}
+    for currency in sorted(set(accounts) | set(debts), key=lambda c: c.value):
+        bucket = accounts.get(currency, {"savings": 0.0, "investments": 0.0})
+        total_assets = bucket["savings"] + bucket["investments"]
+        total_liabilities = debts.get(currency, 0.0)
+
+        net_worth = total_assets - total_liabilities
+        debt_ratio = _debt_ratio(total_assets, total_liabilities)
+
+        summary[currency] = {
+            "total_assets": total_assets,
+            "total_liabilities": total_liabilities,
+            "net_worth": net_worth,
+            "debt_ratio": debt_ratio
+        }
+
+    return summary
 
 
 @router.get("/net-worth-summary")
-def get_net_worth_summary(user_id: UUID = Depends(get_current_user_with_subscription_check)):
+def get_net_worth_summary(
+    base_currency: Optional[Currency] = Query(None, description="Consolida los totales en esta moneda"),
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+):
     with Session(engine) as session:
-        currencies = [Currency.COP, Currency.USD, Currency.EUR]
-        summary = {}
-
-        for currency in currencies:
-            total_savings = session.exec(
-                select(func.coalesce(func.sum(SavingAccount.balance), 0))
-                .where(
-                    SavingAccount.user_id == user_id,
-                    SavingAccount.status == SavingAccountStatus.active,
-                    SavingAccount.type.in_([SavingAccountType.cash, SavingAccountType.bank]),
-                    SavingAccount.currency == currency
-                )
-            ).one()
-
-            total_investments = session.exec(
-                select(func.coalesce(func.sum(SavingAccount.balance), 0))
-                .where(
-                    SavingAccount.user_id == user_id,
-                    SavingAccount.status == SavingAccountStatus.active,
-                    SavingAccount.type == SavingAccountType.investment,
-                    SavingAccount.currency == currency
-                )
-            ).one()
-
-            total_assets = total_savings + total_investments
-
-            debts = session.exec(
-                select(Debt).where(
-                    Debt.user_id == user_id,
-                    Debt.status == DebtStatus.active,
-                    Debt.currency == currency
-                )
-            ).all()
-
-            total_liabilities = 0.0
-            for debt in debts:
-                total_paid = sum(t.amount for t in debt.transactions if t.type == "payment")
-                pending = debt.total_amount - total_paid
-                if pending > 0:
-                    total_liabilities += pending
-
-            net_worth = total_assets - total_liabilities
-            debt_ratio = (total_liabilities / total_assets * 100) if total_assets > 0 else 0
-
-            summary[currency] = {
+        summary = cached_response(
+            session, user_id, "net-worth-summary", {},
+            lambda: _compute_net_worth_summary(session, user_id),
+        )
+    if not base_currency:
+        return summary
+
+    by_currency = {
+        currency: {key: value for key, value in values.items() if key != "debt_ratio"}
+        for currency, values in summary.items()
+    }
+    consolidated = _consolidated(base_currency, by_currency)
+    total = consolidated["total"]
+    total["debt_ratio"] = _debt_ratio(total.get("total_assets", 0.0), total.get("total_liabilities", 0.0))
+    consolidated["by_currency"] = summary
+    return consolidated
+
+
+MAX_HISTORY_POINTS = 3700  # ~10 años en granularidad diaria
+
+
+def _history_periods(from_date: date, to_date: date, granularity: str) -> List[Tuple[date, date]]:
+    """(inicio del periodo, día de corte) por periodo; el corte es el último día del periodo o `to_date`."""
+    periods = []
+    if granularity == "day":
+        start = from_date
+    elif granularity == "week":
+        start = from_date - timedelta(days=from_date.weekday())
+    else:
+        start = from_date.replace(day=1)
+
+    while start <= to_date:
+        if granularity == "day":
+            following = start + timedelta(days=1)
+        elif granularity == "week":
+            following = start + timedelta(days=7)
+        else:
+            following = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        periods.append((start, min(following - timedelta(days=1), to_date)))
+        start = following
+    return periods
+
+
+def _debt_totals_on_days(session: Session, user_id: UUID, days: List[date]) -> Dict[date, Dict[Currency, float]]:
+    """
+    Saldo de deudas por moneda al cierre de cada día, con el mismo criterio de
+    /net-worth-summary (activas con saldo positivo): el saldo actual menos los
+    movimientos del subledger posteriores a ese día y el saldo inicial de las
+    deudas creadas después, más el saldo de las cerradas después (que ese día
+    seguían abiertas). Consultas agrupadas por moneda y día, y luego sumas
+    acumuladas hacia atrás en memoria.
+    """
+    counted_now = (Debt.status == DebtStatus.active) & (Debt.total_amount > 0)
+    # Deudas que cuentan hoy o que contaron hasta su cierre
+    in_history = counted_now | Debt.closed_at.is_not(None)
+
+    current = session.exec(
+        select(Debt.currency, func.sum(Debt.total_amount))
+        .where(Debt.user_id == user_id, counted_now)
+        .group_by(Debt.currency)
+    ).all()
+
+    since = datetime.combine(days[0] + timedelta(days=1), datetime.min.time())
+    effect = debt_effect_expr()
+    day = utc_day(DebtTransaction.date)
+    movements = session.exec(
+        select(Debt.currency, day, func.sum(effect))
+        .join(Debt, Debt.id == DebtTransaction.debt_id)
+        .where(DebtTransaction.user_id == user_id, DebtTransaction.date >= since, in_history)
+        .group_by(Debt.currency, day)
+    ).all()
+    # Antes de crearse, una deuda no existía: se descuenta también su saldo inicial
+    created = utc_day(Debt.created_at)
+    openings = session.exec(
+        select(Debt.currency, created, func.sum(Debt.initial_amount))
+        .where(Debt.user_id == user_id, Debt.created_at >= since, in_history)
+        .group_by(Debt.currency, created)
+    ).all()
+    # Antes de cerrarse sí contaba: se suma su saldo (con signo negativo, porque se resta)
+    closed = utc_day(Debt.closed_at)
+    closings = session.exec(
+        select(Debt.currency, closed, (-func.sum(Debt.total_amount)).label("balance"))
+        .where(Debt.user_id == user_id, Debt.closed_at >= since)
+        .group_by(Debt.currency, closed)
+    ).all()
+    movements = sorted([*movements, *openings, *closings], key=lambda movement: movement[1], reverse=True)
+
+    balances = {Currency(currency): total or 0.0 for currency, total in current}
+    result: Dict[date, Dict[Currency, float]] = {}
+    pending = iter(movements)
+    movement = next(pending, None)
+    for cutoff in reversed(days):
+        while movement is not None and movement[1] > cutoff:
+            currency = Currency(movement[0])
+            balances[currency] = balances.get(currency, 0.0) - (movement[2] or 0.0)
+            movement = next(pending, None)
+        result[cutoff] = dict(balances)
+    return result
+
+
+def _compute_net_worth_history(session: Session, user_id: UUID, from_date: date, to_date: date, granularity: str):
+    periods = _history_periods(from_date, to_date, granularity)
+    cutoffs = [cutoff for _, cutoff in periods]
+
+    assets: Dict[date, Dict[Currency, float]] = {}
+    for day, currency, _type, balance in account_totals_on_days(session, user_id, cutoffs):
+        per_currency = assets.setdefault(day, {})
+        per_currency[Currency(currency)] = per_currency.get(Currency(currency), 0.0) + (balance or 0.0)
+    debts = _debt_totals_on_days(session, user_id, cutoffs)
+
+    currencies = set(debts[cutoffs[-1]])
+    for per_currency in assets.values():
+        currencies |= set(per_currency)
+
+    history = {}
+    for currency in sorted(currencies, key=lambda c: c.value):
+        points = []
+        for period_start, cutoff in periods:
+            total_assets = assets.get(cutoff, {}).get(currency, 0.0)
+            total_liabilities = debts[cutoff].get(currency, 0.0)
+            points.append({
+                "period_start": period_start,
+                "as_of": cutoff,
                 "total_assets": total_assets,
                 "total_liabilities": total_liabilities,
-                "net_worth": net_worth,
-                "debt_ratio": debt_ratio
-            }
+                "net_worth": total_assets - total_liabilities,
+            })
+        history[currency] = points
+
+    return history
+
+
+@router.get("/net-worth-history")
+def get_net_worth_history(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    granularity: Literal["day", "week", "month"] = Query("month"),
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+):
+    """Activos, pasivos y patrimonio por periodo y moneda, al cierre (UTC) de cada periodo."""
+    to_date = to_date or datetime.utcnow().date()
+    from_date = from_date or (to_date.replace(day=1) - timedelta(days=365)).replace(day=1)
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="La fecha inicial no puede ser posterior a la final.")
+    if len(_history_periods(from_date, to_date, granularity)) > MAX_HISTORY_POINTS:
+        raise HTTPException(status_code=400, detail="Rango demasiado largo para esta granularidad.")
+
+    with Session(engine) as session:
+        return cached_response(
+            session, user_id, "net-worth-history",
+            {"from": from_date, "to": to_date, "granularity": granularity},
+            lambda: _compute_net_worth_history(session, user_id, from_date, to_date, granularity),
+        )
+
 
-        return summary
\ No newline at end of file
+@router.get("/cache-stats")
+def get_cache_stats(admin_user_id: UUID = Depends(get_current_admin_user)):
+    return response_cache.stats()
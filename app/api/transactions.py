@@ -1,6 +1,6 @@
 from uuid import UUID, uuid4
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlmodel import Session, select
 from app.database import engine
 from app.models.category import Category, CategoryType
@@ -9,29 +9,106 @@ from app.models.debt_transaction import DebtTransaction, DebtTransactionType
 from app.models.enums import TransactionType
 from app.models.saving_account import SavingAccount, SavingAccountStatus, SavingAccountType
 from app.models.transaction import Transaction
-from app.schemas.transaction import RegisterYieldCreate, ReverseRequest, TransactionCreate, TransactionDescriptionUpdate, TransactionRead, TransactionUpdateLimited, TransferCreate
+from app.schemas.transaction import RegisterYieldCreate, ReverseRequest, TransactionBatchResult, TransactionCreate, TransactionDescriptionUpdate, TransactionRead, TransactionUpdateLimited, TransferCreate
 from app.core.security import get_current_user_with_subscription_check
+import csv
 import datetime as dt
-from typing import Optional, List
+from typing import Literal, Optional, List
 from fastapi import Query
 from app.schemas.transaction import TransactionWithCategoryRead
 from sqlalchemy.orm import joinedload
-from sqlalchemy import func
+from sqlalchemy import func, tuple_
 from app.utils.category_helpers import get_or_create_transfer_category
+from app.utils.account_helpers import adjust_balance, lock_accounts, signed_amount
+from app.utils.ledger_helpers import register_ledger_change
+from app.utils.cache_helpers import bump_data_version, cached_response
+from app.utils.idempotency_helpers import claim_idempotency_key, save_idempotent_response
+from app.utils.import_helpers import StatementImporter, iter_csv_rows, iter_ofx_rows
+from app.utils.export_helpers import export_query, stream_csv, stream_ndjson, stream_parquet
+from app.utils.transaction_helpers import apply_transaction_filters, decode_cursor, encode_cursor, text_search
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
+def _post_transaction(
+    session: Session,
+    user_id: UUID,
+    transaction_data: TransactionCreate,
+    category: Optional[Category],
+    account: Optional[SavingAccount],
+) -> Transaction:
+    """
+    Valida y registra un ingreso/gasto (y su comisión) sobre la cuenta ya cargada.
+    No hace commit: lo usan la creación individual y la creación por lotes.
+    """
+    if transaction_data.amount <= 0:
+        raise HTTPException(status_code=400, detail="El monto debe ser mayor a cero.")
+    if transaction_data.transaction_fee < 0:
+        raise HTTPException(status_code=400, detail="La comisión no puede ser negativa.")
+
+    if not category:
+        raise HTTPException(status_code=400, detail="Categoría inválida")
+
+    if transaction_data.saving_account_id is None:
+        raise HTTPException(status_code=400, detail="Se requiere una cuenta asociada.")
+
+    if not account:
+        raise HTTPException(status_code=400, detail="Cuenta de ahorro inválida")
+    if account.status != SavingAccountStatus.active:
+        raise HTTPException(status_code=400, detail="La cuenta no está activa.")
+
+    net_amount = transaction_data.amount
+    if transaction_data.type == TransactionType.income:
+        net_amount -= transaction_data.transaction_fee
+        if net_amount < 0:
+            raise HTTPException(status_code=400, detail="La comisión excede el monto de ingreso.")
+        adjust_balance(session, account.id, net_amount)
+    elif transaction_data.type == TransactionType.expense:
+        total_amount = transaction_data.amount + transaction_data.transaction_fee
+        # La validación de fondos y el descuento son la misma sentencia
+        if adjust_balance(session, account.id, -total_amount, require_funds=True) is None:
+            raise HTTPException(status_code=400, detail="Fondos insuficientes para cubrir el gasto y la comisión.")
+
+    # ✅ Solución para evitar duplicidad de 'date':
+    data = transaction_data.dict()
+    if data.get("date") is None:
+        data["date"] = dt.datetime.utcnow()
+
+    transaction = Transaction(
+        **data,
+        user_id=user_id
+    )
+    session.add(transaction)
+    register_ledger_change(session, transaction)
+
+    # Registrar transacción de comisión separada si se desea visibilidad en reportes
+    if transaction_data.transaction_fee > 0:
+        fee_transaction = Transaction(
+            user_id=user_id,
+            amount=transaction_data.transaction_fee,
+            transaction_fee=0.0,
+            description=f"Comisión por transacción: {transaction_data.description}",
+            type=TransactionType.expense,
+            saving_account_id=transaction_data.saving_account_id,
+            category_id=transaction_data.category_id,
+            date=data["date"]
+        )
+        session.add(fee_transaction)
+        register_ledger_change(session, fee_transaction)
+
+    return transaction
+
+
 @router.post("", response_model=TransactionRead)
 @router.post("/", response_model=TransactionRead)
 def create_transaction(
     transaction_data: TransactionCreate,
-    user_id: UUID = Depends(get_current_user_with_subscription_check)
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     with Session(engine) as session:
-        if transaction_data.amount <= 0:
-            raise HTTPException(status_code=400, detail="El monto debe ser mayor a cero.")
-        if transaction_data.transaction_fee < 0:
-            raise HTTPException(status_code=400, detail="La comisión no puede ser negativa.")
+        replay = claim_idempotency_key(session, user_id, idempotency_key, "POST /transactions", transaction_data)
+        if replay is not None:
+            return replay
 
         category = session.exec(
             select(Category).where(
@@ -39,70 +116,83 @@ def create_transaction(
                 Category.user_id == user_id
             )
         ).first()
-        if not category:
-            raise HTTPException(status_code=400, detail="Categoría inválida")
-
-        if transaction_data.saving_account_id is None:
-            raise HTTPException(status_code=400, detail="Se requiere una cuenta asociada.")
 
-        account = session.exec(
-            select(SavingAccount).where(
-                SavingAccount.id == transaction_data.saving_account_id,
-                SavingAccount.user_id == user_id
+        account = None
+        if transaction_data.saving_account_id is not None:
+            account = lock_accounts(session, user_id, [transaction_data.saving_account_id]).get(
+                transaction_data.saving_account_id
             )
-        ).first()
-        if not account:
-            raise HTTPException(status_code=400, detail="Cuenta de ahorro inválida")
-        if account.status != SavingAccountStatus.active:
-            raise HTTPException(status_code=400, detail="La cuenta no está activa.")
 
-        net_amount = transaction_data.amount
-        if transaction_data.type == TransactionType.income:
-            net_amount -= transaction_data.transaction_fee
-            if net_amount < 0:
-                raise HTTPException(status_code=400, detail="La comisión excede el monto de ingreso.")
-            account.balance += net_amount
-        elif transaction_data.type == TransactionType.expense:
-            total_amount = transaction_data.amount + transaction_data.transaction_fee
-            if account.balance < total_amount:
-                raise HTTPException(status_code=400, detail="Fondos insuficientes para cubrir el gasto y la comisión.")
-            account.balance -= total_amount
-
-        session.add(account)
-
-        # ✅ Solución para evitar duplicidad de 'date':
-        data = transaction_data.dict()
-        if data.get("date") is None:
-            data["date"] = dt.datetime.utcnow()
-
-        transaction = Transaction(
-            **data,
-            user_id=user_id
-        )
-        session.add(transaction)
-
-        # Registrar transacción de comisión separada si se desea visibilidad en reportes
-        if transaction_data.transaction_fee > 0:
-            fee_transaction = Transaction(
-                user_id=user_id,
-                amount=transaction_data.transaction_fee,
-                transaction_fee=0.0,
-                description=f"Comisión por transacción: {transaction_data.description}",
-                type=TransactionType.expense,
-                saving_account_id=transaction_data.saving_account_id,
-                category_id=transaction_data.category_id,
-                date=data["date"]
-            )
-            session.add(fee_transaction)
+        transaction = _post_transaction(session, user_id, transaction_data, category, account)
 
+        save_idempotent_response(session, user_id, idempotency_key, TransactionRead.model_validate(transaction, from_attributes=True))
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(transaction)
         return transaction
+
+
+MAX_BATCH_SIZE = 500
+
+
+@router.post("/batch", response_model=List[TransactionBatchResult])
+def create_transactions_batch(
+    items: List[TransactionCreate],
+    user_id: UUID = Depends(get_current_user_with_subscription_check)
+):
+    """
+    Crea varias transacciones en una sola sesión y un solo commit (todo o nada).
+    Categorías y cuentas se cargan con un IN cada una; los saldos se validan en
+    orden, así que un gasto puede usar el ingreso de un ítem anterior del lote.
+    Si algún ítem falla no se guarda nada y el 400 trae el error de cada ítem.
+    """
+    if not items:
+        raise HTTPException(status_code=400, detail="El lote está vacío.")
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"El lote admite máximo {MAX_BATCH_SIZE} transacciones.")
+
+    with Session(engine) as session:
+        category_ids = {item.category_id for item in items if item.category_id is not None}
+        account_ids = {item.saving_account_id for item in items if item.saving_account_id is not None}
+        categories = {
+            category.id: category
+            for category in session.exec(
+                select(Category).where(Category.user_id == user_id, Category.id.in_(category_ids))
+            ).all()
+        }
+        accounts = lock_accounts(session, user_id, account_ids)
+
+        created: List[Transaction] = []
+        errors = []
+        for index, item in enumerate(items):
+            try:
+                created.append(_post_transaction(
+                    session, user_id, item,
+                    categories.get(item.category_id),
+                    accounts.get(item.saving_account_id),
+                ))
+            except HTTPException as exc:
+                errors.append({"index": index, "error": exc.detail})
+
+        if errors:
+            session.rollback()
+            raise HTTPException(status_code=400, detail={"message": "El lote no se guardó.", "errors": errors})
+
+        bump_data_version(session, user_id)
+        session.commit()
+        for transaction in created:
+            session.refresh(transaction)
+
+        return [
+            TransactionBatchResult(index=index, transaction=TransactionRead.model_validate(transaction, from_attributes=True))
+            for index, transaction in enumerate(created)
+        ]
     
 @router.post("/transfer", response_model=List[TransactionRead])
 def create_transfer(
     transfer_data: TransferCreate,
-    user_id: UUID = Depends(get_current_user_with_subscription_check)
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     
     if transfer_data.from_account_id == transfer_data.to_account_id:
@@ -113,8 +203,13 @@ def create_transfer(
         raise HTTPException(status_code=400, detail="La comisión no puede ser negativa.")
 
     with Session(engine) as session:
-        from_account = session.get(SavingAccount, transfer_data.from_account_id)
-        to_account = session.get(SavingAccount, transfer_data.to_account_id)
+        replay = claim_idempotency_key(session, user_id, idempotency_key, "POST /transactions/transfer", transfer_data)
+        if replay is not None:
+            return replay
+
+        accounts = lock_accounts(session, user_id, [transfer_data.from_account_id, transfer_data.to_account_id])
+        from_account = accounts.get(transfer_data.from_account_id)
+        to_account = accounts.get(transfer_data.to_account_id)
 
         if not from_account or from_account.user_id != user_id:
             raise HTTPException(status_code=400, detail="Cuenta de origen inválida")
@@ -137,7 +232,7 @@ def create_transfer(
             converted_amount = transfer_data.amount
 
         total_deduction = transfer_data.amount + transfer_data.transaction_fee
-        if from_account.balance < total_deduction:
+        if adjust_balance(session, from_account.id, -total_deduction, require_funds=True) is None:
             raise HTTPException(status_code=400, detail="Fondos insuficientes en la cuenta de origen para cubrir la transferencia y la comisión.")
 
         now = dt.datetime.utcnow()
@@ -177,11 +272,12 @@ def create_transfer(
             transfer_group_id=transfer_group_id,
         )
 
-        # Actualizar balances
-        from_account.balance -= total_deduction
-        to_account.balance += converted_amount
+        # El origen ya se descontó al validar fondos
+        adjust_balance(session, to_account.id, converted_amount)
 
-        session.add_all([from_tx, to_tx, from_account, to_account])
+        session.add_all([from_tx, to_tx])
+        register_ledger_change(session, from_tx)
+        register_ledger_change(session, to_tx)
 
         # Registrar transacción de comisión separada si se desea trazabilidad
         if transfer_data.transaction_fee > 0:
@@ -196,7 +292,12 @@ def create_transfer(
                 date=now
             )
             session.add(fee_tx)
+            register_ledger_change(session, fee_tx)
 
+        save_idempotent_response(session, user_id, idempotency_key, [
+            TransactionRead.model_validate(t, from_attributes=True) for t in (from_tx, to_tx)
+        ])
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(from_tx)
         session.refresh(to_tx)
@@ -214,8 +315,8 @@ def register_yield(
         if data.amount <= 0:
             raise HTTPException(status_code=400, detail="El monto debe ser positivo.")
 
-        account = session.get(SavingAccount, account_id)
-        if not account or account.user_id != user_id:
+        account = lock_accounts(session, user_id, [account_id]).get(account_id)
+        if not account:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
         if account.status != SavingAccountStatus.active:
             raise HTTPException(status_code=400, detail="La cuenta no está activa.")
@@ -225,8 +326,7 @@ def register_yield(
                 detail="Solo puedes registrar rendimientos en cuentas de tipo inversión."
             )
 
-        account.balance += data.amount
-        session.add(account)
+        adjust_balance(session, account.id, data.amount)
 
         tx = Transaction(
             user_id=user_id,
@@ -239,6 +339,8 @@ def register_yield(
             source_type="investment_yield",
         )
         session.add(tx)
+        register_ledger_change(session, tx)
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(tx)
 
@@ -255,28 +357,21 @@ def list_transactions_with_category(
     source: Optional[str] = Query(None),  # ✅ nuevo filtro
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    include_reversals: bool = Query(False)
+    include_reversals: bool = Query(False),
+    cursor: Optional[str] = Query(
+        None, description="Paginación por cursor: vacío para la primera página, luego el next_cursor recibido"
+    ),
+    include_total: bool = Query(True, description="En modo cursor el total es opcional (se cachea por versión de datos)"),
+    q: Optional[str] = Query(None, description="Búsqueda en la descripción; ordena por relevancia"),
 ):
+    q = q.strip() if q else None
+    filters = dict(
+        start_date=start_date, end_date=end_date, category_id=category_id,
+        type=type, source=source, include_reversals=include_reversals, q=q,
+    )
+
     with Session(engine) as session:
-        query = select(Transaction).where(Transaction.user_id == user_id)
-
-        if start_date:
-            query = query.where(Transaction.date >= start_date)
-        if end_date:
-            query = query.where(Transaction.date <= end_date)
-        if category_id:
-            query = query.where(Transaction.category_id == category_id)
-        if type in ["income", "expense", "transfer"]:
-            query = query.where(Transaction.type == type)
-
-        # ✅ Filtro por fuente
-        if source == "account":
-            query = query.where(Transaction.debt_id == None)
-        elif source == "credit_card":
-            query = query.where(Transaction.debt_id != None)
-
-        if not include_reversals:
-            query = query.where(Transaction.reversed_transaction_id == None)
+        query = apply_transaction_filters(select(Transaction), user_id, **filters)
 
         query = query.options(
             joinedload(Transaction.category),
@@ -284,9 +379,47 @@ def list_transactions_with_category(
             joinedload(Transaction.to_account),
             joinedload(Transaction.debt),
             joinedload(Transaction.saving_account)
-        ).order_by(Transaction.date.desc())
+        )
+        if q:
+            query = query.order_by(text_search(q)[1].desc())
+        query = query.order_by(Transaction.date.desc(), Transaction.id.desc())
+
+        def count():
+            return cached_response(
+                session, user_id, "transactions-count", filters,
+                lambda: session.exec(
+                    apply_transaction_filters(select(func.count(Transaction.id)), user_id, **filters)
+                ).one(),
+            )
 
-        total = session.exec(select(func.count()).select_from(query.subquery())).one()
+        if cursor is not None and q:
+            raise HTTPException(status_code=400, detail="La búsqueda se pagina por página, no por cursor.")
+
+        if cursor is not None:
+            # Keyset: (date, id) < último visto; costo constante a cualquier profundidad
+            if cursor:
+                try:
+                    last_date, last_id = decode_cursor(cursor)
+                except ValueError as exc:
+                    raise HTTPException(status_code=400, detail=str(exc))
+                query = query.where(tuple_(Transaction.date, Transaction.id) < tuple_(last_date, last_id))
+
+            rows = session.exec(query.limit(page_size + 1)).all()
+            has_more = len(rows) > page_size
+            transactions = rows[:page_size]
+
+            return {
+                "items": [
+                    TransactionWithCategoryRead.model_validate(t, from_attributes=True).model_dump()
+                    for t in transactions
+                ],
+                "next_cursor": encode_cursor(transactions[-1].date, transactions[-1].id) if has_more else None,
+                "has_more": has_more,
+                "page_size": page_size,
+                "total": count() if include_total else None,
+            }
+
+        total = count()
 
         transactions = session.exec(
             query.offset((page - 1) * page_size).limit(page_size)
@@ -307,6 +440,74 @@ def list_transactions_with_category(
     
 
 
+@router.post("/import")
+def import_transactions(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ofx"]] = Form(None),
+    saving_account_id: Optional[int] = Form(None),
+    category_id: Optional[int] = Form(None),
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+):
+    """
+    Importa un extracto CSV (date, amount, description, [type], [category|category_id],
+    [saving_account_id]) u OFX. `saving_account_id` y `category_id` son los valores
+    por defecto de las filas que no los traen. Las filas inválidas se reportan y se omiten.
+    """
+    format = format or ("ofx" if (file.filename or "").lower().endswith((".ofx", ".qfx")) else "csv")
+    rows = iter_ofx_rows(file.file) if format == "ofx" else iter_csv_rows(file.file)
+
+    with Session(engine) as session:
+        importer = StatementImporter(session, user_id, saving_account_id, category_id)
+        try:
+            for line, row in rows:
+                importer.add(line, row)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise HTTPException(status_code=400, detail=f"No fue posible leer el archivo: {exc}")
+
+        report = importer.finish()
+        session.commit()
+        return report
+
+
+@router.get("/export")
+def export_transactions(
+    user_id: UUID = Depends(get_current_user_with_subscription_check),
+    format: Literal["csv", "ndjson", "parquet"] = Query("csv"),
+    start_date: Optional[dt.datetime] = Query(None, alias="startDate"),
+    end_date: Optional[dt.datetime] = Query(None, alias="endDate"),
+    category_id: Optional[int] = Query(None, alias="categoryId"),
+    type: Optional[TransactionType] = Query(None),
+    source: Optional[str] = Query(None),
+    include_reversals: bool = Query(False),
+    q: Optional[str] = Query(None),
+):
+    """Exporta todo el libro filtrado como CSV, NDJSON o Parquet, en streaming y sin paginar."""
+    query = export_query(
+        user_id,
+        start_date=start_date, end_date=end_date, category_id=category_id,
+        type=type, source=source, include_reversals=include_reversals, q=q,
+    )
+    stamp = dt.datetime.utcnow().strftime("%Y%m%d")
+
+    if format == "parquet":
+        return StreamingResponse(
+            stream_parquet(query),
+            media_type="application/vnd.apache.parquet",
+            headers={"Content-Disposition": f'attachment; filename="transacciones-{stamp}.parquet"'},
+        )
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_ndjson(query),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="transacciones-{stamp}.ndjson"'},
+        )
+    return StreamingResponse(
+        stream_csv(query),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="transacciones-{stamp}.csv"'},
+    )
+
+
 @router.patch("/{transaction_id}", response_model=TransactionRead)
 def update_transaction_limited(
     transaction_id: int,
@@ -317,13 +518,21 @@ def update_transaction_limited(
         raise HTTPException(status_code=400, detail="Nada para actualizar.")
 
     with Session(engine) as session:
-        tx = session.exec(
-            select(Transaction).where(
-                Transaction.id == transaction_id,
-                Transaction.user_id == user_id
-            )
-        ).first()
+        query = select(Transaction).where(
+            Transaction.id == transaction_id,
+            Transaction.user_id == user_id
+        )
+        tx = session.exec(query).first()
+
+        if not tx:
+            raise HTTPException(status_code=404, detail="Transacción no encontrada")
 
+        # Cambiar la fecha reescribe balance_after y los snapshots de la cuenta: se bloquea
+        # la cuenta antes (cuentas y luego usuario, como el resto de escrituras) y se
+        # relee la fila ya con el bloqueo tomado
+        if tx.saving_account_id is not None:
+            lock_accounts(session, user_id, [tx.saving_account_id])
+        tx = session.exec(query.with_for_update().execution_options(populate_existing=True)).first()
         if not tx:
             raise HTTPException(status_code=404, detail="Transacción no encontrada")
 
@@ -337,6 +546,9 @@ def update_transaction_limited(
         if tx.type not in [TransactionType.income, TransactionType.expense]:
             raise HTTPException(status_code=400, detail="Solo puedes editar ingresos o egresos")
 
+        # Sale de los acumulados con sus valores actuales; vuelve a entrar al final
+        register_ledger_change(session, tx, -1)
+
         # Validar categoría (si viene)
         if data.category_id is not None:
             category = session.exec(
@@ -372,6 +584,8 @@ def update_transaction_limited(
             tx.date = new_dt
 
         session.add(tx)
+        register_ledger_change(session, tx)
+        bump_data_version(session, user_id)
         session.commit()
         session.refresh(tx)
         return TransactionRead.model_validate(tx, from_attributes=True)
@@ -394,33 +608,17 @@ def delete_transaction(
         if not transaction:
             raise HTTPException(status_code=404, detail="Transacción no encontrada")
 
-        # Ajuste de balances antes de eliminar
-        if transaction.type in [TransactionType.income, TransactionType.expense]:
-            if transaction.saving_account_id is not None:
-                account = session.get(SavingAccount, transaction.saving_account_id)
-                if account:
-                    if transaction.type == TransactionType.income:
-                        account.balance -= transaction.amount
-                    elif transaction.type == TransactionType.expense:
-                        account.balance += transaction.amount
-                    session.add(account)
-
-        # Si es transferencia, ajustar ambas cuentas
-        if transaction.from_account_id and transaction.to_account_id:
-            from_account = session.get(SavingAccount, transaction.from_account_id)
-            to_account = session.get(SavingAccount, transaction.to_account_id)
-            if from_account and to_account:
-                # Se asume que las transferencias se crean como:
-                # - salida: expense en cuenta origen
-                # - entrada: income en cuenta destino
-                if transaction.type == TransactionType.expense:
-                    from_account.balance += transaction.amount  # Revertir egreso
-                elif transaction.type == TransactionType.income:
-                    to_account.balance -= transaction.amount   # Revertir ingreso
-                session.add_all([from_account, to_account])
+        # Revertir el efecto de la fila sobre su cuenta, con la cuenta bloqueada y en
+        # una sola sentencia. Cada pata de una transferencia lleva su propio
+        # saving_account_id, así que se revierte igual que un ingreso o gasto.
+        if transaction.saving_account_id is not None:
+            if lock_accounts(session, user_id, [transaction.saving_account_id]):
+                adjust_balance(session, transaction.saving_account_id, -signed_amount(transaction))
 
         # Eliminar transacción
+        register_ledger_change(session, transaction, -1)
         session.delete(transaction)
+        bump_data_version(session, user_id)
         session.commit()
 
         return {"message": "Transacción eliminada correctamente"}
@@ -472,6 +670,25 @@ def reverse_transaction(
                     raise HTTPException(status_code=400, detail="La transacción complementaria de la transferencia ya está cancelada.")
                 transactions_to_reverse.append(complementary_tx)
 
+        # Bloqueos en el orden de pay_debt (deudas, luego cuentas); con ellos tomados se
+        # vuelve a leer la original, que una reversa concurrente pudo haber cancelado
+        debt_ids = sorted({t.debt_id for t in transactions_to_reverse if t.debt_id and t.source_type == "credit_card_purchase"})
+        debts = {
+            debt.id: debt
+            for debt in session.exec(
+                select(Debt)
+                .where(Debt.id.in_(debt_ids), Debt.user_id == user_id)
+                .order_by(Debt.id)
+                .with_for_update()
+                .execution_options(populate_existing=True)
+            ).all()
+        } if debt_ids else {}
+        accounts = lock_accounts(session, user_id, [t.saving_account_id for t in transactions_to_reverse if t.saving_account_id])
+        for t in transactions_to_reverse:
+            session.refresh(t, with_for_update=True)
+            if t.is_cancelled:
+                raise HTTPException(status_code=400, detail="Esta transacción ya está cancelada.")
+
         reversed_transactions = []
 
         for t in transactions_to_reverse:
@@ -497,28 +714,17 @@ def reverse_transaction(
                 source_type="credit_card_purchase_reversal" if t.source_type == "credit_card_purchase" else None,
             )
 
-            # Ajustar balances de cuenta (solo si existía saving_account_id)
-            if t.saving_account_id:
-                account = session.exec(
-                    select(SavingAccount).where(
-                        SavingAccount.id == t.saving_account_id,
-                        SavingAccount.user_id == user_id
-                    )
-                ).first()
-                if account:
-                    if inverse_type == TransactionType.income:
-                        account.balance += inverse_amount
-                    else:
-                        if account.balance < inverse_amount:
-                            raise HTTPException(status_code=400, detail=f"Fondos insuficientes en la cuenta {account.name} para reversar.")
-                        account.balance -= inverse_amount
-                    session.add(account)
-
-            # 👇 NUEVO: si era compra con TC, ajustamos la deuda
+            # Ajustar balances de cuenta (solo si existía saving_account_id), en una sola sentencia
+            account = accounts.get(t.saving_account_id)
+            if account:
+                if inverse_type == TransactionType.income:
+                    adjust_balance(session, account.id, inverse_amount)
+                elif adjust_balance(session, account.id, -inverse_amount, require_funds=True) is None:
+                    raise HTTPException(status_code=400, detail=f"Fondos insuficientes en la cuenta {account.name} para reversar.")
+
+            # 👇 NUEVO: si era compra con TC, ajustamos la deuda (ya bloqueada)
             if t.debt_id and t.source_type == "credit_card_purchase":
-                debt = session.exec(
-                    select(Debt).where(Debt.id == t.debt_id, Debt.user_id == user_id)
-                ).first()
+                debt = debts.get(t.debt_id)
                 if not debt:
                     raise HTTPException(status_code=400, detail="Deuda asociada no encontrada.")
 
@@ -526,33 +732,34 @@ def reverse_transaction(
                 debt.total_amount = (debt.total_amount or 0) - inverse_amount
                 session.add(debt)
 
-                # (Opcional) Registrar un movimiento en el ledger de la deuda:
-                # try:
-                #     from app.models.debt_transaction import DebtTransaction, DebtTransactionType
+                # Asiento en el subledger de la deuda (monto positivo, tipo que descuenta)
                 session.add(DebtTransaction(
                     user_id=user_id,
                     debt_id=debt.id,
-                    amount=inverse_amount,  # positivo, pero tipo "charge_reversal"
-                    type=DebtTransactionType.charge_reversal if hasattr(DebtTransactionType, "charge_reversal") else DebtTransactionType.extra_charge,
+                    amount=inverse_amount,
+                    type=DebtTransactionType.charge_reversal,
                     description=_build_reversal_description(t, data.note),
                     date=reversed_tx.date,
                 ))
-                # except Exception:
-                #     # Si no existe el enum/tipo, puedes omitir el asiento o guardar un extra_charge negativo:
-                #     pass
 
             # Marcar original como cancelada y guardar nota
+            register_ledger_change(session, t, -1)
             t.is_cancelled = True
             t.reversal_note = data.note
             session.add(t)
+            register_ledger_change(session, t)
 
             # Guardar reversa
             session.add(reversed_tx)
-            session.commit()
-            session.refresh(reversed_tx)
-
+            register_ledger_change(session, reversed_tx)
             reversed_transactions.append(reversed_tx)
 
+        # Un solo commit: las dos patas de una transferencia se reversan juntas o ninguna
+        bump_data_version(session, user_id)
+        session.commit()
+        for reversed_tx in reversed_transactions:
+            session.refresh(reversed_tx)
+
         return TransactionRead.model_validate(reversed_transactions[0], from_attributes=True)
     
 
@@ -5,4 +5,16 @@ load_dotenv()  # Carga automáticamente desde .env
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+
+# Caché en memoria de respuestas de reportes (por proceso)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 2048))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 300))
+
+# Idempotency-Key en POST que mueven dinero: cuánto se guarda la respuesta para reintentos
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", 60 * 60 * 24))
+
+# Tasas de cambio: se refrescan en segundo plano cada tanto (0 desactiva el refresco);
+# los requests solo salen a la red si el par nunca se ha obtenido, con este timeout
+FX_REFRESH_INTERVAL_SECONDS = int(os.getenv("FX_REFRESH_INTERVAL_SECONDS", 60 * 60 * 6))
+FX_REQUEST_TIMEOUT_SECONDS = float(os.getenv("FX_REQUEST_TIMEOUT_SECONDS", 3))
@@ -1,14 +1,20 @@
+import asyncio
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.database import create_db_and_tables
 from app.api import auth, auth_extra, cash_flow, categories,  debts, saving_accounts, subscriptions, subscriptions_admin, summary, summary_extra, transactions
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes.fx import router as fx_router
+from app.core.config import FX_REFRESH_INTERVAL_SECONDS
+from app.routes.fx import refresh_rates_forever, router as fx_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
+    # Tasas de cambio refrescadas fuera del camino de los requests
+    fx_refresh = asyncio.create_task(refresh_rates_forever(FX_REFRESH_INTERVAL_SECONDS)) if FX_REFRESH_INTERVAL_SECONDS > 0 else None
     yield  # Aquí podrías hacer cleanup en shutdown si lo necesitas
+    if fx_refresh:
+        fx_refresh.cancel()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -3,8 +3,12 @@ from .category import *
 from .debt_transaction import *
 from .debt import *
 from .enums import *
+from .idempotency_key import *
 from .investment import *
+from .monthly_snapshot import *
 from .saving_account import *
+from .saving_account_balance_snapshot import *
 from .subscription import *
 from .transaction import *
+from .transaction_rollup import *
 from .user import *
\ No newline at end of file
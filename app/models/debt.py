@@ -4,7 +4,7 @@ from enum import Enum
 from sqlmodel import Relationship, SQLModel, Field
 from uuid import UUID
 from typing import List, Optional
-from datetime import date
+from datetime import date, datetime
 
 from app.models.saving_account import Currency
 from typing import TYPE_CHECKING
@@ -25,9 +25,12 @@ class Debt(SQLModel, table=True):
     user_id: UUID = Field(foreign_key="user.id")
     name: str  # Ej: "Préstamo Bancolombia", "Tarjeta Visa"
     total_amount: float  # Monto total adeudado
+    initial_amount: float = 0.0  # Saldo al crear la deuda: total_amount = initial_amount + efecto del subledger
     interest_rate: float  # En porcentaje anual
     due_date: Optional[date] = None  # Fecha de vencimiento
     status: DebtStatus = Field(default=DebtStatus.active)  # Estado de la deuda
     currency: Currency = Field(default=Currency.COP)
     transactions: List["Transaction"] = Relationship(back_populates="debt")
-    kind: DebtKind = Field(default=DebtKind.loan)
\ No newline at end of file
+    kind: DebtKind = Field(default=DebtKind.loan)
+    created_at: datetime = Field(default_factory=datetime.utcnow)  # desde cuándo cuenta en el historial
+    closed_at: Optional[datetime] = None  # hasta cuándo cuenta en el historial
\ No newline at end of file
@@ -1,6 +1,7 @@
 # app/models/debt_transaction.py
 
 from enum import Enum
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from uuid import UUID
 from typing import Optional
@@ -10,9 +11,14 @@ class DebtTransactionType(str, Enum):
     payment = "payment"
     interest_charge = "interest_charge"
     extra_charge = "extra_charge"
+    charge_reversal = "charge_reversal"  # reversa de una compra con tarjeta: baja la deuda
 
 class DebtTransaction(SQLModel, table=True):
     __tablename__ = "debt_transaction"
+    __table_args__ = (
+        Index("ix_debt_transaction_debt_date", "debt_id", "date"),  # movimientos de una deuda
+        Index("ix_debt_transaction_user_date", "user_id", "date"),  # historial de patrimonio
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: UUID = Field(foreign_key="user.id")
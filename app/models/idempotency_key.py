@@ -0,0 +1,25 @@
+# app/models/idempotency_key.py
+
+from sqlalchemy import JSON, Column, UniqueConstraint
+from sqlmodel import SQLModel, Field
+from uuid import UUID
+from typing import Any, Optional
+from datetime import datetime
+
+class IdempotencyKey(SQLModel, table=True):
+    """
+    Respuesta guardada de un POST que mueve dinero, por (usuario, Idempotency-Key).
+    Un reintento con la misma clave devuelve esta respuesta sin volver a escribir.
+    """
+    __tablename__ = "idempotency_key"
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_key_user_key"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: UUID = Field(foreign_key="user.id")
+    key: str = Field(max_length=255)
+    endpoint: str  # método y ruta, p. ej. "POST /debts/3/pay"
+    request_hash: str  # sha256 del cuerpo: la misma clave con otro cuerpo es un error del cliente
+    response: Optional[Any] = Field(default=None, sa_column=Column(JSON))
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)  # para expirar por TTL
@@ -0,0 +1,28 @@
+# app/models/monthly_snapshot.py
+
+from sqlalchemy import JSON, Column, UniqueConstraint
+from sqlmodel import SQLModel, Field
+from uuid import UUID
+from typing import Optional
+from datetime import date, datetime
+
+from app.models.saving_account import Currency
+
+class MonthlySnapshot(SQLModel, table=True):
+    """
+    Resultado congelado de un reporte (summary / cash_flow) para un mes cerrado.
+    Se borra cuando una escritura toca ese mes.
+    """
+    __tablename__ = "monthly_snapshot"
+    __table_args__ = (
+        UniqueConstraint("user_id", "kind", "tz", "month", "currency", name="uq_monthly_snapshot_key"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: UUID = Field(foreign_key="user.id", index=True)
+    kind: str  # "summary" | "cash_flow"
+    tz: str = Field(default="UTC")
+    month: date  # primer día del mes (local)
+    currency: Currency
+    payload: dict = Field(sa_column=Column(JSON, nullable=False))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -28,7 +28,9 @@ class SavingAccount(SQLModel, table=True):
     name: str
     type: SavingAccountType
     balance: float = 0.0
+    opening_balance: float = 0.0  # saldo con el que se creó la cuenta (fuera del libro mayor)
     currency: Currency = Field(default=Currency.COP)
 
     status: SavingAccountStatus = Field(default=SavingAccountStatus.active)
-    closed_at: Optional[datetime] = None
\ No newline at end of file
+    closed_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)  # desde cuándo cuenta en el historial
\ No newline at end of file
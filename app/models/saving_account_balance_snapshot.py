@@ -0,0 +1,24 @@
+# app/models/saving_account_balance_snapshot.py
+
+from sqlalchemy import UniqueConstraint
+from sqlmodel import SQLModel, Field
+from uuid import UUID
+from typing import Optional
+from datetime import date
+
+class SavingAccountBalanceSnapshot(SQLModel, table=True):
+    """
+    Saldo de una cuenta al cierre de un día UTC. Solo hay filas para días con
+    movimientos: el saldo en una fecha es el del último snapshot <= fecha
+    (o el saldo inicial de la cuenta si no hay ninguno).
+    """
+    __tablename__ = "saving_account_balance_snapshot"
+    __table_args__ = (
+        UniqueConstraint("saving_account_id", "day", name="uq_balance_snapshot_account_day"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: UUID = Field(foreign_key="user.id", index=True)
+    saving_account_id: int = Field(foreign_key="saving_account.id")
+    day: date
+    balance: float
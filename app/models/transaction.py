@@ -1,4 +1,5 @@
 from uuid import UUID
+from sqlalchemy import DDL, Index, event, func, literal, literal_column, text
 from sqlmodel import SQLModel, Field
 from typing import Optional
 from datetime import datetime
@@ -13,7 +14,28 @@ from sqlmodel import Relationship
 
 from app.models.saving_account import SavingAccount
 
+# Condición de los índices parciales: solo filas vigentes (ni canceladas ni reversas)
+_ACTIVE_ROWS = text("NOT is_cancelled AND reversed_transaction_id IS NULL")
+
 class Transaction(SQLModel, table=True):
+    __table_args__ = (
+        # Listado paginado (offset y cursor), exportaciones y filtros por fecha
+        Index("ix_transaction_user_date_id", "user_id", "date", "id"),
+        # Reportes desde el libro mayor (summary, reconstrucción de acumulados)
+        Index("ix_transaction_user_date_active", "user_id", "date",
+              postgresql_where=_ACTIVE_ROWS, sqlite_where=_ACTIVE_ROWS),
+        # Movimientos por cuenta ordenados por fecha y saldos diarios
+        Index("ix_transaction_saving_account_date", "saving_account_id", "date"),
+        Index("ix_transaction_from_account_id", "from_account_id",
+              postgresql_where=text("from_account_id IS NOT NULL"), sqlite_where=text("from_account_id IS NOT NULL")),
+        Index("ix_transaction_to_account_id", "to_account_id",
+              postgresql_where=text("to_account_id IS NOT NULL"), sqlite_where=text("to_account_id IS NOT NULL")),
+        Index("ix_transaction_debt_id", "debt_id",
+              postgresql_where=text("debt_id IS NOT NULL"), sqlite_where=text("debt_id IS NOT NULL")),
+        Index("ix_transaction_category_id", "category_id",
+              postgresql_where=text("category_id IS NOT NULL"), sqlite_where=text("category_id IS NOT NULL")),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: UUID = Field(foreign_key="user.id")
     amount: float
@@ -28,6 +50,8 @@ class Transaction(SQLModel, table=True):
     source_type: Optional[str] = Field(default=None, nullable=True)
     transfer_group_id: Optional[UUID] = Field(default=None, index=True)
     reversal_note: Optional[str] = Field(default=None, max_length=500)
+    # Saldo de saving_account_id después de esta fila (orden date, id); lo mantiene register_ledger_change
+    balance_after: Optional[float] = Field(default=None)
 
     
     
@@ -53,4 +77,45 @@ class Transaction(SQLModel, table=True):
     })
     to_account: Optional[SavingAccount] = Relationship(sa_relationship_kwargs={
         "foreign_keys": "[Transaction.to_account_id]"
-    })
\ No newline at end of file
+    })
+
+
+# --- Búsqueda de texto en description ---------------------------------------
+# Postgres: índice GIN de tsvector (búsqueda por palabras, con stemming en
+# español) y GIN de trigramas (búsqueda aproximada / con errores de tipeo).
+SEARCH_CONFIG = literal_column("'spanish'::regconfig")
+
+def description_tsvector(description):
+    return func.to_tsvector(SEARCH_CONFIG, func.coalesce(description, literal("")))
+
+Index(
+    "ix_transaction_description_fts",
+    description_tsvector(Transaction.__table__.c.description),
+    postgresql_using="gin",
+).ddl_if(dialect="postgresql")
+
+Index(
+    "ix_transaction_description_trgm",
+    Transaction.__table__.c.description,
+    postgresql_using="gin",
+    postgresql_ops={"description": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
+event.listen(
+    Transaction.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+# SQLite (entorno local): tabla FTS5 de contenido externo sincronizada por triggers
+for statement in (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS transaction_fts
+       USING fts5(description, content='transaction', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_fts_ai AFTER INSERT ON "transaction" BEGIN
+       INSERT INTO transaction_fts(rowid, description) VALUES (new.id, new.description); END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_fts_ad AFTER DELETE ON "transaction" BEGIN
+       INSERT INTO transaction_fts(transaction_fts, rowid, description) VALUES ('delete', old.id, old.description); END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_fts_au AFTER UPDATE OF description ON "transaction" BEGIN
+       INSERT INTO transaction_fts(transaction_fts, rowid, description) VALUES ('delete', old.id, old.description);
+       INSERT INTO transaction_fts(rowid, description) VALUES (new.id, new.description); END""",
+):
+    event.listen(Transaction.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -0,0 +1,45 @@
+# app/models/transaction_rollup.py
+
+from sqlalchemy import Index, func, literal_column
+from sqlmodel import SQLModel, Field
+from uuid import UUID
+from typing import Optional
+from datetime import datetime
+
+from app.models.enums import TransactionType
+from app.models.saving_account import Currency
+
+class TransactionRollup(SQLModel, table=True):
+    """
+    Acumulado de ingresos/gastos vigentes (no cancelados ni reversas) por
+    usuario, moneda, hora UTC, categoría, tipo y origen. Se mantiene en la
+    misma transacción de BD que cada escritura del libro mayor.
+    """
+    __tablename__ = "transaction_rollup"
+    __table_args__ = (
+        Index("ix_transaction_rollup_user_bucket", "user_id", "bucket"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: UUID = Field(foreign_key="user.id")
+    currency: Currency
+    bucket: datetime  # inicio de la hora UTC (naive)
+    category_id: Optional[int] = Field(default=None, foreign_key="category.id")
+    type: TransactionType
+    source_type: Optional[str] = Field(default=None, nullable=True)
+    total: float = 0.0
+    tx_count: int = 0
+
+
+# Clave única del acumulado (NULL no se repite como valor distinto): permite
+# INSERT ... ON CONFLICT DO UPDATE con sumas atómicas en vez de leer y reescribir
+ROLLUP_KEY = (
+    TransactionRollup.__table__.c.user_id,
+    TransactionRollup.__table__.c.currency,
+    TransactionRollup.__table__.c.bucket,
+    func.coalesce(TransactionRollup.__table__.c.category_id, literal_column("0")),
+    TransactionRollup.__table__.c.type,
+    func.coalesce(TransactionRollup.__table__.c.source_type, literal_column("''")),
+)
+
+Index("uq_transaction_rollup_key", *ROLLUP_KEY, unique=True)
@@ -7,4 +7,5 @@ class User(SQLModel, table=True):
     email: str = Field(index=True, unique=True)
     hashed_password: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    role: str = Field(default="user") 
\ No newline at end of file
+    role: str = Field(default="user")
+    data_version: int = Field(default=0)  # se incrementa con cada escritura del usuario 
\ No newline at end of file
@@ -1,7 +1,11 @@
 # app/routes/fx.py
 from fastapi import APIRouter, HTTPException, Query
-from typing import Literal, Dict, Tuple
-import httpx, time
+from typing import Literal, Dict, Optional, Tuple
+import asyncio, httpx, logging, time
+
+from app.core.config import FX_REQUEST_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
 
 Currency = Literal["COP", "USD", "EUR"]
 router = APIRouter(prefix="/fx", tags=["fx"])
@@ -10,45 +14,66 @@ router = APIRouter(prefix="/fx", tags=["fx"])
 _CACHE: Dict[Tuple[str, str], Tuple[float, float]] = {}
 TTL_SECONDS = 60 * 60 * 12  # 12 horas
 
-async def fetch_rate_exchangerate_host(base: str, target: str) -> float:
+def _exchangerate_host_url(base: str, target: str) -> str:
     # https://api.exchangerate.host/convert?from=USD&to=COP
-    url = f"https://api.exchangerate.host/convert?from={base}&to={target}"
+    return f"https://api.exchangerate.host/convert?from={base}&to={target}"
+
+def _parse_exchangerate_host(data: dict, target: str) -> float:
+    if data.get("result") is not None:
+        return float(data["result"])
+    info = data.get("info", {})
+    if info.get("rate") is not None:
+        return float(info["rate"])
+    raise ValueError("No rate in response")
+
+def _open_er_api_url(base: str, target: str) -> str:
+    # https://open.er-api.com/v6/latest/USD  -> rates[target]
+    return f"https://open.er-api.com/v6/latest/{base}"
+
+def _parse_open_er_api(data: dict, target: str) -> float:
+    rates = data.get("rates", {})
+    if data.get("result") == "success" and target in rates:
+        return float(rates[target])
+    raise ValueError("No rate in response")
+
+# Proveedor primario + fallback
+_PROVIDERS = [
+    ("exchangerate.host", _exchangerate_host_url, _parse_exchangerate_host),
+    ("open.er-api.com", _open_er_api_url, _parse_open_er_api),
+]
+
+async def fetch_rate_exchangerate_host(base: str, target: str) -> float:
     async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.get(url)
+        r = await client.get(_exchangerate_host_url(base, target))
         r.raise_for_status()
-        data = r.json()
-        if data.get("result") is not None:
-            return float(data["result"])
-        info = data.get("info", {})
-        if info.get("rate") is not None:
-            return float(info["rate"])
-        raise ValueError("No rate in response")
+        return _parse_exchangerate_host(r.json(), target)
 
 async def fetch_rate_open_er_api(base: str, target: str) -> float:
-    # https://open.er-api.com/v6/latest/USD  -> rates[target]
-    url = f"https://open.er-api.com/v6/latest/{base}"
     async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.get(url)
+        r = await client.get(_open_er_api_url(base, target))
         r.raise_for_status()
-        data = r.json()
-        rates = data.get("rates", {})
-        if data.get("result") == "success" and target in rates:
-            return float(rates[target])
-        raise ValueError("No rate in response")
+        return _parse_open_er_api(r.json(), target)
 
-@router.get("/rate")
-async def get_rate(from_: Currency = Query(..., alias="from"), to: Currency = Query(...)):
+def _from_cache(from_: str, to: str, now: float, allow_stale: bool = False) -> Optional[dict]:
     if from_ == to:
-        return {"from": from_, "to": to, "rate": 1.0, "source": "identity", "as_of": int(time.time())}
+        return {"from": from_, "to": to, "rate": 1.0, "source": "identity", "as_of": int(now)}
+    if (from_, to) in _CACHE:
+        ts, rate = _CACHE[(from_, to)]
+        if allow_stale or now - ts < TTL_SECONDS:
+            return {"from": from_, "to": to, "rate": rate, "source": "cache", "as_of": int(ts)}
+    return None
+
+def _store(from_: str, to: str, now: float, rate: float, source: str) -> dict:
+    _CACHE[(from_, to)] = (now, rate)
+    return {"from": from_, "to": to, "rate": rate, "source": source, "as_of": int(now)}
 
-    key = (from_, to)
+@router.get("/rate")
+async def get_rate(from_: Currency = Query(..., alias="from"), to: Currency = Query(...)):
     now = time.time()
-    if key in _CACHE:
-        ts, rate = _CACHE[key]
-        if now - ts < TTL_SECONDS:
-            return {"from": from_, "to": to, "rate": rate, "source": "cache", "as_of": int(ts)}
+    cached = _from_cache(from_, to, now)
+    if cached:
+        return cached
 
-    # Proveedor primario + fallback
     try:
         rate = await fetch_rate_exchangerate_host(from_, to)
         source = "exchangerate.host"
@@ -59,5 +84,48 @@ async def get_rate(from_: Currency = Query(..., alias="from"), to: Currency = Qu
         except Exception:
             raise HTTPException(status_code=502, detail="No fue posible obtener la tasa de cambio")
 
-    _CACHE[key] = (now, rate)
-    return {"from": from_, "to": to, "rate": rate, "source": source, "as_of": int(now)}
+    return _store(from_, to, now, rate, source)
+
+def resolve_rate(from_: str, to: str) -> dict:
+    """
+    Versión síncrona de get_rate para endpoints `def` (corren en el threadpool).
+    Sirve la última tasa guardada aunque esté vencida (as_of indica su edad): el
+    refresco corre en segundo plano (refresh_rates_forever). Solo sale a la red,
+    con timeout corto, si el par nunca se ha obtenido en este proceso.
+    """
+    now = time.time()
+    cached = _from_cache(from_, to, now, allow_stale=True)
+    if cached:
+        return cached
+
+    with httpx.Client(timeout=FX_REQUEST_TIMEOUT_SECONDS) as client:
+        for source, build_url, parse in _PROVIDERS:
+            try:
+                r = client.get(build_url(from_, to))
+                r.raise_for_status()
+                return _store(from_, to, now, parse(r.json(), to), source)
+            except Exception:
+                continue
+
+    raise HTTPException(status_code=502, detail="No fue posible obtener la tasa de cambio")
+
+async def refresh_rates_forever(interval: float) -> None:
+    """Refresca todos los pares en la caché cada `interval` segundos, fuera de los requests."""
+    currencies = ["COP", "USD", "EUR"]
+    while True:
+        for from_ in currencies:
+            for to in currencies:
+                if from_ == to:
+                    continue
+                for source, fetch in [
+                    ("exchangerate.host", fetch_rate_exchangerate_host),
+                    ("open.er-api.com", fetch_rate_open_er_api),
+                ]:
+                    try:
+                        _store(from_, to, time.time(), await fetch(from_, to), source)
+                        break
+                    except Exception:
+                        continue
+                else:
+                    logger.warning("No fue posible refrescar la tasa %s->%s; se conserva la anterior", from_, to)
+        await asyncio.sleep(interval)
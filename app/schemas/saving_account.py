@@ -1,6 +1,6 @@
 # app/schemas/saving_account.py
 
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import BaseModel
 from uuid import UUID
 from typing import Optional
@@ -19,6 +19,13 @@ class SavingAccountRead(SavingAccountCreate):
     status: SavingAccountStatus
     closed_at: Optional[datetime] = None
 
+class SavingAccountBalanceRead(BaseModel):
+    account_id: int
+    name: str
+    currency: Currency
+    date: date
+    balance: float
+
 class SavingAccountWithdraw(BaseModel):
     amount: float = Field(..., gt=0, description="Monto a retirar")
 
@@ -1,9 +1,11 @@
 # app/schemas/summary.py
 
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import date
 
+from app.models.saving_account import Currency
+
 class CategorySummary(BaseModel):
     category_id: int
     category_name: str
@@ -26,4 +28,25 @@ class SummaryResponse(BaseModel):
     top_income_category: Optional[CategorySummary] = None
     top_expense_day: Optional[DailySummary] = None
     top_income_day: Optional[DailySummary] = None
-    overspending_alert: bool
\ No newline at end of file
+    overspending_alert: bool
+
+class TrendValues(BaseModel):
+    total: float
+    avg_3m: float
+    avg_12m: float
+
+class MonthlyTrend(BaseModel):
+    month: date
+    income: TrendValues
+    expense: TrendValues
+
+class FxRate(BaseModel):
+    rate: float
+    as_of: int  # epoch (s) de la tasa usada
+    source: str
+
+class ConsolidatedSummaryResponse(BaseModel):
+    base_currency: Currency
+    rates: Dict[Currency, FxRate]
+    total: SummaryResponse
+    by_currency: Dict[Currency, SummaryResponse]
@@ -1,6 +1,6 @@
 from uuid import UUID
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from app.models.enums import TransactionType
 from app.schemas.category import CategoryRead
@@ -26,6 +26,7 @@ class TransactionRead(TransactionCreate):
     source_type: Optional[str] = None
     transfer_group_id: Optional[UUID] = None
     reversal_note: Optional[str] = None
+    balance_after: Optional[float] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -38,6 +39,19 @@ class TransactionWithCategoryRead(TransactionRead):
 
     model_config = ConfigDict(from_attributes=True)
 
+class AccountTransactionRead(TransactionWithCategoryRead):
+    balance_after: float  # saldo de la cuenta consultada después de este movimiento
+
+class AccountTransactionPage(BaseModel):
+    items: List[AccountTransactionRead]
+    next_cursor: Optional[str] = None
+    has_more: bool
+    page_size: int
+
+class TransactionBatchResult(BaseModel):
+    index: int
+    transaction: TransactionRead
+
 class TransferCreate(BaseModel):
     amount: float
     description: Optional[str] = None
@@ -0,0 +1,28 @@
+import sys
+from uuid import UUID
+
+from app.utils.export_helpers import export_query, stream_csv, stream_ndjson, stream_parquet
+
+# Uso: python -m app.scripts.export_transactions <user_id> <archivo.parquet|.csv|.ndjson>
+STREAMS = {
+    "parquet": (stream_parquet, "wb"),
+    "csv": (stream_csv, "w"),
+    "ndjson": (stream_ndjson, "w"),
+}
+
+def export_transactions(user_id: UUID, path: str, include_reversals: bool = True):
+    fmt = path.rsplit(".", 1)[-1].lower()
+    if fmt not in STREAMS:
+        raise SystemExit(f"Formato no soportado: {fmt} (usa .parquet, .csv o .ndjson)")
+
+    stream, mode = STREAMS[fmt]
+    query = export_query(user_id, include_reversals=include_reversals)
+    with open(path, mode, **({} if "b" in mode else {"encoding": "utf-8", "newline": ""})) as handle:
+        for chunk in stream(query):
+            handle.write(chunk)
+    print(f"🎉 Transacciones de {user_id} exportadas a {path}.")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        raise SystemExit("Uso: python -m app.scripts.export_transactions <user_id> <archivo.parquet|.csv|.ndjson>")
+    export_transactions(UUID(sys.argv[1]), sys.argv[2])
@@ -0,0 +1,12 @@
+from sqlmodel import Session
+from app.database import engine
+from app.utils.idempotency_helpers import purge_expired_idempotency_keys
+
+def purge_idempotency_keys():
+    with Session(engine) as session:
+        deleted = purge_expired_idempotency_keys(session)
+        session.commit()
+    print(f"🎉 {deleted} Idempotency-Keys vencidas eliminadas.")
+
+if __name__ == "__main__":
+    purge_idempotency_keys()
@@ -0,0 +1,16 @@
+import sys
+from uuid import UUID
+
+from sqlmodel import Session
+from app.database import engine
+from app.utils.account_helpers import rebuild_balance_snapshots as rebuild, rebuild_running_balances
+
+def rebuild_balance_snapshots(user_id: UUID = None):
+    with Session(engine) as session:
+        rebuild(session, user_id)
+        rebuild_running_balances(session, user_id)
+        session.commit()
+    print("🎉 Saldos diarios y por movimiento reconstruidos." if user_id is None else f"🎉 Saldos diarios y por movimiento reconstruidos para {user_id}.")
+
+if __name__ == "__main__":
+    rebuild_balance_snapshots(UUID(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,20 @@
+import sys
+from uuid import UUID
+
+from sqlmodel import Session
+from app.database import engine
+from app.utils.cache_helpers import bump_data_version
+from app.utils.ledger_helpers import rebuild_rollup
+from app.utils.snapshot_helpers import invalidate_snapshots
+
+def rebuild_rollups(user_id: UUID = None):
+    with Session(engine) as session:
+        rebuild_rollup(session, user_id)
+        # Los meses congelados y las respuestas cacheadas salieron del acumulado anterior
+        invalidate_snapshots(session, user_id)
+        bump_data_version(session, user_id)
+        session.commit()
+    print("🎉 Acumulados reconstruidos." if user_id is None else f"🎉 Acumulados reconstruidos para {user_id}.")
+
+if __name__ == "__main__":
+    rebuild_rollups(UUID(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,39 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlmodel import Session
+from app.database import engine
+from app.utils.reconciliation_helpers import reconcile_users, user_id_chunks
+
+DEFAULT_WORKERS = 4
+
+def reconcile_balances(fix: bool = False, workers: int = DEFAULT_WORKERS):
+    """
+    Recalcula saldos de cuentas y deudas desde el libro, por bloques de usuarios
+    en paralelo. Reporta los descuadres y, con fix=True, los corrige.
+    """
+    with Session(engine) as session:
+        chunks = list(user_id_chunks(session))
+
+    users = accounts = debts = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for report in pool.map(lambda chunk: reconcile_users(chunk, fix), chunks):
+            users += report["users"]
+            for row in report["accounts"]:
+                accounts += 1
+                print(f"⚠️ Cuenta {row['account_id']} (usuario {row['user_id']}): "
+                      f"guardado {row['stored']:.2f}, libro {row['expected']:.2f}, "
+                      f"diferencia {row['stored'] - row['expected']:+.2f}")
+            for row in report["debts"]:
+                debts += 1
+                print(f"⚠️ Deuda {row['debt_id']} (usuario {row['user_id']}): "
+                      f"guardado {row['stored']:.2f}, libro {row['expected']:.2f}, "
+                      f"diferencia {row['stored'] - row['expected']:+.2f}")
+
+    action = "corregidas" if fix else "encontradas"
+    print(f"🎉 {users} usuarios revisados: {accounts} cuentas y {debts} deudas descuadradas {action}.")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    workers = next((int(arg.split("=", 1)[1]) for arg in args if arg.startswith("--workers=")), DEFAULT_WORKERS)
+    reconcile_balances(fix="--fix" in args, workers=workers)
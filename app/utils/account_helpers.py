@@ -1,14 +1,345 @@
+import datetime as dt
+from typing import Dict, Iterable, List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import case, delete, func, insert, literal, or_, true, tuple_, update
 from sqlmodel import Session, select
 from fastapi import HTTPException
-from app.models.saving_account import SavingAccount
+from app.models.enums import TransactionType
+from app.models.saving_account import SavingAccount, SavingAccountStatus
+from app.models.saving_account_balance_snapshot import SavingAccountBalanceSnapshot
+from app.models.transaction import Transaction
+from app.utils.sql_helpers import date_series, utc_day
+
+def lock_accounts(session: Session, user_id: UUID, account_ids: Iterable[int]) -> Dict[int, SavingAccount]:
+    """
+    Carga y bloquea (SELECT ... FOR UPDATE) las cuentas del usuario, siempre en
+    orden de id para que dos escrituras sobre las mismas cuentas no se bloqueen
+    mutuamente. Las validaciones hechas después ven el saldo vigente.
+    """
+    accounts = session.exec(
+        select(SavingAccount)
+        .where(SavingAccount.user_id == user_id, SavingAccount.id.in_(set(account_ids)))
+        .order_by(SavingAccount.id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).all()
+    return {account.id: account for account in accounts}
 
-def update_account_balance(session: Session, account_id: int, amount_delta: float):
-    account = session.exec(
-        select(SavingAccount).where(SavingAccount.id == account_id)
-    ).first()
 
-    if not account:
+def adjust_balance(session: Session, account_id: int, delta: float, require_funds: bool = False) -> Optional[float]:
+    """
+    Suma `delta` al saldo en una sola sentencia (UPDATE ... SET balance = balance + :delta
+    RETURNING balance), sin leer y reescribir desde Python. Con `require_funds` el
+    UPDATE solo aplica si el saldo alcanza; si no aplica devuelve None.
+    """
+    statement = (
+        update(SavingAccount)
+        .where(SavingAccount.id == account_id)
+        .values(balance=SavingAccount.balance + delta)
+        .returning(SavingAccount.balance)
+        .execution_options(synchronize_session="fetch")
+    )
+    if require_funds and delta < 0:
+        statement = statement.where(SavingAccount.balance >= -delta)
+    return session.execute(statement).scalar_one_or_none()
+
+
+def update_account_balance(session: Session, account_id: int, amount_delta: float, require_funds: bool = False):
+    if adjust_balance(session, account_id, amount_delta, require_funds) is None:
+        if require_funds and session.get(SavingAccount, account_id) is not None:
+            raise HTTPException(status_code=400, detail="Saldo insuficiente")
         raise HTTPException(status_code=404, detail="Cuenta no encontrada")
 
-    account.balance += amount_delta
-    session.add(account)  # Se requiere para que SQLModel registre el cambio
\ No newline at end of file
+
+def signed_amount(tx: Transaction) -> float:
+    """Efecto de una fila del libro sobre el saldo de su saving_account_id."""
+    if tx.type == TransactionType.income:
+        return tx.amount
+    if tx.type == TransactionType.expense:
+        return -tx.amount
+    return 0.0
+
+
+def signed_amount_expr():
+    """Versión SQL de signed_amount."""
+    return case(
+        (Transaction.type == TransactionType.income, Transaction.amount),
+        (Transaction.type == TransactionType.expense, -Transaction.amount),
+        else_=0.0,
+    )
+
+
+def apply_to_balance_snapshots(session: Session, tx: Transaction, sign: int) -> None:
+    """
+    Suma el efecto de `tx` al saldo de cierre de su día y de todos los días
+    posteriores (los registros con fecha pasada solo reescriben la cola).
+    """
+    if tx.saving_account_id is None:
+        return
+    delta = sign * signed_amount(tx)
+    if delta == 0:
+        return
+
+    day = tx.date.astimezone(dt.timezone.utc).date() if tx.date.tzinfo else tx.date.date()
+    Snapshot = SavingAccountBalanceSnapshot
+
+    session.execute(
+        update(Snapshot)
+        .where(Snapshot.saving_account_id == tx.saving_account_id, Snapshot.day >= day)
+        .values(balance=Snapshot.balance + delta)
+    )
+
+    exists = session.exec(
+        select(Snapshot.id).where(Snapshot.saving_account_id == tx.saving_account_id, Snapshot.day == day)
+    ).first()
+    if exists is not None:
+        return
+
+    previous = session.exec(
+        select(Snapshot.balance)
+        .where(Snapshot.saving_account_id == tx.saving_account_id, Snapshot.day < day)
+        .order_by(Snapshot.day.desc())
+        .limit(1)
+    ).first()
+    if previous is None:
+        account = session.get(SavingAccount, tx.saving_account_id)
+        previous = account.opening_balance if account else 0.0
+
+    session.add(Snapshot(
+        user_id=tx.user_id,
+        saving_account_id=tx.saving_account_id,
+        day=day,
+        balance=previous + delta,
+    ))
+
+
+def rebuild_balance_snapshots(session: Session, user_id: Optional[UUID] = None) -> None:
+    """
+    Reconstruye los saldos de cierre diarios desde el libro mayor en una sola
+    sentencia: saldo inicial + suma acumulada (ventana) de los deltas por día.
+    """
+    Snapshot = SavingAccountBalanceSnapshot
+
+    wipe = delete(Snapshot)
+    if user_id is not None:
+        wipe = wipe.where(Snapshot.user_id == user_id)
+    session.execute(wipe)
+
+    day = utc_day(Transaction.date)
+    daily = (
+        select(
+            Transaction.saving_account_id.label("account_id"),
+            day.label("day"),
+            func.sum(signed_amount_expr()).label("delta"),
+        )
+        .where(Transaction.saving_account_id.isnot(None))
+        .group_by(Transaction.saving_account_id, day)
+    )
+    if user_id is not None:
+        daily = daily.where(Transaction.user_id == user_id)
+    daily = daily.subquery()
+
+    running = SavingAccount.opening_balance + func.sum(daily.c.delta).over(
+        partition_by=daily.c.account_id,
+        order_by=daily.c.day,
+    )
+    source = (
+        select(SavingAccount.user_id, daily.c.account_id, daily.c.day, running)
+        .join(SavingAccount, SavingAccount.id == daily.c.account_id)
+    )
+
+    session.execute(
+        insert(Snapshot).from_select(["user_id", "saving_account_id", "day", "balance"], source)
+    )
+
+
+def rebuild_balance_snapshots_since(session: Session, account_id: int, since: dt.date) -> None:
+    """
+    Reconstruye los saldos de cierre de una cuenta desde `since` en adelante,
+    partiendo del último snapshot anterior. Para escrituras en lote con fechas
+    pasadas: el costo depende de la cola reescrita, no de todo el historial.
+    """
+    Snapshot = SavingAccountBalanceSnapshot
+    account = session.get(SavingAccount, account_id)
+    seed = session.exec(
+        select(Snapshot.balance)
+        .where(Snapshot.saving_account_id == account_id, Snapshot.day < since)
+        .order_by(Snapshot.day.desc())
+        .limit(1)
+    ).first()
+    if seed is None:
+        seed = account.opening_balance
+
+    session.execute(delete(Snapshot).where(Snapshot.saving_account_id == account_id, Snapshot.day >= since))
+
+    day = utc_day(Transaction.date)
+    daily = (
+        select(day.label("day"), func.sum(signed_amount_expr()).label("delta"))
+        .where(
+            Transaction.saving_account_id == account_id,
+            Transaction.date >= dt.datetime.combine(since, dt.time.min),
+        )
+        .group_by(day)
+        .subquery()
+    )
+    source = select(
+        literal(account.user_id, SavingAccount.user_id.type),
+        literal(account_id),
+        daily.c.day,
+        seed + func.sum(daily.c.delta).over(order_by=daily.c.day),
+    )
+    session.execute(
+        insert(Snapshot).from_select(["user_id", "saving_account_id", "day", "balance"], source)
+    )
+
+
+def apply_to_running_balances(session: Session, tx: Transaction, sign: int) -> None:
+    """
+    Mantiene Transaction.balance_after (saldo de la cuenta tras cada fila, en
+    orden (date, id)). Solo se reescribe la cola posterior a `tx`, así que un
+    registro con fecha pasada no recalcula el historial completo.
+    """
+    if tx.saving_account_id is None:
+        tx.balance_after = None
+        return
+    if tx.id is None:
+        session.flush()
+
+    date = tx.date.astimezone(dt.timezone.utc).replace(tzinfo=None) if tx.date.tzinfo else tx.date
+    same_account = Transaction.saving_account_id == tx.saving_account_id
+    position = tuple_(Transaction.date, Transaction.id)
+
+    delta = sign * signed_amount(tx)
+    if delta:
+        session.execute(
+            update(Transaction)
+            .where(same_account, position > tuple_(date, tx.id))
+            .values(balance_after=Transaction.balance_after + delta)
+        )
+
+    if sign < 0:
+        return
+
+    previous = session.exec(
+        select(Transaction.balance_after)
+        .where(same_account, position < tuple_(date, tx.id))
+        .order_by(Transaction.date.desc(), Transaction.id.desc())
+        .limit(1)
+    ).first()
+    if previous is None:
+        account = session.get(SavingAccount, tx.saving_account_id)
+        previous = account.opening_balance if account else 0.0
+    tx.balance_after = previous + signed_amount(tx)
+
+
+def rebuild_running_balances(session: Session, user_id: Optional[UUID] = None) -> None:
+    """Recalcula balance_after de todo el libro (o de un usuario) con una suma acumulada por cuenta."""
+    running = (
+        select(
+            Transaction.id,
+            (SavingAccount.opening_balance + func.sum(signed_amount_expr()).over(
+                partition_by=Transaction.saving_account_id,
+                order_by=(Transaction.date, Transaction.id),
+            )).label("balance_after"),
+        )
+        .join(SavingAccount, SavingAccount.id == Transaction.saving_account_id)
+    )
+    if user_id is not None:
+        running = running.where(Transaction.user_id == user_id)
+    running = running.subquery()
+
+    session.execute(
+        update(Transaction)
+        .where(Transaction.id == running.c.id)
+        .values(balance_after=running.c.balance_after)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def rebuild_running_balances_since(session: Session, account_id: int, since: dt.datetime) -> None:
+    """Recalcula balance_after de una cuenta desde `since`, partiendo de la última fila anterior."""
+    seed = session.exec(
+        select(Transaction.balance_after)
+        .where(Transaction.saving_account_id == account_id, Transaction.date < since)
+        .order_by(Transaction.date.desc(), Transaction.id.desc())
+        .limit(1)
+    ).first()
+    if seed is None:
+        seed = session.get(SavingAccount, account_id).opening_balance
+
+    running = (
+        select(
+            Transaction.id,
+            (seed + func.sum(signed_amount_expr()).over(
+                order_by=(Transaction.date, Transaction.id),
+            )).label("balance_after"),
+        )
+        .where(Transaction.saving_account_id == account_id, Transaction.date >= since)
+        .subquery()
+    )
+    session.execute(
+        update(Transaction)
+        .where(Transaction.id == running.c.id)
+        .values(balance_after=running.c.balance_after)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def balances_at(session: Session, user_id: UUID, day: dt.date) -> List[tuple]:
+    """(cuenta, saldo al cierre de `day`) para todas las cuentas del usuario: una búsqueda indexada por cuenta."""
+    Snapshot = SavingAccountBalanceSnapshot
+    last_balance = (
+        select(Snapshot.balance)
+        .where(Snapshot.saving_account_id == SavingAccount.id, Snapshot.day <= day)
+        .order_by(Snapshot.day.desc())
+        .limit(1)
+        .correlate(SavingAccount)
+        .scalar_subquery()
+    )
+    return session.exec(
+        select(SavingAccount, func.coalesce(last_balance, SavingAccount.opening_balance))
+        .where(SavingAccount.user_id == user_id)
+        .order_by(SavingAccount.id)
+    ).all()
+
+
+def account_totals_on_days(session: Session, user_id: UUID, days: Sequence[dt.date]) -> List[tuple]:
+    """
+    (día, moneda, tipo de cuenta, saldo total) al cierre de cada día pedido.
+    Cruza un calendario con las cuentas y resuelve cada saldo con la misma
+    búsqueda indexada de balances_at, todo en una sola consulta. Una cuenta
+    no cuenta en los días anteriores a su creación, salvo que tenga
+    movimientos registrados con fecha anterior, ni desde el día en que se
+    cerró (como en /net-worth-summary, que solo suma cuentas activas).
+    """
+    Snapshot = SavingAccountBalanceSnapshot
+    calendar = date_series(days)
+    last_balance = (
+        select(Snapshot.balance)
+        .where(Snapshot.saving_account_id == SavingAccount.id, Snapshot.day <= calendar.c.day)
+        .order_by(Snapshot.day.desc())
+        .limit(1)
+        .correlate(SavingAccount, calendar)
+        .scalar_subquery()
+    )
+    per_account = (
+        select(
+            calendar.c.day,
+            SavingAccount.currency,
+            SavingAccount.type,
+            func.coalesce(last_balance, SavingAccount.opening_balance).label("balance"),
+        )
+        .select_from(calendar)
+        .join(SavingAccount, true())
+        .where(
+            SavingAccount.user_id == user_id,
+            or_(utc_day(SavingAccount.created_at) <= calendar.c.day, last_balance.is_not(None)),
+            or_(SavingAccount.status == SavingAccountStatus.active, utc_day(SavingAccount.closed_at) > calendar.c.day),
+        )
+        .subquery()
+    )
+    return session.exec(
+        select(per_account.c.day, per_account.c.currency, per_account.c.type, func.sum(per_account.c.balance))
+        .group_by(per_account.c.day, per_account.c.currency, per_account.c.type)
+    ).all()
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core.config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+from app.models.user import User
+
+
+class ResponseCache:
+    """LRU en memoria con TTL y límite de entradas, seguro entre hilos."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
+
+
+def get_data_version(session: Session, user_id: UUID) -> int:
+    return session.exec(select(User.data_version).where(User.id == user_id)).one()
+
+
+def lock_data_version(session: Session, user_id: UUID, shared: bool = False) -> int:
+    """
+    data_version con la fila del usuario bloqueada hasta el fin de la transacción
+    (FOR UPDATE, o FOR SHARE con `shared`). Ordena escrituras y congelamientos.
+    """
+    return session.exec(
+        select(User.data_version).where(User.id == user_id).with_for_update(read=shared)
+    ).one()
+
+
+def bump_data_version(session: Session, user_id: Optional[UUID] = None) -> None:
+    """
+    Invalida las respuestas cacheadas del usuario (o de todos, sin user_id).
+    Se llama antes del commit de cada escritura para que la nueva versión
+    quede en la misma transacción.
+    """
+    stmt = update(User).values(data_version=User.data_version + 1)
+    if user_id is not None:
+        stmt = stmt.where(User.id == user_id)
+    session.execute(stmt)
+
+
+def cached_response(
+    session: Session,
+    user_id: UUID,
+    endpoint: str,
+    params: dict,
+    compute: Callable[[], Any],
+) -> Any:
+    """Devuelve la respuesta cacheada para (usuario, endpoint, params, versión) o la calcula."""
+    key = (
+        user_id,
+        endpoint,
+        tuple(sorted((name, str(value)) for name, value in params.items())),
+        get_data_version(session, user_id),
+    )
+    return response_cache.get_or_compute(key, compute)
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def check_etag(
+    request: Request,
+    response: Response,
+    session: Session,
+    user_id: UUID,
+    *extra: Any,
+) -> None:
+    """
+    ETag fuerte a partir de (usuario, data_version, ruta, query, extra).
+    Si coincide con If-None-Match responde 304 sin ejecutar el resto del endpoint.
+    `extra` sirve para valores implícitos, como fechas por defecto que dependen del día.
+    """
+    raw = "|".join([
+        str(user_id),
+        str(get_data_version(session, user_id)),
+        request.url.path,
+        str(sorted(request.query_params.multi_items())),
+        *(str(value) for value in extra),
+    ])
+    etag = f'"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(etag, if_none_match):
+        raise HTTPException(status_code=304, headers=headers)
+
+    response.headers.update(headers)
@@ -0,0 +1,14 @@
+from sqlalchemy import case
+
+from app.models.debt_transaction import DebtTransaction, DebtTransactionType
+
+# Movimientos del subledger que bajan el saldo de la deuda; el resto lo sube
+_DEBT_DECREASES = (DebtTransactionType.payment, DebtTransactionType.charge_reversal)
+
+
+def debt_effect_expr():
+    """Efecto con signo de una fila de debt_transaction sobre Debt.total_amount."""
+    return case(
+        (DebtTransaction.type.in_(_DEBT_DECREASES), -DebtTransaction.amount),
+        else_=DebtTransaction.amount,
+    )
@@ -0,0 +1,171 @@
+import csv
+import io
+import json
+from typing import Iterator, List
+from uuid import UUID
+
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models.category import Category
+from app.models.debt import Debt
+from app.models.saving_account import SavingAccount
+from app.models.transaction import Transaction
+from app.utils.transaction_helpers import apply_transaction_filters
+
+EXPORT_BATCH_SIZE = 2000
+
+FromAccount = aliased(SavingAccount)
+ToAccount = aliased(SavingAccount)
+
+# Columnas planas de la exportación (nombre -> expresión); sin objetos ORM
+EXPORT_COLUMNS = {
+    "id": Transaction.id,
+    "date": Transaction.date,
+    "type": Transaction.type,
+    "amount": Transaction.amount,
+    "transaction_fee": Transaction.transaction_fee,
+    "currency": func.coalesce(SavingAccount.currency, Debt.currency, FromAccount.currency),
+    "description": Transaction.description,
+    "category": Category.name,
+    "account": SavingAccount.name,
+    "from_account": FromAccount.name,
+    "to_account": ToAccount.name,
+    "debt": Debt.name,
+    "source_type": Transaction.source_type,
+    "is_cancelled": Transaction.is_cancelled,
+    "reversed_transaction_id": Transaction.reversed_transaction_id,
+    "transfer_group_id": Transaction.transfer_group_id,
+}
+
+
+def export_query(user_id: UUID, **filters):
+    """Proyección de columnas con los mismos filtros del listado, ordenada por fecha e id."""
+    query = (
+        select(*(column.label(name) for name, column in EXPORT_COLUMNS.items()))
+        .select_from(Transaction)
+        .outerjoin(Category, Category.id == Transaction.category_id)
+        .outerjoin(SavingAccount, SavingAccount.id == Transaction.saving_account_id)
+        .outerjoin(FromAccount, FromAccount.id == Transaction.from_account_id)
+        .outerjoin(ToAccount, ToAccount.id == Transaction.to_account_id)
+        .outerjoin(Debt, Debt.id == Transaction.debt_id)
+    )
+    return apply_transaction_filters(query, user_id, **filters).order_by(Transaction.date, Transaction.id)
+
+
+def iter_export_batches(query, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[tuple]]:
+    """
+    Lotes de filas con cursor del lado del servidor (yield_per): la memoria
+    no depende del número de filas. Abre y cierra su propia sesión porque se
+    consume mientras se envía la respuesta.
+    """
+    with Session(engine) as session:
+        result = session.execute(query.execution_options(yield_per=batch_size))
+        for batch in result.partitions():
+            yield batch
+
+
+def _plain(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, "value"):  # Enum
+        return value.value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def stream_csv(query) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS.keys())
+    for batch in iter_export_batches(query):
+        writer.writerows([_plain(value) for value in row] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Archivo de solo escritura que acumula bytes hasta que se los retira con take()."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _parquet_schema():
+    import pyarrow as pa  # dependencia pesada: solo se carga al exportar parquet
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.timestamp("us")),
+        ("type", pa.string()),
+        ("amount", pa.float64()),
+        ("transaction_fee", pa.float64()),
+        ("currency", pa.string()),
+        ("description", pa.string()),
+        ("category", pa.string()),
+        ("account", pa.string()),
+        ("from_account", pa.string()),
+        ("to_account", pa.string()),
+        ("debt", pa.string()),
+        ("source_type", pa.string()),
+        ("is_cancelled", pa.bool_()),
+        ("reversed_transaction_id", pa.int64()),
+        ("transfer_group_id", pa.string()),
+    ])
+
+
+def stream_parquet(query) -> Iterator[bytes]:
+    """
+    Parquet tipado escrito lote a lote: cada lote de la BD es un row group
+    que se envía apenas se escribe (el pie del archivo va al final).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in iter_export_batches(query):
+            columns = zip(*batch)
+            arrays = [
+                pa.array(
+                    [_plain(value) for value in values] if field.type == pa.string() else list(values),
+                    type=field.type,
+                )
+                for field, values in zip(schema, columns)
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+def stream_ndjson(query) -> Iterator[str]:
+    names = list(EXPORT_COLUMNS.keys())
+    for batch in iter_export_batches(query):
+        yield "".join(
+            json.dumps(dict(zip(names, (_plain(value) for value in row))), ensure_ascii=False) + "\n"
+            for row in batch
+        )
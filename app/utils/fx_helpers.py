@@ -0,0 +1,26 @@
+from typing import Dict, Mapping
+
+from app.models.saving_account import Currency
+from app.routes.fx import resolve_rate
+
+
+def rates_to(base_currency: Currency) -> Dict[Currency, dict]:
+    """Tasa de cada moneda a `base_currency` (con as_of y fuente), desde la caché de /fx."""
+    rates = {}
+    for currency in [Currency.COP, Currency.USD, Currency.EUR]:
+        quote = resolve_rate(currency.value, base_currency.value)
+        rates[currency] = {"rate": quote["rate"], "as_of": quote["as_of"], "source": quote["source"]}
+    return rates
+
+
+def convert_totals(by_currency: Mapping[Currency, Mapping[str, float]], rates: Dict[Currency, dict]) -> Dict[str, float]:
+    """
+    Suma totales ya agregados por moneda en la moneda base: una multiplicación
+    por moneda y campo, nunca por transacción.
+    """
+    total: Dict[str, float] = {}
+    for currency, values in by_currency.items():
+        rate = rates[Currency(currency)]["rate"]
+        for key, value in values.items():
+            total[key] = total.get(key, 0.0) + (value or 0.0) * rate
+    return total
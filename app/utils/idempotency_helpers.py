@@ -0,0 +1,90 @@
+import datetime as dt
+import hashlib
+import json
+from typing import Any, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.core.config import IDEMPOTENCY_KEY_TTL_SECONDS
+from app.models.idempotency_key import IdempotencyKey
+
+
+def _request_hash(payload: Any) -> str:
+    raw = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _stored(session: Session, user_id: UUID, key: str) -> Optional[IdempotencyKey]:
+    return session.exec(
+        select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    ).first()
+
+
+def _replay(row: IdempotencyKey, endpoint: str, request_hash: str) -> Any:
+    if row.endpoint != endpoint or row.request_hash != request_hash:
+        raise HTTPException(
+            status_code=422,
+            detail="La Idempotency-Key ya se usó con otra solicitud.",
+        )
+    return row.response
+
+
+def claim_idempotency_key(
+    session: Session,
+    user_id: UUID,
+    key: Optional[str],
+    endpoint: str,
+    payload: Any,
+) -> Optional[Any]:
+    """
+    Devuelve la respuesta guardada si `key` ya se procesó (reintento), o None.
+    Si es nueva la reserva en la transacción actual: un reintento concurrente
+    espera en el índice único y, al confirmarse esta, recibe su respuesta.
+    Debe llamarse antes de cualquier escritura; si el endpoint falla, el
+    rollback libera la clave.
+    """
+    if not key:
+        return None
+    request_hash = _request_hash(payload)
+    expires_before = dt.datetime.utcnow() - dt.timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS)
+
+    row = _stored(session, user_id, key)
+    if row is not None:
+        if row.created_at >= expires_before:
+            return _replay(row, endpoint, request_hash)
+        session.delete(row)
+        session.flush()  # antes del INSERT con la misma clave
+
+    session.add(IdempotencyKey(user_id=user_id, key=key, endpoint=endpoint, request_hash=request_hash))
+    try:
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        row = _stored(session, user_id, key)
+        if row is None:
+            raise HTTPException(status_code=409, detail="Hay otra solicitud en curso con esta Idempotency-Key.")
+        return _replay(row, endpoint, request_hash)
+    return None
+
+
+def save_idempotent_response(session: Session, user_id: UUID, key: Optional[str], response: Any) -> None:
+    """Guarda la respuesta de la clave reservada; se confirma con el mismo commit de la escritura."""
+    if not key:
+        return
+    session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(response=jsonable_encoder(response))
+    )
+
+
+def purge_expired_idempotency_keys(session: Session) -> int:
+    """Borra las claves vencidas (usa el índice de created_at)."""
+    expires_before = dt.datetime.utcnow() - dt.timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS)
+    result = session.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < expires_before))
+    return result.rowcount
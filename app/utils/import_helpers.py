@@ -0,0 +1,279 @@
+import csv
+import datetime as dt
+import io
+import re
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from app.models.category import Category
+from app.models.enums import TransactionType
+from app.models.saving_account import SavingAccount, SavingAccountStatus
+from app.models.transaction import Transaction
+from app.utils.account_helpers import adjust_balance, lock_accounts, rebuild_balance_snapshots_since, rebuild_running_balances_since
+from app.utils.cache_helpers import bump_data_version
+from app.utils.ledger_helpers import add_to_rollup
+from app.utils.snapshot_helpers import invalidate_snapshots, months_touched
+
+IMPORT_BATCH_SIZE = 1000
+
+_OFX_TAG = re.compile(r"<(/?)(\w+)>([^<\r\n]*)")
+_OFX_DATE = re.compile(r"^(\d{8})(\d{6})?(?:\.\d+)?(?:\[([+-]?\d+(?:\.\d+)?)(?::\w+)?\])?")
+
+
+def iter_csv_rows(stream: BinaryIO) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """(número de fila, columnas) de un CSV con encabezado, leído en streaming."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+    for row in reader:
+        yield reader.line_num, {key: (value or "").strip() for key, value in row.items() if key}
+
+
+def iter_ofx_rows(stream: BinaryIO) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """
+    Movimientos <STMTTRN> de un OFX (SGML 1.x o XML 2.x), leídos en streaming.
+    Se mapean a las mismas columnas que el CSV (date, amount, description).
+    """
+    text = io.TextIOWrapper(stream, encoding="latin-1", newline="")
+    current: Optional[Dict[str, str]] = None
+    count = 0
+    for line in text:
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN" and not closing:
+                current = {}
+            elif tag == "STMTTRN" and closing and current is not None:
+                count += 1
+                yield count, {
+                    "date": current.get("DTPOSTED", ""),
+                    "amount": current.get("TRNAMT", ""),
+                    "description": current.get("NAME") or current.get("MEMO", ""),
+                }
+                current = None
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+
+
+def _parse_date(value: str) -> dt.datetime:
+    """Fecha a datetime naive UTC. Solo fecha -> mediodía UTC, como en el resto de la API."""
+    match = _OFX_DATE.match(value)
+    if match:
+        day = dt.datetime.strptime(match.group(1), "%Y%m%d")
+        if not match.group(2):
+            return day.replace(hour=12)
+        moment = dt.datetime.strptime(match.group(1) + match.group(2), "%Y%m%d%H%M%S")
+        offset = float(match.group(3) or 0)
+        return moment - dt.timedelta(hours=offset)
+
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return dt.datetime.strptime(value, fmt).replace(hour=12)
+        except ValueError:
+            pass
+
+    try:
+        parsed = dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Fecha inválida: {value}")
+    return parsed.astimezone(dt.timezone.utc).replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def _parse_amount(value: str) -> float:
+    """
+    Acepta formato colombiano (1.234.567,89) y anglosajón (1,234,567.89): con
+    ambos separadores el último es el decimal; un separador repetido es de miles.
+    """
+    value = value.replace(" ", "").replace("$", "")
+    if "," in value and "." in value:
+        decimal = "," if value.rfind(",") > value.rfind(".") else "."
+        thousands = "." if decimal == "," else ","
+        value = value.replace(thousands, "").replace(decimal, ".")
+    elif value.count(".") > 1:
+        value = value.replace(".", "")  # puntos de miles
+    elif value.count(",") > 1:
+        value = value.replace(",", "")  # comas de miles
+    else:
+        value = value.replace(",", ".")  # coma decimal
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Monto inválido: {value}")
+
+
+def _parse_id(value: str, error: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(error)
+
+
+class StatementImporter:
+    """
+    Importa un extracto: valida cuentas y categorías una sola vez por archivo,
+    inserta en lotes con executemany, aplica un único delta de saldo por cuenta
+    y al final suma al acumulado lo importado y recalcula saldos diarios y
+    balance_after solo desde la fecha más antigua importada en cada cuenta.
+    Las filas inválidas no se importan y quedan en el reporte de errores.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        user_id: UUID,
+        default_account_id: Optional[int] = None,
+        default_category_id: Optional[int] = None,
+    ):
+        self.session = session
+        self.user_id = user_id
+        self.default_account_id = default_account_id
+        self.default_category_id = default_category_id
+
+        # Cuentas bloqueadas durante toda la importación: la validación de fondos se
+        # hace en Python contra estos saldos, que nadie más puede mover mientras tanto
+        account_ids = session.exec(select(SavingAccount.id).where(SavingAccount.user_id == user_id)).all()
+        self.accounts = lock_accounts(session, user_id, account_ids)
+        self.opening_balances = {account.id: account.balance for account in self.accounts.values()}
+        self.balances = dict(self.opening_balances)
+
+        categories = session.exec(select(Category).where(Category.user_id == user_id)).all()
+        self.categories_by_id = {category.id: category for category in categories}
+        self.categories_by_name = {category.name.strip().lower(): category for category in categories}
+
+        self.pending: List[dict] = []
+        self.rollup: Dict[tuple, List[float]] = {}
+        self.since: Dict[int, dt.datetime] = {}
+        self.months: set = set()
+        self.imported = 0
+        self.errors: List[dict] = []
+
+    def _account_id(self, row: Dict[str, str]) -> int:
+        raw = row.get("saving_account_id") or row.get("account_id")
+        account_id = _parse_id(raw, "Cuenta de ahorro inválida") if raw else self.default_account_id
+        if account_id is None:
+            raise ValueError("Se requiere una cuenta asociada.")
+        account = self.accounts.get(account_id)
+        if not account:
+            raise ValueError("Cuenta de ahorro inválida")
+        if account.status != SavingAccountStatus.active:
+            raise ValueError("La cuenta no está activa.")
+        return account_id
+
+    def _category_id(self, row: Dict[str, str]) -> int:
+        if row.get("category_id"):
+            category = self.categories_by_id.get(_parse_id(row["category_id"], "Categoría inválida"))
+        elif row.get("category"):
+            category = self.categories_by_name.get(row["category"].lower())
+        else:
+            category = self.categories_by_id.get(self.default_category_id)
+        if not category:
+            raise ValueError("Categoría inválida")
+        return category.id
+
+    def _parse(self, row: Dict[str, str]) -> dict:
+        if not row.get("date"):
+            raise ValueError("Falta la fecha.")
+        if not row.get("amount"):
+            raise ValueError("Falta el monto.")
+
+        amount = _parse_amount(row["amount"])
+        if row.get("type"):
+            if row["type"].lower() not in (TransactionType.income.value, TransactionType.expense.value):
+                raise ValueError("El tipo debe ser income o expense.")
+            tx_type = TransactionType(row["type"].lower())
+        else:
+            # Extractos bancarios: el signo del monto indica el tipo
+            tx_type = TransactionType.expense if amount < 0 else TransactionType.income
+        amount = abs(amount)
+        if amount <= 0:
+            raise ValueError("El monto debe ser mayor a cero.")
+
+        return {
+            "user_id": self.user_id,
+            "amount": amount,
+            "type": tx_type,
+            "transaction_fee": 0.0,
+            "date": _parse_date(row["date"]),
+            "description": row.get("description") or None,
+            "is_cancelled": False,
+            "category_id": self._category_id(row),
+            "saving_account_id": self._account_id(row),
+        }
+
+    def add(self, line: int, row: Dict[str, str]) -> None:
+        try:
+            values = self._parse(row)
+        except (ValueError, OverflowError) as exc:
+            self.errors.append({"row": line, "error": str(exc) or "Fila inválida"})
+            return
+
+        account_id = values["saving_account_id"]
+        delta = values["amount"] if values["type"] == TransactionType.income else -values["amount"]
+        if self.balances[account_id] + delta < 0:
+            self.errors.append({"row": line, "error": "Fondos insuficientes para cubrir el gasto."})
+            return
+
+        self.balances[account_id] += delta
+        self.months |= months_touched(values["date"])
+        self.since[account_id] = min(values["date"], self.since.get(account_id, values["date"]))
+        key = (
+            self.accounts[account_id].currency,
+            values["date"].replace(minute=0, second=0, microsecond=0),
+            values["category_id"],
+            values["type"],
+        )
+        totals = self.rollup.setdefault(key, [0.0, 0])
+        totals[0] += values["amount"]
+        totals[1] += 1
+        self.pending.append(values)
+        if len(self.pending) >= IMPORT_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self.pending:
+            self.session.execute(insert(Transaction), self.pending)
+            self.imported += len(self.pending)
+            self.pending = []
+
+    def finish(self) -> dict:
+        """Inserta lo pendiente, aplica los saldos y deja todo en la transacción actual (sin commit)."""
+        self._flush()
+
+        if self.imported:
+            for account_id, balance in self.balances.items():
+                delta = balance - self.opening_balances[account_id]
+                # Además del bloqueo, el UPDATE verifica los fondos: si no alcanzan no se importa nada
+                if delta and adjust_balance(self.session, account_id, delta, require_funds=True) is None:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Fondos insuficientes en la cuenta {self.accounts[account_id].name}: no se importó el extracto.",
+                    )
+
+            # Deltas por lote en vez de un ajuste por fila; solo se reescribe la cola de cada cuenta
+            add_to_rollup(self.session, [
+                {
+                    "user_id": self.user_id, "currency": currency, "bucket": bucket,
+                    "category_id": category_id, "type": tx_type, "source_type": None,
+                    "total": total, "tx_count": count,
+                }
+                for (currency, bucket, category_id, tx_type), (total, count) in self.rollup.items()
+            ])
+            for account_id, since in self.since.items():
+                rebuild_balance_snapshots_since(self.session, account_id, since.date())
+                rebuild_running_balances_since(self.session, account_id, since)
+            invalidate_snapshots(self.session, self.user_id, self.months)
+            bump_data_version(self.session, self.user_id)
+
+        return {
+            "imported": self.imported,
+            "rejected": len(self.errors),
+            "errors": self.errors,
+            "balances": {
+                account_id: balance
+                for account_id, balance in self.balances.items()
+                if balance != self.opening_balances[account_id]
+            },
+        }
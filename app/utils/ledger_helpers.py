@@ -0,0 +1,183 @@
+import datetime as dt
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, func, insert, literal_column, update
+from sqlmodel import Session, select
+
+from app.models.debt import Debt
+from app.models.enums import TransactionType
+from app.models.saving_account import SavingAccount
+from app.models.transaction import Transaction
+from app.models.transaction_rollup import ROLLUP_KEY, TransactionRollup
+from app.utils.account_helpers import apply_to_balance_snapshots, apply_to_running_balances
+from app.utils.snapshot_helpers import invalidate_snapshots, months_touched
+from app.utils.sql_helpers import hour_bucket, upsert
+
+
+def _utc_naive(value: dt.datetime) -> dt.datetime:
+    """Normaliza a datetime naive en UTC (como se guarda en la BD)."""
+    if value.tzinfo is not None:
+        return value.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _hour_bucket(value: dt.datetime) -> dt.datetime:
+    return _utc_naive(value).replace(minute=0, second=0, microsecond=0)
+
+
+def _rollup_key(session: Session, tx: Transaction) -> Optional[tuple]:
+    """
+    Clave del acumulado para una transacción, o None si no cuenta en reportes:
+    canceladas, reversas, sin moneda (ni cuenta ni compra con tarjeta).
+    """
+    if tx.is_cancelled or tx.reversed_transaction_id is not None:
+        return None
+    if tx.type not in (TransactionType.income, TransactionType.expense):
+        return None
+
+    if tx.saving_account_id is not None:
+        account = session.get(SavingAccount, tx.saving_account_id)
+        currency = account.currency if account else None
+    elif tx.debt_id is not None and tx.source_type == "credit_card_purchase":
+        debt = session.get(Debt, tx.debt_id)
+        currency = debt.currency if debt else None
+    else:
+        currency = None
+
+    if currency is None:
+        return None
+
+    return (tx.user_id, currency, _hour_bucket(tx.date), tx.category_id, tx.type, tx.source_type)
+
+
+def add_to_rollup(session: Session, rows: List[dict]) -> None:
+    """
+    Suma filas ya agregadas (clave del acumulado + total + tx_count) con un
+    upsert por lotes: inserta las claves nuevas y acumula sobre las existentes.
+    """
+    if not rows:
+        return
+    insert_rows = upsert(TransactionRollup)
+    session.execute(
+        insert_rows.on_conflict_do_update(
+            index_elements=ROLLUP_KEY,
+            set_={
+                "total": TransactionRollup.total + insert_rows.excluded.total,
+                "tx_count": TransactionRollup.tx_count + insert_rows.excluded.tx_count,
+            },
+        ),
+        rows,
+    )
+
+
+def _apply_to_rollup(session: Session, tx: Transaction, sign: int) -> None:
+    """
+    Suma o resta `tx` en su fila del acumulado con sentencias atómicas
+    (total = total + :delta), sin leer y reescribir desde Python.
+    """
+    key = _rollup_key(session, tx)
+    if key is None:
+        return
+    user_id, currency, bucket, category_id, tx_type, source_type = key
+
+    if sign > 0:
+        add_to_rollup(session, [{
+            "user_id": user_id,
+            "currency": currency,
+            "bucket": bucket,
+            "category_id": category_id,
+            "type": tx_type,
+            "source_type": source_type,
+            "total": tx.amount,
+            "tx_count": 1,
+        }])
+        return
+
+    same_key = (
+        TransactionRollup.user_id == user_id,
+        TransactionRollup.currency == currency,
+        TransactionRollup.bucket == bucket,
+        TransactionRollup.category_id == category_id if category_id is not None
+        else TransactionRollup.category_id.is_(None),
+        TransactionRollup.type == tx_type,
+        TransactionRollup.source_type == source_type if source_type is not None
+        else TransactionRollup.source_type.is_(None),
+    )
+    # Si la fila no existe (acumulado aún no reconstruido) no hay nada que descontar
+    session.execute(
+        update(TransactionRollup)
+        .where(*same_key)
+        .values(total=TransactionRollup.total - tx.amount, tx_count=TransactionRollup.tx_count - 1)
+    )
+    session.execute(delete(TransactionRollup).where(*same_key, TransactionRollup.tx_count <= 0))
+
+
+def register_ledger_change(session: Session, tx: Transaction, sign: int = 1) -> None:
+    """
+    Refleja en los acumulados, en los saldos diarios de la cuenta y en el
+    saldo por fila (balance_after) que `tx` entra (sign=1) o sale (sign=-1)
+    del libro, e invalida los snapshots mensuales de los meses que toca.
+    Para ediciones se llama con -1 antes de modificar y con +1 después.
+    No hace commit: queda en la misma transacción que la escritura.
+    """
+    _apply_to_rollup(session, tx, sign)
+    apply_to_balance_snapshots(session, tx, sign)
+    apply_to_running_balances(session, tx, sign)
+    invalidate_snapshots(session, tx.user_id, months_touched(_utc_naive(tx.date)))
+
+
+def rebuild_rollup(session: Session, user_id: Optional[UUID] = None) -> None:
+    """Reconstruye transaction_rollup desde el libro mayor (todo o un usuario)."""
+    wipe = delete(TransactionRollup)
+    if user_id is not None:
+        wipe = wipe.where(TransactionRollup.user_id == user_id)
+    session.execute(wipe)
+
+    bucket = hour_bucket(Transaction.date)
+    currency = func.coalesce(SavingAccount.currency, Debt.currency)
+
+    source = (
+        select(
+            Transaction.user_id,
+            currency,
+            bucket,
+            Transaction.category_id,
+            Transaction.type,
+            Transaction.source_type,
+            func.sum(Transaction.amount),
+            func.count(literal_column("*")),
+        )
+        .select_from(Transaction)
+        .outerjoin(SavingAccount, Transaction.saving_account_id == SavingAccount.id)
+        .outerjoin(
+            Debt,
+            (Transaction.debt_id == Debt.id)
+            & Transaction.saving_account_id.is_(None)
+            & (Transaction.source_type == "credit_card_purchase"),
+        )
+        .where(Transaction.is_cancelled == False)
+        .where(Transaction.reversed_transaction_id.is_(None))
+        .where(Transaction.type.in_([TransactionType.income, TransactionType.expense]))
+        .where(SavingAccount.id.isnot(None) | Debt.id.isnot(None))
+        .group_by(
+            Transaction.user_id,
+            currency,
+            bucket,
+            Transaction.category_id,
+            Transaction.type,
+            Transaction.source_type,
+        )
+    )
+    if user_id is not None:
+        source = source.where(Transaction.user_id == user_id)
+
+    session.execute(
+        insert(TransactionRollup).from_select(
+            [
+                "user_id", "currency", "bucket", "category_id",
+                "type", "source_type", "total", "tx_count",
+            ],
+            source,
+        )
+    )
@@ -0,0 +1,125 @@
+from typing import Iterator, List
+from uuid import UUID
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models.debt import Debt
+from app.models.debt_transaction import DebtTransaction
+from app.models.saving_account import SavingAccount
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.utils.account_helpers import signed_amount_expr
+from app.utils.cache_helpers import bump_data_version
+from app.utils.debt_helpers import debt_effect_expr
+
+RECONCILE_CHUNK_SIZE = 500
+BALANCE_TOLERANCE = 0.005  # medio centavo: ruido de float, no descuadre
+
+
+def user_id_chunks(session: Session, size: int = RECONCILE_CHUNK_SIZE) -> Iterator[List[UUID]]:
+    """Ids de usuario en bloques de `size`, recorridos por clave (sin OFFSET)."""
+    last = None
+    while True:
+        query = select(User.id).order_by(User.id).limit(size)
+        if last is not None:
+            query = query.where(User.id > last)
+        chunk = session.exec(query).all()
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def account_drift(session: Session, user_ids: List[UUID], lock: bool = False) -> List[tuple]:
+    """
+    (user_id, account_id, saldo guardado, saldo según el libro) de las cuentas
+    descuadradas: saldo inicial + suma de income/expense, en una sola consulta.
+    """
+    ledger = (
+        select(
+            Transaction.saving_account_id.label("account_id"),
+            func.sum(signed_amount_expr()).label("total"),
+        )
+        .where(Transaction.user_id.in_(user_ids), Transaction.saving_account_id.isnot(None))
+        .group_by(Transaction.saving_account_id)
+        .subquery()
+    )
+    expected = SavingAccount.opening_balance + func.coalesce(ledger.c.total, 0.0)
+    query = (
+        select(SavingAccount.user_id, SavingAccount.id, SavingAccount.balance, expected)
+        .outerjoin(ledger, ledger.c.account_id == SavingAccount.id)
+        .where(
+            SavingAccount.user_id.in_(user_ids),
+            func.abs(SavingAccount.balance - expected) > BALANCE_TOLERANCE,
+        )
+        .order_by(SavingAccount.id)
+    )
+    if lock:
+        query = query.with_for_update(of=SavingAccount)
+    return session.exec(query).all()
+
+
+def debt_drift(session: Session, user_ids: List[UUID], lock: bool = False) -> List[tuple]:
+    """(user_id, debt_id, saldo guardado, saldo según el subledger) de las deudas descuadradas."""
+    ledger = (
+        select(
+            DebtTransaction.debt_id.label("debt_id"),
+            func.sum(debt_effect_expr()).label("total"),
+        )
+        .where(DebtTransaction.user_id.in_(user_ids))
+        .group_by(DebtTransaction.debt_id)
+        .subquery()
+    )
+    expected = Debt.initial_amount + func.coalesce(ledger.c.total, 0.0)
+    query = (
+        select(Debt.user_id, Debt.id, Debt.total_amount, expected)
+        .outerjoin(ledger, ledger.c.debt_id == Debt.id)
+        .where(
+            Debt.user_id.in_(user_ids),
+            func.abs(Debt.total_amount - expected) > BALANCE_TOLERANCE,
+        )
+        .order_by(Debt.id)
+    )
+    if lock:
+        query = query.with_for_update(of=Debt)
+    return session.exec(query).all()
+
+
+def reconcile_users(user_ids: List[UUID], fix: bool = False) -> dict:
+    """
+    Compara saldos guardados contra el libro para un bloque de usuarios, en su
+    propia sesión (pensado para correr en paralelo). Con `fix`, bloquea las filas
+    descuadradas, las reescribe con el valor del libro y hace commit.
+    """
+    with Session(engine) as session:
+        accounts = account_drift(session, user_ids, lock=fix)
+        debts = debt_drift(session, user_ids, lock=fix)
+
+        if fix and (accounts or debts):
+            if accounts:
+                session.execute(
+                    update(SavingAccount),
+                    [{"id": account_id, "balance": expected} for _, account_id, _, expected in accounts],
+                )
+            if debts:
+                session.execute(
+                    update(Debt),
+                    [{"id": debt_id, "total_amount": expected} for _, debt_id, _, expected in debts],
+                )
+            for user_id in {row[0] for row in accounts} | {row[0] for row in debts}:
+                bump_data_version(session, user_id)
+            session.commit()
+
+    return {
+        "users": len(user_ids),
+        "accounts": [
+            {"user_id": user_id, "account_id": account_id, "stored": stored, "expected": expected}
+            for user_id, account_id, stored, expected in accounts
+        ],
+        "debts": [
+            {"user_id": user_id, "debt_id": debt_id, "stored": stored, "expected": expected}
+            for user_id, debt_id, stored, expected in debts
+        ],
+    }
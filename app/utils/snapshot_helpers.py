@@ -0,0 +1,117 @@
+import datetime as dt
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.models.monthly_snapshot import MonthlySnapshot
+from app.models.saving_account import Currency
+from app.utils.cache_helpers import get_data_version, lock_data_version
+
+SNAPSHOT_SUMMARY = "summary"
+SNAPSHOT_CASH_FLOW = "cash_flow"
+
+
+def _month_end(month_start: dt.date) -> dt.date:
+    next_month = (month_start.replace(day=28) + dt.timedelta(days=4)).replace(day=1)
+    return next_month - dt.timedelta(days=1)
+
+
+def month_segments(start: dt.date, end: dt.date, current_month: dt.date) -> List[Tuple[dt.date, dt.date, bool]]:
+    """
+    Parte [start, end] en tramos (desde, hasta, es_mes_cerrado).
+    Los meses cerrados completos van solos; lo demás se agrupa en tramos abiertos contiguos.
+    """
+    segments: List[Tuple[dt.date, dt.date, bool]] = []
+    cursor = start
+    while cursor <= end:
+        month_start = cursor.replace(day=1)
+        month_end = _month_end(month_start)
+        seg_end = min(month_end, end)
+        closed = cursor == month_start and seg_end == month_end and month_start < current_month
+
+        if not closed and segments and not segments[-1][2]:
+            segments[-1] = (segments[-1][0], seg_end, False)
+        else:
+            segments.append((cursor, seg_end, closed))
+        cursor = seg_end + dt.timedelta(days=1)
+    return segments
+
+
+def months_touched(value: dt.datetime) -> set:
+    """Meses locales a los que puede pertenecer un instante UTC (offsets de -12h a +14h)."""
+    return {(value + dt.timedelta(hours=h)).date().replace(day=1) for h in (-12, 0, 14)}
+
+
+def invalidate_snapshots(
+    session: Session,
+    user_id: Optional[UUID],
+    months: Optional[Iterable[dt.date]] = None,
+    kind: Optional[str] = None,
+) -> None:
+    """
+    Borra los snapshots afectados por una escritura (sin user_id, los de todos).
+    Bloquea antes la fila del usuario: un get_or_freeze concurrente espera al
+    commit y ve la versión nueva, o congela primero y este DELETE lo alcanza.
+    """
+    stmt = delete(MonthlySnapshot)
+    if user_id is not None:
+        lock_data_version(session, user_id)
+        stmt = stmt.where(MonthlySnapshot.user_id == user_id)
+    if months is not None:
+        stmt = stmt.where(MonthlySnapshot.month.in_(list(months)))
+    if kind is not None:
+        stmt = stmt.where(MonthlySnapshot.kind == kind)
+    session.execute(stmt)
+
+
+def get_or_freeze(
+    session: Session,
+    user_id: UUID,
+    kind: str,
+    tz: str,
+    month: dt.date,
+    compute: Callable[[], Dict[Currency, Any]],
+) -> Dict[Currency, dict]:
+    """
+    Devuelve el snapshot del mes por moneda; si no existe lo calcula y lo congela.
+    `compute` devuelve {moneda: modelo pydantic o dict}. El congelado va en una
+    sesión propia y corta: la sesión del request no se confirma ni se revierte.
+    """
+    rows = session.exec(
+        select(MonthlySnapshot).where(
+            MonthlySnapshot.user_id == user_id,
+            MonthlySnapshot.kind == kind,
+            MonthlySnapshot.tz == tz,
+            MonthlySnapshot.month == month,
+        )
+    ).all()
+    if rows:
+        return {Currency(row.currency): row.payload for row in rows}
+
+    version = get_data_version(session, user_id)
+    payloads = {
+        currency: value.model_dump(mode="json") if hasattr(value, "model_dump") else dict(value)
+        for currency, value in compute().items()
+    }
+    with Session(session.get_bind()) as freeze:
+        if lock_data_version(freeze, user_id, shared=True) != version:
+            # Una escritura se confirmó mientras se calculaba: no se congela un mes posiblemente viejo
+            return payloads
+        for currency, payload in payloads.items():
+            freeze.add(MonthlySnapshot(
+                user_id=user_id,
+                kind=kind,
+                tz=tz,
+                month=month,
+                currency=currency,
+                payload=payload,
+            ))
+        try:
+            freeze.commit()
+        except IntegrityError:
+            # Otra petición congeló el mismo mes en paralelo
+            freeze.rollback()
+    return payloads
@@ -0,0 +1,105 @@
+import datetime as dt
+import json
+from typing import List, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Date, DateTime, case, cast, column, func, select, values
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.database import engine
+
+
+def _is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def _offset_minutes(z: ZoneInfo, instant_utc: dt.datetime) -> int:
+    local = instant_utc.replace(tzinfo=dt.timezone.utc).astimezone(z)
+    return int(local.utcoffset().total_seconds() // 60)
+
+
+def _offset_segments(tz: str, start_utc: dt.datetime, end_utc: dt.datetime) -> List[Tuple[dt.datetime, int]]:
+    """
+    Tramos [(desde_utc, offset_minutos)] de la zona dentro del rango.
+    Recorre por días y ubica cada cambio de horario por bisección al minuto.
+    """
+    z = ZoneInfo(tz)
+    segments = [(start_utc, _offset_minutes(z, start_utc))]
+    cursor = start_utc
+    while cursor < end_utc:
+        step = min(cursor + dt.timedelta(days=1), end_utc)
+        if _offset_minutes(z, step) != segments[-1][1]:
+            low, high = cursor, step
+            while high - low > dt.timedelta(minutes=1):
+                mid = low + (high - low) / 2
+                if _offset_minutes(z, mid) == segments[-1][1]:
+                    low = mid
+                else:
+                    high = mid
+            high = high.replace(second=0, microsecond=0)
+            segments.append((high, _offset_minutes(z, high)))
+        cursor = step
+    return segments
+
+
+def local_day(column, tz: str, start_utc: dt.datetime, end_utc: dt.datetime):
+    """
+    Día local (tz IANA) de una columna datetime UTC naive, calculado en la BD.
+    Postgres usa AT TIME ZONE; SQLite (sin base de zonas) aplica el offset de
+    cada tramo del rango [start_utc, end_utc] con un CASE.
+    """
+    if _is_postgres():
+        return cast(func.timezone(tz, func.timezone("UTC", column)), Date)
+
+    segments = _offset_segments(tz, start_utc, end_utc)
+
+    def shifted(offset: int):
+        return func.date(column, f"{offset:+d} minutes", type_=Date)
+
+    if len(segments) == 1:
+        return shifted(segments[0][1])
+
+    whens = [
+        (column < next_start, shifted(offset))
+        for (_, offset), (next_start, _) in zip(segments, segments[1:])
+    ]
+    return case(*whens, else_=shifted(segments[-1][1]))
+
+
+def hour_bucket(column):
+    """Inicio de la hora UTC de una columna datetime."""
+    if _is_postgres():
+        return func.date_trunc("hour", column)
+    return func.strftime("%Y-%m-%d %H:00:00.000000", column, type_=DateTime)
+
+
+def utc_day(column):
+    """Día UTC de una columna datetime UTC naive."""
+    if _is_postgres():
+        return cast(column, Date)
+    return func.date(column, type_=Date)
+
+
+def date_series(days: Sequence[dt.date], name: str = "calendar"):
+    """
+    Tabla derivada con una columna `day` por cada fecha, para cruzar en SQL.
+    Postgres usa VALUES; SQLite (sin alias de columnas en VALUES) usa json_each.
+    """
+    if _is_postgres():
+        return values(column("day", Date), name=name).data([(day,) for day in days])
+    items = func.json_each(json.dumps([day.isoformat() for day in days])).table_valued("value")
+    return select(func.date(items.c.value, type_=Date).label("day")).subquery(name)
+
+
+def month_start(day):
+    """Primer día del mes de una expresión de fecha."""
+    if _is_postgres():
+        return cast(func.date_trunc("month", day), Date)
+    return func.date(day, "start of month", type_=Date)
+
+
+def upsert(table):
+    """INSERT con soporte de ON CONFLICT DO UPDATE en el dialecto activo."""
+    if _is_postgres():
+        return postgresql.insert(table)
+    return sqlite.insert(table)
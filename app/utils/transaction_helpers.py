@@ -0,0 +1,92 @@
+import base64
+import datetime as dt
+import json
+import re
+from typing import Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import column, func, literal, select, table, text
+
+from app.models.enums import TransactionType
+from app.models.transaction import SEARCH_CONFIG, Transaction, description_tsvector
+from app.utils.sql_helpers import _is_postgres
+
+_transaction_fts = table("transaction_fts", column("rowid"), column("rank"))
+
+
+def text_search(q: str):
+    """
+    (condición, relevancia) para buscar `q` en la descripción.
+    Postgres: palabras (tsvector, GIN) o parecido aproximado (pg_trgm, GIN).
+    SQLite: FTS5 por prefijo de cada palabra, con bm25 como relevancia.
+    """
+    if _is_postgres():
+        vector = description_tsvector(Transaction.description)
+        query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        condition = vector.op("@@")(query) | literal(q).op("<%")(Transaction.description)
+        rank = func.greatest(func.ts_rank(vector, query), func.word_similarity(q, Transaction.description))
+        return condition, rank
+
+    terms = re.findall(r"\w+", q)
+    match = " ".join('"{}"*'.format(term) for term in terms) or '""'
+    matches = text("transaction_fts MATCH :fts_query").bindparams(fts_query=match)
+    condition = Transaction.id.in_(select(_transaction_fts.c.rowid).where(matches))
+    rank = (
+        select(-_transaction_fts.c.rank)
+        .where(matches, _transaction_fts.c.rowid == Transaction.id)
+        .scalar_subquery()
+    )
+    return condition, rank
+
+
+def apply_transaction_filters(
+    query,
+    user_id: UUID,
+    start_date: Optional[dt.datetime] = None,
+    end_date: Optional[dt.datetime] = None,
+    category_id: Optional[int] = None,
+    type: Optional[TransactionType] = None,
+    source: Optional[str] = None,
+    include_reversals: bool = False,
+    q: Optional[str] = None,
+):
+    """Filtros comunes del listado de transacciones (listado paginado y exportaciones)."""
+    query = query.where(Transaction.user_id == user_id)
+
+    if q and q.strip():
+        query = query.where(text_search(q.strip())[0])
+
+    if start_date:
+        query = query.where(Transaction.date >= start_date)
+    if end_date:
+        query = query.where(Transaction.date <= end_date)
+    if category_id:
+        query = query.where(Transaction.category_id == category_id)
+    if type in ["income", "expense", "transfer"]:
+        query = query.where(Transaction.type == type)
+
+    # ✅ Filtro por fuente
+    if source == "account":
+        query = query.where(Transaction.debt_id == None)
+    elif source == "credit_card":
+        query = query.where(Transaction.debt_id != None)
+
+    if not include_reversals:
+        query = query.where(Transaction.reversed_transaction_id == None)
+
+    return query
+
+
+def encode_cursor(date: dt.datetime, transaction_id: int) -> str:
+    """Cursor opaco con la clave (fecha, id) de la última fila entregada."""
+    raw = json.dumps({"d": date.isoformat(), "i": transaction_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[dt.datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return dt.datetime.fromisoformat(data["d"]), int(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Cursor inválido")
@@ -0,0 +1,77 @@
+import datetime as dt
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+# La app crea el engine al importarse: la BD de pruebas (SQLite temporal) va antes
+_DB_DIR = tempfile.mkdtemp(prefix="finanzas-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["FX_REFRESH_INTERVAL_SECONDS"] = "0"  # sin red: las pruebas siembran la caché de tasas
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.core.security import create_access_token
+from app.database import engine
+from app.main import app
+from app.models.subscription import Subscription
+from app.models.user import User
+from app.utils.category_helpers import create_base_categories
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _new_user():
+    with Session(engine) as session:
+        new_user = User(email=f"{uuid.uuid4()}@test.com", hashed_password="x")
+        session.add(new_user)
+        session.commit()
+        session.refresh(new_user)
+        session.add(Subscription(
+            user_id=new_user.id,
+            start_date=dt.datetime(2020, 1, 1),
+            end_date=dt.datetime(2100, 1, 1),
+        ))
+        session.commit()
+        create_base_categories(new_user.id, session)
+        user_id = new_user.id
+    return user_id, {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+
+
+@pytest.fixture
+def make_user(client):
+    """Crea usuarios nuevos, cada uno con suscripción vigente y categorías base: (user_id, headers)."""
+    return _new_user
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+@contextmanager
+def _count_queries():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def count_queries():
+    """Context manager que junta las sentencias SQL ejecutadas dentro del bloque."""
+    return _count_queries
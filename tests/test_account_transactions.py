@@ -0,0 +1,60 @@
+import pytest
+
+
+@pytest.mark.parametrize("params", [{}, {"cursor": ""}])
+def test_account_transactions_balance_after(client, user, params):
+    _, headers = user
+    source = client.post("/saving-accounts", json={"name": "Origen", "type": "bank", "balance": 1000}, headers=headers).json()
+    target = client.post("/saving-accounts", json={"name": "Destino", "type": "bank", "balance": 0}, headers=headers).json()
+    category = client.post("/categories", json={"name": "Salario", "type": "income"}, headers=headers).json()
+    response = client.post("/transactions", json={
+        "amount": 200, "type": "income", "category_id": category["id"], "saving_account_id": source["id"],
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    response = client.post("/transactions/transfer", json={
+        "amount": 300, "from_account_id": source["id"], "to_account_id": target["id"],
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+
+    def balances(account):
+        response = client.get(f"/saving-accounts/{account['id']}/transactions", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        items = body if isinstance(body, list) else body["items"]
+        return [item["balance_after"] for item in items]
+
+    # Más reciente primero; ambas patas de la transferencia muestran el saldo de la cuenta consultada
+    assert balances(source) == [900, 900, 1200]
+    assert balances(target) == [300, 0]
+
+
+def test_account_transactions_pages_read_stored_balances(client, user, count_queries):
+    _, headers = user
+    account = client.post("/saving-accounts", json={"name": "Principal", "type": "bank", "balance": 100}, headers=headers).json()
+    other = client.post("/saving-accounts", json={"name": "Bolsillo", "type": "cash", "balance": 0}, headers=headers).json()
+    category = client.post("/categories", json={"name": "Ventas", "type": "income"}, headers=headers).json()
+    for i in range(20):
+        if i % 4 == 3:
+            client.post("/transactions/transfer", json={
+                "amount": 5, "from_account_id": account["id"], "to_account_id": other["id"],
+            }, headers=headers)
+        else:
+            client.post("/transactions", json={
+                "amount": 10 + i, "type": "income", "category_id": category["id"], "saving_account_id": account["id"],
+                "date": f"2025-03-{1 + (i * 7) % 28:02d}T12:00:00",
+            }, headers=headers)
+    url = f"/saving-accounts/{account['id']}/transactions"
+
+    full = client.get(url, headers=headers).json()
+    paged, cursor = [], ""
+    while cursor is not None:
+        with count_queries() as statements:
+            page = client.get(url, params={"cursor": cursor, "page_size": 4}, headers=headers).json()
+        assert not any(" OVER " in statement.upper() for statement in statements)
+        paged += page["items"]
+        cursor = page["next_cursor"]
+
+    assert [(item["id"], item["balance_after"]) for item in paged] == [(item["id"], item["balance_after"]) for item in full]
+    # Saldo final de la cuenta en la fila más reciente
+    balance = next(item["balance"] for item in client.get("/saving-accounts", headers=headers).json() if item["id"] == account["id"])
+    assert full[0]["balance_after"] == balance
@@ -0,0 +1,132 @@
+import datetime as dt
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models.saving_account import SavingAccount
+from app.models.saving_account_balance_snapshot import SavingAccountBalanceSnapshot
+from app.models.transaction import Transaction
+from app.utils.reconciliation_helpers import reconcile_users
+
+OPENING = 50
+# Depósitos de 5, gastos de 7 y retiros de 4: el saldo se agota y parte de las salidas se rechaza
+OPERATIONS = {"deposit": 5, "expense": -7, "withdraw": -4}
+
+
+def test_concurrent_balance_updates_are_not_lost(client, user):
+    user_id, headers = user
+    account = client.post("/saving-accounts", json={"name": "Compartida", "type": "bank", "balance": OPENING}, headers=headers).json()
+    category = client.post("/categories", json={"name": "Mercado", "type": "expense"}, headers=headers).json()
+
+    def run(i):
+        kind = list(OPERATIONS)[i % len(OPERATIONS)]
+        amount = abs(OPERATIONS[kind])
+        if kind == "expense":
+            response = client.post("/transactions", json={
+                "amount": amount, "type": "expense", "category_id": category["id"], "saving_account_id": account["id"],
+            }, headers=headers)
+        else:
+            response = client.post(f"/saving-accounts/{account['id']}/{kind}", json={"amount": amount}, headers=headers)
+        return kind, response.status_code
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = Counter(pool.map(run, range(240)))
+
+    assert {status for _, status in results} <= {200, 400}, results
+    assert all(status == 200 for kind, status in results if kind == "deposit"), results
+    accepted = sum(OPERATIONS[kind] * count for (kind, status), count in results.items() if status == 200)
+
+    with Session(engine) as session:
+        balance = session.get(SavingAccount, account["id"]).balance
+    assert balance == OPENING + accepted
+    assert balance >= 0
+    assert reconcile_users([user_id])["accounts"] == []
+
+
+def test_concurrent_date_edits_keep_running_balances(client, user):
+    user_id, headers = user
+    account = client.post("/saving-accounts", json={"name": "Historial", "type": "bank", "balance": OPENING}, headers=headers).json()
+    category = client.post("/categories", json={"name": "Ventas", "type": "income"}, headers=headers).json()
+    today = dt.datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def income(amount, days_ago):
+        response = client.post("/transactions", json={
+            "amount": amount, "type": "income", "category_id": category["id"],
+            "saving_account_id": account["id"], "date": (today - dt.timedelta(days=days_ago)).isoformat(),
+        }, headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+
+    seeded = [income(10 + i, i % 7) for i in range(60)]
+
+    # Cambios de fecha compitiendo con altas y bajas en la misma cuenta
+    def run(i):
+        if i % 3 == 0:
+            return client.post("/transactions", json={
+                "amount": 3, "type": "income", "category_id": category["id"],
+                "saving_account_id": account["id"], "date": (today - dt.timedelta(days=i % 5)).isoformat(),
+            }, headers=headers).status_code
+        if i % 3 == 1:
+            return client.delete(f"/transactions/{seeded[i]}", headers=headers).status_code
+        return client.patch(f"/transactions/{seeded[i]}", json={
+            "date": (today - dt.timedelta(days=(i * 5) % 9)).isoformat(),
+        }, headers=headers).status_code
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        statuses = list(pool.map(run, range(len(seeded))))
+    assert set(statuses) == {200}, statuses
+
+    with Session(engine) as session:
+        rows = session.exec(
+            select(Transaction)
+            .where(Transaction.saving_account_id == account["id"])
+            .order_by(Transaction.date, Transaction.id)
+        ).all()
+        snapshots = session.exec(
+            select(SavingAccountBalanceSnapshot).where(SavingAccountBalanceSnapshot.saving_account_id == account["id"])
+        ).all()
+        balance = session.get(SavingAccount, account["id"]).balance
+
+    running, closing = OPENING, {}
+    for row in rows:
+        running += row.amount
+        assert row.balance_after == running, row.id
+        closing[row.date.date()] = running
+    assert balance == running
+    for snapshot in snapshots:
+        days = [day for day in closing if day <= snapshot.day]
+        expected = closing[max(days)] if days else OPENING
+        assert snapshot.balance == expected, snapshot.day
+    assert reconcile_users([user_id])["accounts"] == []
+
+
+def test_import_racing_withdrawals_never_overdraws(client, user):
+    user_id, headers = user
+    account = client.post("/saving-accounts", json={"name": "Extracto", "type": "bank", "balance": 100}, headers=headers).json()
+    client.post("/categories", json={"name": "Compras", "type": "expense"}, headers=headers)
+    statement = "date,amount,description,category\n" + "".join(
+        f"2025-01-{day:02d},-{8},compra {day},Compras\n" for day in range(1, 11)
+    )
+
+    def run(i):
+        if i == 0:
+            response = client.post("/transactions/import", data={"saving_account_id": account["id"]},
+                                   files={"file": ("extracto.csv", statement.encode(), "text/csv")}, headers=headers)
+            assert response.status_code in (200, 400), response.text
+            return "import", response.json()["imported"] if response.status_code == 200 else 0
+        response = client.post(f"/saving-accounts/{account['id']}/withdraw", json={"amount": 10}, headers=headers)
+        assert response.status_code in (200, 400), response.text
+        return "withdraw", response.status_code == 200
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(run, range(9)))
+
+    imported = sum(value for kind, value in results if kind == "import")
+    withdrawn = sum(1 for kind, ok in results if kind == "withdraw" and ok)
+    with Session(engine) as session:
+        balance = session.get(SavingAccount, account["id"]).balance
+    assert balance == 100 - 8 * imported - 10 * withdrawn
+    assert balance >= 0
+    assert reconcile_users([user_id])["accounts"] == []
@@ -0,0 +1,39 @@
+import pytest
+
+from sqlmodel import Session
+
+from app.database import engine
+from app.models.debt import Debt
+from app.utils.reconciliation_helpers import reconcile_users
+
+
+def test_update_debt_with_movements_keeps_initial_amount(client, user):
+    user_id, headers = user
+    account = client.post("/saving-accounts", json={"name": "Nómina", "type": "bank", "balance": 5000}, headers=headers).json()
+    debt = client.post("/debts", json={"name": "Préstamo", "total_amount": 1000, "interest_rate": 1}, headers=headers).json()
+    response = client.post(f"/debts/{debt['id']}/pay", json={"amount": 200, "saving_account_id": account["id"]}, headers=headers)
+    assert response.status_code == 200, response.text
+
+    response = client.put(f"/debts/{debt['id']}", json={
+        "name": "Préstamo carro", "total_amount": 800, "interest_rate": 1,
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+
+    with Session(engine) as session:
+        stored = session.get(Debt, debt["id"])
+        assert (stored.name, stored.total_amount, stored.initial_amount) == ("Préstamo carro", 800, 1000)
+    assert reconcile_users([user_id])["debts"] == []
+
+
+def test_payoff_within_a_cent_closes_without_drift(client, user):
+    user_id, headers = user
+    account = client.post("/saving-accounts", json={"name": "Ahorros", "type": "bank", "balance": 5000}, headers=headers).json()
+    debt = client.post("/debts", json={"name": "Crédito", "total_amount": 1000.008, "interest_rate": 1}, headers=headers).json()
+    response = client.post(f"/debts/{debt['id']}/pay", json={"amount": 1000, "saving_account_id": account["id"]}, headers=headers)
+    assert response.status_code == 200, response.text
+
+    with Session(engine) as session:
+        stored = session.get(Debt, debt["id"])
+        assert stored.status == "closed"
+        assert stored.total_amount == pytest.approx(0.008)
+    assert reconcile_users([user_id])["debts"] == []
@@ -0,0 +1,42 @@
+import pytest
+
+
+@pytest.mark.parametrize("path", ["/saving-accounts", "/debts", "/categories", "/summary"])
+def test_unchanged_data_returns_304(client, user, path):
+    _, headers = user
+    first = client.get(path, headers=headers)
+    assert first.status_code == 200, first.text
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    again = client.get(path, headers={**headers, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert again.content == b""
+
+    # Lista de etiquetas, etiqueta débil y comodín también coinciden
+    for if_none_match in [f'"otra", {etag}', f"W/{etag}", "*"]:
+        assert client.get(path, headers={**headers, "If-None-Match": if_none_match}).status_code == 304
+
+
+def test_etag_changes_after_write_and_with_query(client, user):
+    _, headers = user
+    etag = client.get("/saving-accounts", headers=headers).headers["ETag"]
+
+    client.post("/saving-accounts", json={"name": "Nueva", "type": "bank", "balance": 10}, headers=headers)
+    response = client.get("/saving-accounts", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [account["name"] for account in response.json()] == ["Nueva"]
+
+    summary = client.get("/summary", params={"tz": "UTC"}, headers=headers).headers["ETag"]
+    assert client.get("/summary", params={"tz": "America/Bogota"}, headers=headers).headers["ETag"] != summary
+
+
+def test_etags_are_per_user(client, make_user):
+    _, first_headers = make_user()
+    _, second_headers = make_user()
+    etag = client.get("/saving-accounts", headers=first_headers).headers["ETag"]
+
+    response = client.get("/saving-accounts", headers={**second_headers, "If-None-Match": etag})
+    assert response.status_code == 200
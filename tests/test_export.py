@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.scripts.export_transactions import export_transactions
+
+NAMES = ["id", "date", "type", "amount", "transaction_fee", "currency", "description", "category", "account",
+         "from_account", "to_account", "debt", "source_type", "is_cancelled", "reversed_transaction_id", "transfer_group_id"]
+
+
+@pytest.fixture
+def ledger(client, user):
+    _, headers = user
+    bank = client.post("/saving-accounts", json={"name": "Banco", "type": "bank", "balance": 1000}, headers=headers).json()
+    cash = client.post("/saving-accounts", json={"name": "Efectivo", "type": "cash", "balance": 0}, headers=headers).json()
+    salary = client.post("/categories", json={"name": "Salario", "type": "income"}, headers=headers).json()
+    food = client.post("/categories", json={"name": "Comida", "type": "expense"}, headers=headers).json()
+    for json_body in [
+        {"amount": 500, "type": "income", "category_id": salary["id"], "saving_account_id": bank["id"],
+         "date": "2025-01-05T10:00:00", "description": 'Pago "enero", con coma'},
+        {"amount": 42.5, "type": "expense", "category_id": food["id"], "saving_account_id": bank["id"],
+         "date": "2025-01-06T10:00:00", "description": "Panadería\nsegunda línea"},
+    ]:
+        assert client.post("/transactions", json=json_body, headers=headers).status_code == 200
+    client.post("/transactions/transfer", json={"amount": 100, "from_account_id": bank["id"], "to_account_id": cash["id"]}, headers=headers)
+    mistake = client.post("/transactions", json={
+        "amount": 9, "type": "expense", "category_id": food["id"], "saving_account_id": bank["id"], "date": "2025-01-07T10:00:00",
+    }, headers=headers).json()
+    client.post(f"/transactions/{mistake['id']}/reverse", json={"note": "error"}, headers=headers)
+    return headers
+
+
+def _export(client, headers, **params):
+    response = client.get("/transactions/export", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_csv_and_ndjson_exports_hold_the_same_rows(client, ledger):
+    csv_response = _export(client, ledger, format="csv")
+    assert csv_response.headers["content-type"].startswith("text/csv")
+    assert csv_response.headers["content-disposition"].startswith('attachment; filename="transacciones-')
+    reader = csv.reader(io.StringIO(csv_response.text))
+    assert next(reader) == NAMES
+    csv_rows = [dict(zip(NAMES, row)) for row in reader]
+
+    ndjson_response = _export(client, ledger, format="ndjson")
+    assert ndjson_response.headers["content-type"] == "application/x-ndjson"
+    ndjson_rows = [json.loads(line) for line in ndjson_response.text.splitlines()]
+
+    # Sin reversas por defecto: la original cancelada sí, su reversa no
+    assert [row["id"] for row in ndjson_rows] == [int(row["id"]) for row in csv_rows]
+    assert len(ndjson_rows) == 5
+    assert all(row["reversed_transaction_id"] is None for row in ndjson_rows)
+    assert [row["description"] for row in ndjson_rows[:2]] == ['Pago "enero", con coma', "Panadería\nsegunda línea"]
+    assert [row["description"] for row in csv_rows[:2]] == ['Pago "enero", con coma', "Panadería\nsegunda línea"]
+    assert ndjson_rows[1] | {"id": None} == {
+        "id": None, "date": "2025-01-06T10:00:00", "type": "expense", "amount": 42.5, "transaction_fee": 0.0,
+        "currency": "COP", "description": "Panadería\nsegunda línea", "category": "Comida", "account": "Banco",
+        "from_account": None, "to_account": None, "debt": None, "source_type": None, "is_cancelled": False,
+        "reversed_transaction_id": None, "transfer_group_id": None,
+    }
+    transfer = [row for row in ndjson_rows if row["from_account"]]
+    assert {(row["from_account"], row["to_account"]) for row in transfer} == {("Banco", "Efectivo")}
+
+
+def test_exports_apply_list_filters(client, ledger):
+    rows = [json.loads(line) for line in _export(client, ledger, format="ndjson", type="expense").text.splitlines()]
+    assert {row["type"] for row in rows} == {"expense"}
+
+    rows = [json.loads(line) for line in _export(client, ledger, format="ndjson", include_reversals=True).text.splitlines()]
+    assert len(rows) == 6
+    assert sum(1 for row in rows if row["reversed_transaction_id"]) == 1
+
+    rows = [json.loads(line) for line in _export(client, ledger, format="ndjson", startDate="2025-01-06T00:00:00", endDate="2025-01-06T23:59:59").text.splitlines()]
+    assert [row["amount"] for row in rows] == [42.5]
+
+
+def test_parquet_export_matches_ndjson(client, ledger):
+    response = _export(client, ledger, format="parquet", include_reversals=True)
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.schema.names == NAMES
+    assert table.schema.field("date").type == pa.timestamp("us")
+    assert table.schema.field("is_cancelled").type == pa.bool_()
+
+    ndjson_rows = [json.loads(line) for line in _export(client, ledger, format="ndjson", include_reversals=True).text.splitlines()]
+    parquet_rows = table.to_pylist()
+    for row in parquet_rows:
+        row["date"] = row["date"].isoformat()
+    assert parquet_rows == ndjson_rows
+
+
+@pytest.mark.parametrize("extension", ["parquet", "csv", "ndjson"])
+def test_cli_export_writes_every_format(client, ledger, user, tmp_path, extension):
+    user_id, _ = user
+    path = tmp_path / f"movimientos.{extension}"
+    export_transactions(user_id, str(path))
+
+    if extension == "parquet":
+        ids = pq.read_table(path).column("id").to_pylist()
+    elif extension == "csv":
+        with open(path, encoding="utf-8", newline="") as handle:
+            reader = csv.reader(handle)
+            assert next(reader) == NAMES
+            ids = [int(row[0]) for row in reader]
+    else:
+        with open(path, encoding="utf-8") as handle:
+            ids = [json.loads(line)["id"] for line in handle]
+    # El script exporta con reversas por defecto
+    expected = [row["id"] for row in map(json.loads, _export(client, ledger, format="ndjson", include_reversals=True).text.splitlines())]
+    assert ids == expected and len(ids) == 6
+
+
+def test_cli_rejects_unknown_extension(user, tmp_path):
+    with pytest.raises(SystemExit):
+        export_transactions(user[0], str(tmp_path / "movimientos.xlsx"))
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+
+from app.routes import fx
+
+
+@pytest.fixture
+def rates(monkeypatch):
+    """Caché de tasas aislada, sin red: cualquier llamada HTTP síncrona falla la prueba."""
+    cache = {}
+    monkeypatch.setattr(fx, "_CACHE", cache)
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("resolve_rate salió a la red")
+
+    monkeypatch.setattr(fx.httpx, "Client", no_network)
+    return cache
+
+
+def test_resolve_rate_serves_stale_rate_without_network(rates):
+    stale = time.time() - fx.TTL_SECONDS * 3
+    rates[("USD", "COP")] = (stale, 4000.0)
+
+    quote = fx.resolve_rate("USD", "COP")
+
+    assert (quote["rate"], quote["as_of"], quote["source"]) == (4000.0, int(stale), "cache")
+
+
+def test_consolidated_summary_uses_stored_rates(client, user, rates):
+    _, headers = user
+    old = time.time() - fx.TTL_SECONDS * 2
+    rates.update({("USD", "COP"): (old, 4000.0), ("EUR", "COP"): (old, 4500.0)})
+    client.post("/saving-accounts", json={"name": "Dólares", "type": "bank", "balance": 10, "currency": "USD"}, headers=headers)
+
+    response = client.get("/summary-extra/net-worth-summary", params={"base_currency": "COP"}, headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["total"]["total_assets"] == 40000
+
+
+def test_refresh_rates_forever_updates_cache(rates, monkeypatch):
+    async def fetch(base, target):
+        return {"USD": 2.0, "EUR": 3.0, "COP": 0.5}[base]
+
+    async def down(base, target):
+        raise RuntimeError("proveedor caído")
+
+    monkeypatch.setattr(fx, "fetch_rate_exchangerate_host", down)
+    monkeypatch.setattr(fx, "fetch_rate_open_er_api", fetch)
+
+    async def one_round():
+        task = asyncio.create_task(fx.refresh_rates_forever(interval=3600))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(one_round())
+
+    assert {pair: rate for pair, (_, rate) in rates.items()} == {
+        ("COP", "USD"): 0.5, ("COP", "EUR"): 0.5,
+        ("USD", "COP"): 2.0, ("USD", "EUR"): 2.0,
+        ("EUR", "COP"): 3.0, ("EUR", "USD"): 3.0,
+    }
@@ -0,0 +1,119 @@
+import pytest
+from sqlmodel import Session, func, select
+
+from app.database import engine
+from app.models.idempotency_key import IdempotencyKey
+from app.models.transaction import Transaction
+from app.utils import idempotency_helpers
+
+
+@pytest.fixture
+def books(client, user):
+    """Cuenta con saldo, cuenta destino, categoría de gasto, préstamo y tarjeta de crédito."""
+    user_id, headers = user
+    bank = client.post("/saving-accounts", json={"name": "Banco", "type": "bank", "balance": 1000}, headers=headers).json()
+    cash = client.post("/saving-accounts", json={"name": "Efectivo", "type": "cash", "balance": 0}, headers=headers).json()
+    category = client.post("/categories", json={"name": "Mercado", "type": "expense"}, headers=headers).json()
+    loan = client.post("/debts", json={"name": "Préstamo", "total_amount": 500, "interest_rate": 1}, headers=headers).json()
+    card = client.post("/debts", json={
+        "name": "Tarjeta", "total_amount": 0, "interest_rate": 2, "currency": "COP", "kind": "credit_card",
+    }, headers=headers).json()
+
+    def state():
+        with Session(engine) as session:
+            rows = session.exec(select(func.count()).select_from(Transaction).where(Transaction.user_id == user_id)).one()
+        balances = {item["id"]: item["balance"] for item in client.get("/saving-accounts", headers=headers).json()}
+        debts = {item["id"]: item["total_amount"] for item in client.get("/debts", headers=headers).json()}
+        return rows, balances, debts
+
+    return {"headers": headers, "bank": bank, "cash": cash, "category": category, "loan": loan, "card": card, "state": state}
+
+
+# (ruta, payload, payload distinto) para cada endpoint que acepta Idempotency-Key
+ENDPOINTS = {
+    "transaction": lambda b: ("/transactions", {
+        "amount": 40, "type": "expense", "category_id": b["category"]["id"], "saving_account_id": b["bank"]["id"],
+    }, {"amount": 41, "type": "expense", "category_id": b["category"]["id"], "saving_account_id": b["bank"]["id"]}),
+    "deposit": lambda b: (f"/saving-accounts/{b['bank']['id']}/deposit", {"amount": 40}, {"amount": 41}),
+    "withdraw": lambda b: (f"/saving-accounts/{b['bank']['id']}/withdraw", {"amount": 40}, {"amount": 41}),
+    "transfer": lambda b: ("/transactions/transfer", {
+        "amount": 40, "from_account_id": b["bank"]["id"], "to_account_id": b["cash"]["id"],
+    }, {"amount": 41, "from_account_id": b["bank"]["id"], "to_account_id": b["cash"]["id"]}),
+    "debt-pay": lambda b: (f"/debts/{b['loan']['id']}/pay", {"amount": 40, "saving_account_id": b["bank"]["id"]},
+                           {"amount": 41, "saving_account_id": b["bank"]["id"]}),
+    "debt-purchase": lambda b: (f"/debts/{b['card']['id']}/purchase", {"amount": 40, "category_id": b["category"]["id"]},
+                                {"amount": 41, "category_id": b["category"]["id"]}),
+}
+
+
+@pytest.mark.parametrize("endpoint", list(ENDPOINTS))
+def test_retry_replays_the_stored_response_without_writing_twice(client, books, endpoint):
+    path, payload, _ = ENDPOINTS[endpoint](books)
+    headers = {**books["headers"], "Idempotency-Key": f"{endpoint}-1"}
+    before = books["state"]()
+
+    first = client.post(path, json=payload, headers=headers)
+    assert first.status_code == 200, first.text
+    after_first = books["state"]()
+    assert after_first != before
+
+    retry = client.post(path, json=payload, headers=headers)
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert books["state"]() == after_first
+
+
+@pytest.mark.parametrize("endpoint", list(ENDPOINTS))
+def test_reused_key_with_another_payload_is_rejected(client, books, endpoint):
+    path, payload, other = ENDPOINTS[endpoint](books)
+    headers = {**books["headers"], "Idempotency-Key": f"{endpoint}-2"}
+    assert client.post(path, json=payload, headers=headers).status_code == 200
+    after_first = books["state"]()
+
+    response = client.post(path, json=other, headers=headers)
+    assert response.status_code == 422
+    assert response.json()["detail"] == "La Idempotency-Key ya se usó con otra solicitud."
+    assert books["state"]() == after_first
+
+
+def test_reused_key_on_another_endpoint_is_rejected(client, books):
+    headers = {**books["headers"], "Idempotency-Key": "compartida"}
+    bank_id = books["bank"]["id"]
+    assert client.post(f"/saving-accounts/{bank_id}/deposit", json={"amount": 40}, headers=headers).status_code == 200
+    assert client.post(f"/saving-accounts/{bank_id}/withdraw", json={"amount": 40}, headers=headers).status_code == 422
+
+
+def test_keys_are_scoped_per_user(client, books, make_user):
+    headers = {**books["headers"], "Idempotency-Key": "misma"}
+    assert client.post(f"/saving-accounts/{books['bank']['id']}/deposit", json={"amount": 40}, headers=headers).status_code == 200
+
+    _, other_headers = make_user()
+    account = client.post("/saving-accounts", json={"name": "Otra", "type": "bank", "balance": 0}, headers=other_headers).json()
+    response = client.post(f"/saving-accounts/{account['id']}/deposit", json={"amount": 40}, headers={**other_headers, "Idempotency-Key": "misma"})
+    assert response.status_code == 200
+    assert [item["balance"] for item in client.get("/saving-accounts", headers=other_headers).json()] == [40]
+
+
+def test_failed_request_releases_its_key(client, books):
+    headers = {**books["headers"], "Idempotency-Key": "sin-fondos"}
+    path = f"/saving-accounts/{books['bank']['id']}/withdraw"
+    assert client.post(path, json={"amount": 5000}, headers=headers).status_code == 400
+
+    # El rollback liberó la clave: un pago válido con la misma clave se procesa
+    response = client.post(path, json={"amount": 40}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["balance"] == 960
+
+
+def test_expired_key_is_processed_again(client, books, monkeypatch):
+    headers = {**books["headers"], "Idempotency-Key": "vencida"}
+    bank_id = books["bank"]["id"]
+    path = f"/saving-accounts/{bank_id}/deposit"
+    assert client.post(path, json={"amount": 40}, headers=headers).status_code == 200
+
+    monkeypatch.setattr(idempotency_helpers, "IDEMPOTENCY_KEY_TTL_SECONDS", -1)
+    assert client.post(path, json={"amount": 40}, headers=headers).status_code == 200
+    assert books["state"]()[1][bank_id] == 1080
+    with Session(engine) as session:
+        keys = session.exec(select(func.count()).select_from(IdempotencyKey).where(IdempotencyKey.key == "vencida")).one()
+    assert keys == 1
@@ -0,0 +1,25 @@
+import pytest
+
+from app.utils.import_helpers import _parse_amount
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("1234", 1234),
+    ("1234.56", 1234.56),
+    ("1234,56", 1234.56),
+    ("1.234,56", 1234.56),
+    ("1,234.56", 1234.56),
+    ("1.234.567", 1234567),
+    ("1,234,567", 1234567),
+    ("1.500.000,00", 1500000),
+    ("1,500,000.00", 1500000),
+    ("$ 1.500.000", 1500000),
+    ("-45.000,50", -45000.5),
+])
+def test_parse_amount(raw, expected):
+    assert _parse_amount(raw) == pytest.approx(expected)
+
+
+def test_parse_amount_rejects_garbage():
+    with pytest.raises(ValueError, match="Monto inválido"):
+        _parse_amount("12abc")
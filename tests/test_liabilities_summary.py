@@ -0,0 +1,38 @@
+import datetime as dt
+
+
+def _seed_debts(client, headers, debts, purchases_per_debt):
+    category = client.post("/categories", json={"name": "Compras", "type": "expense"}, headers=headers).json()
+    for i in range(debts):
+        debt = client.post("/debts", json={
+            "name": f"Tarjeta {i}", "total_amount": 100, "interest_rate": 2,
+            "currency": "COP", "kind": "credit_card",
+        }, headers=headers).json()
+        for j in range(purchases_per_debt):
+            response = client.post(f"/debts/{debt['id']}/purchase", json={
+                "amount": 10 + j, "category_id": category["id"],
+                "date": (dt.datetime.utcnow() - dt.timedelta(days=j)).isoformat(),
+            }, headers=headers)
+            assert response.status_code == 200, response.text
+
+
+def _liabilities(client, headers, count_queries):
+    with count_queries() as statements:
+        response = client.get("/summary-extra/liabilities-summary", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json(), len(statements)
+
+
+def test_liabilities_summary_query_count_does_not_grow_with_debts(client, make_user, count_queries):
+    _, few_headers = make_user()
+    _seed_debts(client, few_headers, debts=1, purchases_per_debt=1)
+    _, many_headers = make_user()
+    _seed_debts(client, many_headers, debts=15, purchases_per_debt=10)
+
+    few, few_queries = _liabilities(client, few_headers, count_queries)
+    many, many_queries = _liabilities(client, many_headers, count_queries)
+
+    assert few["total_liabilities"]["COP"] == 110
+    assert many["total_liabilities"]["COP"] == 15 * (100 + sum(10 + j for j in range(10)))
+    assert many_queries == few_queries
+    assert many_queries <= 5, many_queries
@@ -0,0 +1,50 @@
+import datetime as dt
+
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models.category import Category, CategoryType
+from app.models.monthly_snapshot import MonthlySnapshot
+from app.models.saving_account import Currency
+from app.utils.cache_helpers import bump_data_version
+from app.utils.snapshot_helpers import SNAPSHOT_SUMMARY, get_or_freeze
+
+MONTH = dt.date(2024, 5, 1)
+
+
+def _frozen(user_id):
+    with Session(engine) as session:
+        return session.exec(select(MonthlySnapshot).where(MonthlySnapshot.user_id == user_id)).all()
+
+
+def test_freeze_leaves_the_request_session_untouched(client, user):
+    user_id, _ = user
+    with Session(engine) as session:
+        pending = Category(name="Pendiente", type=CategoryType.expense, user_id=user_id)
+        with session.no_autoflush:
+            session.add(pending)
+            payloads = get_or_freeze(session, user_id, SNAPSHOT_SUMMARY, "UTC", MONTH, lambda: {Currency.COP: {"total": 1}})
+            assert pending in session.new
+        session.rollback()
+
+    assert payloads == {Currency.COP: {"total": 1}}
+    assert [(row.month, row.payload) for row in _frozen(user_id)] == [(MONTH, {"total": 1})]
+    with Session(engine) as session:
+        assert session.exec(select(Category).where(Category.user_id == user_id, Category.name == "Pendiente")).first() is None
+
+
+def test_month_computed_against_stale_data_is_not_frozen(client, user):
+    user_id, _ = user
+
+    def compute_while_writing():
+        # Una escritura se confirma mientras se calcula el mes
+        with Session(engine) as writer:
+            bump_data_version(writer, user_id)
+            writer.commit()
+        return {Currency.COP: {"total": 2}}
+
+    with Session(engine) as session:
+        payloads = get_or_freeze(session, user_id, SNAPSHOT_SUMMARY, "UTC", MONTH, compute_while_writing)
+
+    assert payloads == {Currency.COP: {"total": 2}}
+    assert _frozen(user_id) == []
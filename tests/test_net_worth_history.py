@@ -0,0 +1,73 @@
+import datetime as dt
+
+from sqlmodel import Session
+
+from app.database import engine
+from app.models.debt import Debt
+
+
+def test_net_worth_history_excludes_records_before_creation(client, user):
+    _, headers = user
+    today = dt.datetime.utcnow().date()
+    client.post("/saving-accounts", json={"name": "Ahorros", "type": "bank", "balance": 1000}, headers=headers)
+    category = client.post("/categories", json={"name": "Compras", "type": "expense"}, headers=headers).json()
+    debt = client.post("/debts", json={
+        "name": "Tarjeta", "total_amount": 300, "interest_rate": 2,
+        "currency": "COP", "kind": "credit_card",
+    }, headers=headers).json()
+    # Compra con fecha anterior a la creación de la deuda
+    response = client.post(f"/debts/{debt['id']}/purchase", json={
+        "amount": 50, "category_id": category["id"],
+        "date": dt.datetime.combine(today - dt.timedelta(days=2), dt.time(12)).isoformat(),
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+
+    response = client.get("/summary-extra/net-worth-history", params={
+        "from": (today - dt.timedelta(days=4)).isoformat(), "to": today.isoformat(), "granularity": "day",
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+
+    points = {point["as_of"]: point for point in response.json()["COP"]}
+    expected = {
+        4: (0, 0), 3: (0, 0),
+        2: (0, 50), 1: (0, 50),
+        0: (1000, 350),
+    }
+    for days_ago, (assets, liabilities) in expected.items():
+        point = points[(today - dt.timedelta(days=days_ago)).isoformat()]
+        assert (point["total_assets"], point["total_liabilities"]) == (assets, liabilities), days_ago
+
+
+def test_latest_history_point_matches_net_worth_summary(client, user):
+    _, headers = user
+    today = dt.datetime.utcnow().date()
+    account = client.post("/saving-accounts", json={"name": "Nómina", "type": "bank", "balance": 1000}, headers=headers).json()
+    spare = client.post("/saving-accounts", json={"name": "Vieja", "type": "cash", "balance": 200}, headers=headers).json()
+    assert client.post(f"/saving-accounts/{spare['id']}/withdraw", json={"amount": 200}, headers=headers).status_code == 200
+    assert client.post(f"/saving-accounts/{spare['id']}/close", headers=headers).status_code == 200
+
+    # Tarjeta activa con saldo a favor: el resumen no la suma
+    category = client.post("/categories", json={"name": "Compras", "type": "expense"}, headers=headers).json()
+    card = client.post("/debts", json={
+        "name": "Tarjeta", "total_amount": 100, "interest_rate": 2, "kind": "credit_card",
+    }, headers=headers).json()
+    purchase = client.post(f"/debts/{card['id']}/purchase", json={"amount": 50, "category_id": category["id"]}, headers=headers).json()
+    assert client.post(f"/debts/{card['id']}/pay", json={"amount": 150, "saving_account_id": account["id"]}, headers=headers).status_code == 200
+    assert client.post(f"/transactions/{purchase['id']}/reverse", json={"note": "devolución"}, headers=headers).status_code == 200
+
+    # Préstamo pagado (se cierra solo); existía desde antes, así que ayer sí contaba
+    loan = client.post("/debts", json={"name": "Préstamo", "total_amount": 300, "interest_rate": 1}, headers=headers).json()
+    with Session(engine) as session:
+        session.get(Debt, loan["id"]).created_at = dt.datetime.combine(today - dt.timedelta(days=5), dt.time(9))
+        session.commit()
+    assert client.post(f"/debts/{loan['id']}/pay", json={"amount": 300, "saving_account_id": account["id"]}, headers=headers).status_code == 200
+
+    summary = client.get("/summary-extra/net-worth-summary", headers=headers).json()["COP"]
+    history = client.get("/summary-extra/net-worth-history", params={
+        "from": (today - dt.timedelta(days=1)).isoformat(), "to": today.isoformat(), "granularity": "day",
+    }, headers=headers).json()["COP"]
+
+    yesterday, latest = history
+    assert (latest["total_assets"], latest["total_liabilities"]) == (summary["total_assets"], summary["total_liabilities"])
+    assert (latest["total_assets"], latest["total_liabilities"]) == (550, 0)
+    assert yesterday["total_liabilities"] == 300
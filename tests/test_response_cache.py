@@ -0,0 +1,56 @@
+from app.utils import cache_helpers
+from app.utils.cache_helpers import ResponseCache, response_cache
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == (True, 1)  # "a" pasa a ser la más reciente
+    cache.set("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+    assert cache.stats()["entries"] == 2
+
+
+def test_response_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_helpers.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(max_entries=10, ttl_seconds=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_compute("k", compute) == 1
+    now[0] += 59
+    assert cache.get_or_compute("k", compute) == 1
+    now[0] += 2
+    assert cache.get_or_compute("k", compute) == 2
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
+
+
+def test_reports_are_cached_until_the_next_write(client, make_user):
+    _, headers = make_user()
+    account = client.post("/saving-accounts", json={"name": "Caja", "type": "cash", "balance": 100}, headers=headers).json()
+
+    def assets():
+        response = client.get("/summary-extra/net-worth-summary", headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()["COP"]["total_assets"]
+
+    assert assets() == 100
+    hits = response_cache.stats()["hits"]
+    assert assets() == 100
+    assert response_cache.stats()["hits"] == hits + 1
+
+    # La escritura sube data_version: la siguiente lectura no usa la entrada vieja
+    client.post(f"/saving-accounts/{account['id']}/deposit", json={"amount": 50}, headers=headers)
+    assert assets() == 150
+
+    # Otro usuario nunca recibe la respuesta cacheada del primero
+    _, other_headers = make_user()
+    assert client.get("/summary-extra/net-worth-summary", headers=other_headers).json() == {}
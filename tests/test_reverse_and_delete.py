@@ -0,0 +1,30 @@
+from app.utils.reconciliation_helpers import reconcile_users
+
+
+def test_reverse_and_delete_keep_balances_reconciled(client, user):
+    user_id, headers = user
+    source = client.post("/saving-accounts", json={"name": "Origen", "type": "bank", "balance": 1000}, headers=headers).json()
+    target = client.post("/saving-accounts", json={"name": "Destino", "type": "bank", "balance": 0}, headers=headers).json()
+    category = client.post("/categories", json={"name": "Salario", "type": "income"}, headers=headers).json()
+    income = client.post("/transactions", json={
+        "amount": 200, "type": "income", "category_id": category["id"], "saving_account_id": source["id"],
+    }, headers=headers).json()
+    legs = client.post("/transactions/transfer", json={
+        "amount": 300, "from_account_id": source["id"], "to_account_id": target["id"],
+    }, headers=headers).json()
+
+    def balance(account):
+        accounts = client.get("/saving-accounts", headers=headers).json()
+        return next(item["balance"] for item in accounts if item["id"] == account["id"])
+
+    response = client.post(f"/transactions/{legs[0]['id']}/reverse", json={"note": "error"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert (balance(source), balance(target)) == (1200, 0)
+    response = client.post(f"/transactions/{legs[1]['id']}/reverse", json={"note": "otra vez"}, headers=headers)
+    assert response.status_code == 400
+
+    response = client.delete(f"/transactions/{income['id']}", headers=headers)
+    assert response.status_code == 200, response.text
+    assert balance(source) == 1000
+
+    assert reconcile_users([user_id]) == {"users": 1, "accounts": [], "debts": []}
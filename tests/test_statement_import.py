@@ -0,0 +1,56 @@
+import datetime as dt
+
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models.saving_account_balance_snapshot import SavingAccountBalanceSnapshot
+from app.models.transaction import Transaction
+from app.models.transaction_rollup import TransactionRollup
+from app.utils.account_helpers import rebuild_balance_snapshots, rebuild_running_balances
+from app.utils.ledger_helpers import rebuild_rollup
+
+
+def _derived_state(session, user_id):
+    rollup = session.exec(select(TransactionRollup).where(TransactionRollup.user_id == user_id)).all()
+    snapshots = session.exec(
+        select(SavingAccountBalanceSnapshot).where(SavingAccountBalanceSnapshot.user_id == user_id)
+    ).all()
+    running = session.exec(select(Transaction.id, Transaction.balance_after).where(Transaction.user_id == user_id)).all()
+    return (
+        sorted((row.currency, row.bucket, row.category_id or 0, row.type, row.source_type or "", row.total, row.tx_count)
+               for row in rollup),
+        sorted((row.saving_account_id, row.day, row.balance) for row in snapshots),
+        sorted(running),
+    )
+
+
+def test_import_maintains_derived_state_incrementally(client, user):
+    user_id, headers = user
+    account = client.post("/saving-accounts", json={"name": "Banco", "type": "bank", "balance": 500}, headers=headers).json()
+    other = client.post("/saving-accounts", json={"name": "Efectivo", "type": "cash", "balance": 50}, headers=headers).json()
+    category = client.post("/categories", json={"name": "Mercado", "type": "expense"}, headers=headers).json()
+    today = dt.datetime.utcnow().replace(hour=10, minute=0, second=0, microsecond=0)
+    for days_ago, account_id in [(20, account["id"]), (5, account["id"]), (1, account["id"]), (3, other["id"])]:
+        response = client.post("/transactions", json={
+            "amount": 12, "type": "expense", "category_id": category["id"],
+            "saving_account_id": account_id, "date": (today - dt.timedelta(days=days_ago)).isoformat(),
+        }, headers=headers)
+        assert response.status_code == 200, response.text
+
+    # Filas con fechas intercaladas entre movimientos ya registrados
+    statement = "date,amount,description,category\n" + "".join(
+        f"{(today - dt.timedelta(days=days_ago)).isoformat()},{amount},fila {days_ago},Mercado\n"
+        for days_ago, amount in [(10, "\"-25,50\""), (5, "-4"), (2, "1.000"), (2, "-7")]
+    )
+    response = client.post("/transactions/import", data={"saving_account_id": account["id"]},
+                           files={"file": ("extracto.csv", statement.encode(), "text/csv")}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["imported"] == 4, response.json()
+
+    with Session(engine) as session:
+        incremental = _derived_state(session, user_id)
+        rebuild_rollup(session, user_id)
+        rebuild_balance_snapshots(session, user_id)
+        rebuild_running_balances(session, user_id)
+        assert incremental == _derived_state(session, user_id)
+        session.rollback()
@@ -0,0 +1,144 @@
+import datetime as dt
+from collections import defaultdict
+from zoneinfo import ZoneInfo
+
+import pytest
+from sqlalchemy import not_, or_
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models.debt import Debt
+from app.models.enums import TransactionType
+from app.models.saving_account import Currency, SavingAccount
+from app.models.transaction import Transaction
+
+EXCLUDED_SOURCES = ["transfer", "investment_yield", "debt_payment"]
+
+
+def _legacy_summary(user_id, start_date, end_date, tz):
+    """
+    Implementación original de GET /summary (traer las filas y agregar en Python),
+    usada como referencia: el resultado del endpoint debe coincidir con ella.
+    """
+    zone = ZoneInfo(tz)
+    start_utc = dt.datetime.combine(start_date, dt.time.min, zone).astimezone(dt.timezone.utc).replace(tzinfo=None)
+    end_utc = dt.datetime.combine(end_date, dt.time.max, zone).astimezone(dt.timezone.utc).replace(tzinfo=None)
+    in_range = (Transaction.user_id == user_id, Transaction.date >= start_utc, Transaction.date <= end_utc,
+                Transaction.is_cancelled == False)
+
+    result = {}
+    with Session(engine) as session:
+        for currency in Currency:
+            rows = session.exec(
+                select(Transaction)
+                .join(SavingAccount, Transaction.saving_account_id == SavingAccount.id)
+                .where(*in_range, Transaction.reversed_transaction_id.is_(None), SavingAccount.currency == currency)
+                .where(or_(Transaction.source_type.is_(None), not_(Transaction.source_type.in_(EXCLUDED_SOURCES))))
+            ).all() + session.exec(
+                select(Transaction)
+                .join(Debt, Transaction.debt_id == Debt.id)
+                .where(*in_range, Debt.currency == currency, Transaction.source_type == "credit_card_purchase")
+            ).all()
+
+            totals = {"income": 0.0, "expense": 0.0}
+            by_category = {"income": defaultdict(float), "expense": defaultdict(float)}
+            daily = defaultdict(lambda: {"income": 0.0, "expense": 0.0})
+            for tx in rows:
+                kind = "income" if tx.type == TransactionType.income else "expense"
+                totals[kind] += tx.amount
+                if tx.category:
+                    by_category[kind][(tx.category.id, tx.category.name)] += tx.amount
+                daily[tx.date.replace(tzinfo=dt.timezone.utc).astimezone(zone).date()][kind] += tx.amount
+
+            def categories(kind):
+                items = [
+                    {"category_id": cat_id, "category_name": name, "total": amount,
+                     "percentage": amount / totals[kind] * 100 if totals[kind] > 0 else 0}
+                    for (cat_id, name), amount in by_category[kind].items()
+                ]
+                return sorted(items, key=lambda item: item["total"], reverse=True)
+
+            days = [
+                {"date": day.isoformat(), "total_income": values["income"], "total_expense": values["expense"]}
+                for day, values in sorted(daily.items())
+            ]
+            expense, income = categories("expense"), categories("income")
+            result[currency.value] = {
+                "total_income": totals["income"],
+                "total_expense": totals["expense"],
+                "balance": totals["income"] - totals["expense"],
+                "expense_by_category": expense,
+                "income_by_category": income,
+                "daily_evolution": days,
+                "top_expense_category": expense[0] if expense else None,
+                "top_income_category": income[0] if income else None,
+                "top_expense_day": max(days, key=lambda d: d["total_expense"], default=None),
+                "top_income_day": max(days, key=lambda d: d["total_income"], default=None),
+                "overspending_alert": totals["expense"] > totals["income"],
+            }
+    return result
+
+
+def _rounded(value):
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, dict):
+        return {key: _rounded(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_rounded(item) for item in value]
+    return value
+
+
+@pytest.fixture
+def seeded_user(client, user):
+    """Movimientos de varios tipos y monedas, con fechas cerca de los bordes de día y de mes."""
+    user_id, headers = user
+    cop = client.post("/saving-accounts", json={"name": "COP", "type": "bank", "balance": 100000}, headers=headers).json()
+    usd = client.post("/saving-accounts", json={"name": "USD", "type": "bank", "balance": 5000, "currency": "USD"}, headers=headers).json()
+    invest = client.post("/saving-accounts", json={"name": "CDT", "type": "investment", "balance": 1000}, headers=headers).json()
+    salary = client.post("/categories", json={"name": "Salario", "type": "income"}, headers=headers).json()
+    food = client.post("/categories", json={"name": "Comida", "type": "expense"}, headers=headers).json()
+    rent = client.post("/categories", json={"name": "Arriendo", "type": "expense"}, headers=headers).json()
+
+    def post(json):
+        response = client.post("/transactions", json=json, headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    stamps = ["2025-02-28T23:30:00", "2025-03-01T03:00:00", "2025-03-01T05:30:00", "2025-03-15T12:00:00",
+              "2025-03-31T23:59:00", "2025-04-01T04:59:00", "2025-04-02T10:00:00"]
+    for i, stamp in enumerate(stamps):
+        post({"amount": 1000 + 17 * i, "type": "income", "category_id": salary["id"], "saving_account_id": cop["id"], "date": stamp})
+        post({"amount": 300 + 11 * i, "type": "expense", "category_id": (food, rent)[i % 2]["id"], "saving_account_id": cop["id"], "date": stamp})
+        post({"amount": 7 + i, "type": "expense", "category_id": food["id"], "saving_account_id": usd["id"], "date": stamp})
+    post({"amount": 50, "type": "expense", "category_id": food["id"], "saving_account_id": cop["id"], "transaction_fee": 5})
+
+    # Excluidos del resumen: transferencias, rendimientos, pagos de deuda y movimientos reversados
+    client.post("/transactions/transfer", json={"amount": 200, "from_account_id": cop["id"], "to_account_id": invest["id"]}, headers=headers)
+    client.post(f"/transactions/register-yield/{invest['id']}", json={"amount": 30}, headers=headers)
+    card = client.post("/debts", json={"name": "Visa", "total_amount": 0, "interest_rate": 2, "kind": "credit_card"}, headers=headers).json()
+    for stamp, amount in [("2025-03-10T15:00:00", 420), ("2025-03-20T15:00:00", 80)]:
+        response = client.post(f"/debts/{card['id']}/purchase", json={"amount": amount, "category_id": food["id"], "date": stamp}, headers=headers)
+        assert response.status_code == 200, response.text
+    client.post(f"/debts/{card['id']}/pay", json={"amount": 100, "saving_account_id": cop["id"], "date": "2025-03-25T12:00:00"}, headers=headers)
+    mistake = post({"amount": 999, "type": "expense", "category_id": rent["id"], "saving_account_id": cop["id"], "date": "2025-03-12T12:00:00"})
+    client.post(f"/transactions/{mistake['id']}/reverse", json={"note": "duplicado"}, headers=headers)
+    return user_id, headers
+
+
+@pytest.mark.parametrize("tz", ["UTC", "America/Bogota", "Asia/Kolkata"])
+@pytest.mark.parametrize("start, end", [
+    (dt.date(2025, 3, 1), dt.date(2025, 3, 31)),   # mes cerrado (sale de snapshot)
+    (dt.date(2025, 2, 20), dt.date(2025, 4, 5)),   # tramos cerrados y abiertos
+    (dt.date(2025, 3, 10), None),                  # hasta hoy
+])
+def test_summary_matches_legacy_implementation(client, seeded_user, tz, start, end):
+    user_id, headers = seeded_user
+    end = end or dt.datetime.now(ZoneInfo(tz)).date()
+    params = {"start_date": start.isoformat(), "end_date": end.isoformat(), "tz": tz}
+
+    response = client.get("/summary", params=params, headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["COP"]["total_income"] > 0
+    assert _rounded(response.json()) == _rounded(_legacy_summary(user_id, start, end, tz))
@@ -0,0 +1,68 @@
+from sqlmodel import Session, func, select
+
+from app.database import engine
+from app.models.transaction import Transaction
+from app.models.transaction_rollup import TransactionRollup
+
+
+def _state(client, user_id, headers, account_id):
+    with Session(engine) as session:
+        rows = session.exec(select(func.count()).select_from(Transaction).where(Transaction.user_id == user_id)).one()
+        rollup = session.exec(select(func.count()).select_from(TransactionRollup).where(TransactionRollup.user_id == user_id)).one()
+    accounts = client.get("/saving-accounts", headers=headers)
+    balance = next(item["balance"] for item in accounts.json() if item["id"] == account_id)
+    return rows, rollup, balance, accounts.headers["ETag"]
+
+
+def _setup(client, headers):
+    account = client.post("/saving-accounts", json={"name": "Nómina", "type": "bank", "balance": 100}, headers=headers).json()
+    salary = client.post("/categories", json={"name": "Salario", "type": "income"}, headers=headers).json()
+    food = client.post("/categories", json={"name": "Comida", "type": "expense"}, headers=headers).json()
+    return account, salary, food
+
+
+def test_batch_saves_every_item_in_order(client, user):
+    user_id, headers = user
+    account, salary, food = _setup(client, headers)
+    before = _state(client, user_id, headers, account["id"])
+
+    # El gasto de 250 solo cabe gracias al ingreso del ítem anterior
+    response = client.post("/transactions/batch", json=[
+        {"amount": 200, "type": "income", "category_id": salary["id"], "saving_account_id": account["id"]},
+        {"amount": 250, "type": "expense", "category_id": food["id"], "saving_account_id": account["id"]},
+    ], headers=headers)
+    assert response.status_code == 200, response.text
+    assert [(item["index"], item["transaction"]["amount"]) for item in response.json()] == [(0, 200), (1, 250)]
+
+    rows, rollup, balance, etag = _state(client, user_id, headers, account["id"])
+    assert rows == before[0] + 2
+    assert rollup > before[1]
+    assert balance == 50
+    assert etag != before[3]
+
+
+def test_batch_with_an_invalid_item_writes_nothing(client, user):
+    user_id, headers = user
+    account, salary, food = _setup(client, headers)
+    before = _state(client, user_id, headers, account["id"])
+
+    response = client.post("/transactions/batch", json=[
+        {"amount": 30, "type": "income", "category_id": salary["id"], "saving_account_id": account["id"]},
+        {"amount": 10, "type": "expense", "category_id": food["id"], "saving_account_id": account["id"]},
+        {"amount": 500, "type": "expense", "category_id": food["id"], "saving_account_id": account["id"]},
+        {"amount": 5, "type": "expense", "category_id": 999999, "saving_account_id": account["id"]},
+    ], headers=headers)
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert detail["message"] == "El lote no se guardó."
+    assert [error["index"] for error in detail["errors"]] == [2, 3]
+
+    # Ni filas, ni rollup, ni saldo, ni data_version: el ETag sigue valiendo
+    assert _state(client, user_id, headers, account["id"]) == before
+
+
+def test_batch_rejects_empty_and_oversized_payloads(client, user):
+    _, headers = user
+    assert client.post("/transactions/batch", json=[], headers=headers).status_code == 400
+    too_many = [{"amount": 1, "type": "income"}] * 501
+    assert client.post("/transactions/batch", json=too_many, headers=headers).status_code == 400
@@ -0,0 +1,50 @@
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.database import engine
+
+USER = {"user_id": uuid.uuid4().hex}
+RANGE = {**USER, "start": "2025-01-01", "end": "2025-02-01"}
+
+
+def _plan(sql, params):
+    with Session(engine) as session:
+        rows = session.exec(text(f"EXPLAIN QUERY PLAN {sql}"), params=params).all()
+    return " | ".join(row[-1] for row in rows)
+
+
+# Consultas calientes (SQLite) y el índice que cada una debe usar
+@pytest.mark.parametrize("sql, params, index", [
+    (  # listado paginado por cursor
+        'SELECT id FROM "transaction" WHERE user_id = :user_id AND (date, id) < (:end, 0) '
+        "ORDER BY date DESC, id DESC LIMIT 20",
+        USER | {"end": "2025-02-01"}, "ix_transaction_user_date_id",
+    ),
+    (  # reportes desde el libro mayor (solo filas vigentes)
+        'SELECT SUM(amount) FROM "transaction" WHERE user_id = :user_id AND date >= :start AND date < :end '
+        "AND NOT is_cancelled AND reversed_transaction_id IS NULL",
+        RANGE, "ix_transaction_user_date_active",
+    ),
+    (  # movimientos de una cuenta
+        'SELECT id FROM "transaction" WHERE saving_account_id = :id ORDER BY date DESC',
+        {"id": 1}, "ix_transaction_saving_account_date",
+    ),
+    ('SELECT id FROM "transaction" WHERE from_account_id = :id', {"id": 1}, "ix_transaction_from_account_id"),
+    ('SELECT id FROM "transaction" WHERE to_account_id = :id', {"id": 1}, "ix_transaction_to_account_id"),
+    ('SELECT id FROM "transaction" WHERE debt_id = :id', {"id": 1}, "ix_transaction_debt_id"),
+    ('SELECT id FROM "transaction" WHERE category_id = :id LIMIT 1', {"id": 1}, "ix_transaction_category_id"),
+    (
+        "SELECT id FROM debt_transaction WHERE debt_id = :id ORDER BY date DESC",
+        {"id": 1}, "ix_debt_transaction_debt_date",
+    ),
+    (
+        "SELECT SUM(amount) FROM debt_transaction WHERE user_id = :user_id AND date >= :start",
+        RANGE, "ix_debt_transaction_user_date",
+    ),
+])
+def test_hot_queries_use_indexes(client, sql, params, index):
+    plan = _plan(sql, params)
+    assert index in plan, plan
@@ -0,0 +1,64 @@
+import pytest
+
+DESCRIPTIONS = [
+    "Mercado Éxito semanal",
+    "Mercado mercado mercado",
+    "Almuerzo con clientes",
+    "Pago arriendo apartamento",
+    "Supermercado del barrio",
+]
+
+
+@pytest.fixture
+def search(client, user):
+    _, headers = user
+    account = client.post("/saving-accounts", json={"name": "Banco", "type": "bank", "balance": 1000}, headers=headers).json()
+    category = client.post("/categories", json={"name": "Gastos", "type": "expense"}, headers=headers).json()
+    ids = {}
+    for description in DESCRIPTIONS:
+        created = client.post("/transactions", json={
+            "amount": 10, "type": "expense", "category_id": category["id"], "saving_account_id": account["id"],
+            "description": description,
+        }, headers=headers).json()
+        ids[description] = created["id"]
+
+    def run(q, **params):
+        response = client.get("/transactions/with-category", params={"q": q, **params}, headers=headers)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        return [item["description"] for item in body["items"]], body["total"]
+
+    run.headers = headers
+    run.ids = ids
+    return run
+
+
+def test_search_matches_word_prefixes_case_insensitively(search):
+    found, total = search("MERC")
+    assert set(found) == {"Mercado Éxito semanal", "Mercado mercado mercado"}
+    assert total == 2
+    assert search("arri apart")[0] == ["Pago arriendo apartamento"]  # todas las palabras deben aparecer
+    assert search("arriendo clientes") == ([], 0)
+
+
+def test_search_orders_by_relevance(search):
+    found, _ = search("mercado")
+    assert found[0] == "Mercado mercado mercado"
+
+
+def test_search_follows_description_edits_and_stays_per_user(client, search, make_user):
+    edited = search.ids["Almuerzo con clientes"]
+    response = client.patch(f"/transactions/{edited}", json={"description": "Cena con proveedores"}, headers=search.headers)
+    assert response.status_code == 200, response.text
+    assert search("almuerzo") == ([], 0)
+    assert search("proveedores")[0] == ["Cena con proveedores"]
+
+    _, other_headers = make_user()
+    response = client.get("/transactions/with-category", params={"q": "mercado"}, headers=other_headers)
+    assert response.json()["items"] == []
+
+
+def test_search_ignores_blank_queries_and_rejects_cursor(client, search):
+    assert search("   ")[1] == len(DESCRIPTIONS)
+    response = client.get("/transactions/with-category", params={"q": "mercado", "cursor": ""}, headers=search.headers)
+    assert response.status_code == 400